@@ -5,8 +5,20 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import numpy as np
+import time
 
 from matplotlib.colors import LinearSegmentedColormap
+
+from data_store import DATA_PATH, SHEETS, DatasetStore
+from traffic_index import TrafficIndex
+from cube import DailySums, calendar, grouping_sets, with_ratios
+from downsample import rebin, scatter_type, thin
+from figures import FigureCache, record_layout, restyle
+from kpi_rules import (CRITICAL, LEVEL_NAMES, NO_DATA, OFF_TARGET, OK, WARNING, Rules, SegmentDays,
+                       alert_timeline, grade, rank_breaches, thresholds)
+from payments_store import PaymentSketches, PaymentsCube, PaymentsRing
+from query_cache import ALL, LRUCache, canonical_key, key_filters
+from tables import PagedTable, fits_styler, heatmap_html, heatmap_styler
 # ══════════════════════════════════════════════
 # CONFIG
 # ══════════════════════════════════════════════
@@ -17,6 +29,8 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+_rerun_started = time.perf_counter()
+
 # ══════════════════════════════════════════════
 # THEME TOGGLE (Light / Dark)
 # ══════════════════════════════════════════════
@@ -141,6 +155,19 @@ div[data-testid="stMetric"] [data-testid="stMetricValue"] {
     background: #131730 !important;
     color: #E4E6F0 !important;
 }
+
+/* View router (horizontal radio styled as the tab bar) */
+.st-key-view div[role="radiogroup"] {
+    background: #111528;
+    border-radius: 10px;
+    padding: 3px;
+}
+
+.st-key-view label:has(input:checked) {
+    background: #131730;
+    border-radius: 8px;
+    color: #E4E6F0;
+}
 </style>
 """
 
@@ -379,6 +406,28 @@ div[data-testid="stMetric"] [data-testid="stMetricDelta"] {
     border: 1px solid #CBD5E1 !important;
 }
 
+.st-key-view div[role="radiogroup"] {
+    background: #F1F5F9;
+    border-radius: 12px;
+    padding: 4px;
+    gap: 4px;
+    border: 1px solid #E2E8F0;
+}
+
+.st-key-view label {
+    border-radius: 10px;
+    color: #64748B;
+    font-weight: 700;
+    padding: 6px 12px;
+}
+
+.st-key-view label:has(input:checked) {
+    background: #FFFFFF;
+    color: #0F172A;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    border: 1px solid #CBD5E1;
+}
+
 /* === DATAFRAME === */
 .stDataFrame {
     border-radius: 14px;
@@ -467,7 +516,7 @@ LIGHT_TABLE_CSS = """
     overflow: auto;
 }
 
-/* The actual HTML table (pandas Styler output) */
+/* The actual HTML table (tables.heatmap_html output) */
 .theme-light table.saas-table{
     width: 100%;
     border-collapse: separate;
@@ -548,7 +597,10 @@ COLORS_LIGHT = {
 # NOTE: COLORS / COLOR_SEQ are bound AFTER MODE is known (see below)
 COLORS = COLORS_DARK
 COLOR_SEQ = list(COLORS.values())
-def apply_layout(fig, mode: str, **kwargs):
+PALETTES = {"dark": COLORS_DARK, "light": COLORS_LIGHT}
+
+def theme_layout(mode: str):
+    # Theme part of every chart layout (kept separate so a cached figure can be restyled)
     if mode == "dark":
         base_layout = dict(
             template='plotly_dark',
@@ -556,7 +608,7 @@ def apply_layout(fig, mode: str, **kwargs):
             plot_bgcolor='#131730',
             font=dict(family='Outfit, sans-serif', color='#8B90AD', size=12),
             margin=dict(l=20, r=20, t=40, b=20),
-            colorway=COLOR_SEQ,
+            colorway=list(PALETTES[mode].values()),
         )
     else:
         # Light mode: airy SaaS style (soft grid, higher readability)
@@ -567,7 +619,7 @@ def apply_layout(fig, mode: str, **kwargs):
             font=dict(family='Inter, sans-serif', color='#334155', size=12),
             title_font=dict(family='Inter, sans-serif', color='#334155', size=16),
             margin=dict(l=20, r=20, t=48, b=24),
-            colorway=COLOR_SEQ,
+            colorway=list(PALETTES[mode].values()),
             hoverlabel=dict(
                 bgcolor='#FFFFFF',
                 bordercolor='rgba(148,163,184,0.35)',
@@ -601,33 +653,124 @@ def apply_layout(fig, mode: str, **kwargs):
             ),
         )
 
+    return base_layout
+
+def apply_layout(fig, mode: str, **kwargs):
+    # A plain title string (chart or axis) would replace the theme's title font: merge it as text
+    for key, value in kwargs.items():
+        if (key == 'title' or key.endswith('_title')) and isinstance(value, str):
+            kwargs[key] = dict(text=value)
     # Merge with kwargs
+    base_layout = theme_layout(mode)
     base_layout.update(kwargs)
     fig.update_layout(**base_layout)
-    return fig
+    # Kept apart from the theme, for a restyle to the other theme (figures.py)
+    return record_layout(fig, kwargs)
 
 # ══════════════════════════════════════════════
 # DATA LOADING
 # ══════════════════════════════════════════════
-@st.cache_data(ttl=3600)
+@st.cache_resource
+def dataset_store():
+    return DatasetStore(DATA_PATH)
+
 def load_data():
-    path = "TF_Dashboard_Dataset_v2.xlsx"
-    traffic = pd.read_excel(path, sheet_name='FACT_Daily_Traffic')
-    traffic['date'] = pd.to_datetime(traffic['date'])
-    payments = pd.read_excel(path, sheet_name='FACT_Payments')
-    payments['date'] = pd.to_datetime(payments['date'])
-    agents = pd.read_excel(path, sheet_name='FACT_Agent_Weekly')
-    agents['week_start'] = pd.to_datetime(agents['week_start'])
-    geo_dim = pd.read_excel(path, sheet_name='DIM_Geo')
-    targets = pd.read_excel(path, sheet_name='DIM_KPI_Targets')
-    return traffic, payments, agents, geo_dim, targets
+    # No TTL: the store reloads (in the background) only when the file's
+    # mtime/size/content hash really changed; until then the previous
+    # version keeps being served. Sheets come from Arrow snapshots (.tf_cache/).
+    return dataset_store().current()
+
+# Row indexes over the derived traffic frames (built once per dataset version)
+TRAFFIC_INDEXES = {
+    'cube': lambda ds: TrafficIndex(ds.cube),
+    'weekly': lambda ds: TrafficIndex(ds.weekly, date_col='week_start'),
+}
+
+def traffic_index(ds, name):
+    return ds.derived(f'{name}_index', TRAFFIC_INDEXES[name])
+
+# Buckets kept by the payments ring: a week of hours
+RING_RETENTION = 7 * 24
+
+def payments_ring(ds):
+    # Newest RING_RETENTION buckets per geo x payment_method (payments_store.PaymentsRing):
+    # hourly from FACT_Payments_Hourly when the workbook has it, else daily from FACT_Payments.
+    # A live feed would call ring.ingest() / ring.append() on it
+    def build(ds):
+        hourly = ds.payments_hourly
+        if hourly is not None:
+            return PaymentsRing.from_frame(hourly, '1h', RING_RETENTION)
+        return PaymentsRing.from_frame(ds.payments, '1D', RING_RETENTION)
+    return ds.derived('payments_ring', build)
+
+def payments_sketches(ds):
+    # Processing time / ticket size quantile sketches per (day, geo, payment_method)
+    return ds.derived('payments_sketches', lambda ds: PaymentSketches(ds.payments))
+
+def payments_cube(ds):
+    # Day x geo x payment_method running totals of FACT_Payments (payments_store.py)
+    return ds.derived('payments_cube', lambda ds: PaymentsCube(ds.payments))
+
+def kpi_rules(ds):
+    # DIM_KPI_Targets rows that are ratios of cube measures (kpi_rules.py)
+    return ds.derived('kpi_rules', lambda ds: Rules(ds.targets, ds.cube.columns))
+
+def segment_days(ds):
+    # Rule measures per (day, geo x brand x platform x traffic_source) of the cube
+    return ds.derived('segment_days', lambda ds: SegmentDays(traffic_index(ds, 'cube'), kpi_rules(ds).measures))
+
+@st.cache_resource
+def query_cache():
+    # Process-wide results shared by every session, keyed on the dataset version
+    # plus the canonical filter key (see query_cache.py) — no DataFrame is hashed
+    return LRUCache(max_entries=256)
+
+def rollups(ds, index_name, key, start, end, sets):
+    # One view's grouping sets for one (filters, period); switching back to a view is a cache hit
+    def compute():
+        index = traffic_index(ds, index_name)
+        return grouping_sets(index, index.select(start, end, key_filters(key, filter_universe)), sets)
+    return query_cache().get(('rollups', ds.version, index_name, key, start, end, tuple(sets)), compute)
+
+@st.cache_resource
+def figure_cache():
+    # Process-wide: every session reuses the figures built for the same data slice
+    return FigureCache(max_entries=256)
+
+def daily_sums(ds, key):
+    # Per-day running totals for one sidebar filter combination (whole history);
+    # any KPI window — period, previous period, today, yesterday — is then O(1)
+    return query_cache().get(('daily_sums', ds.version, key), lambda: DailySums(
+        traffic_index(ds, 'cube'), key_filters(key, filter_universe)))
+
+def load_stats_frame(ds):
+    rows = []
+    for sheet in SHEETS:
+        s = ds.load_stats.get(sheet)
+        if s is None:
+            rows.append({'Sheet': sheet, 'Source': 'not loaded', 'Rows': None,
+                         'Load s': None, 'xlsx s': None, 'Speedup': "—", 'Memory': "—"})
+            continue
+        mem = ds.memory_stats.get(sheet)
+        rows.append({
+            'Sheet': s.sheet, 'Source': s.source, 'Rows': s.rows,
+            'Load s': round(s.seconds, 3), 'xlsx s': round(s.xlsx_seconds, 3),
+            'Speedup': f"{s.speedup:.0f}×" if s.source == 'snapshot' else "—",
+            'Memory': f"{mem[0]/2**20:.1f} → {mem[1]/2**20:.1f} MB" if mem else "—",
+        })
+    return pd.DataFrame(rows)
 
 try:
-    df_traffic, df_payments, df_agents, df_geo, df_targets = load_data()
+    dataset = load_data()
 except FileNotFoundError:
     st.error("⚠️ Файл `TF_Dashboard_Dataset_v2.xlsx` не знайдено.")
     st.stop()
 
+# Sheets are parsed on first access. Traffic views are served from the daily
+# cube (date × geo × brand × platform × reg_method × source × agent), never from FACT rows
+cube_index = traffic_index(dataset, 'cube')
+df_traffic = cube_index.frame
+
 # ══════════════════════════════════════════════
 # SIDEBAR
 # ══════════════════════════════════════════════
@@ -639,8 +782,8 @@ with st.sidebar:
     st.session_state.theme_mode = "dark" if _is_dark else "light"
     st.markdown("---")
 
-    min_date = df_traffic['date'].min().date()
-    max_date = df_traffic['date'].max().date()
+    min_date = cube_index.min_date
+    max_date = cube_index.max_date
     date_range = st.date_input("📅 Період", value=(max_date - timedelta(days=30), max_date),
                                 min_value=min_date, max_value=max_date)
     if len(date_range) == 2:
@@ -662,6 +805,7 @@ with st.sidebar:
     all_agents = sorted([x for x in df_traffic['agent'].dropna().unique().tolist() if str(x).strip() != ""])
     selected_agents = st.multiselect("👤 Агенти", all_agents, default=all_agents)
 
+
 apply_theme_css(st.session_state.theme_mode)
 MODE = st.session_state.theme_mode
 
@@ -684,20 +828,36 @@ if MODE == "light":
 # ══════════════════════════════════════════════
 # FILTER DATA
 # ══════════════════════════════════════════════
-def filter_traffic(df, start, end, geos, brands, platforms, sources, agents):
-    mask = (
-        (df['date'].dt.date >= start) & (df['date'].dt.date <= end) &
-        (df['geo'].isin(geos)) & (df['brand'].isin(brands)) &
-        (df['platform'].isin(platforms)) & (df['traffic_source'].isin(sources)) &
-        (df['agent'].isin(agents))
-    )
-    return df[mask].copy()
-
-df = filter_traffic(df_traffic, start_date, end_date, selected_geos, selected_brands, selected_platforms, selected_sources, selected_agents)
+# Rows are date-sorted: the period is one contiguous slice (no per-row date conversion);
+# dimension filters are ANDed per-value bitmaps, fully-selected dimensions are skipped
+dim_filters = {
+    'geo': selected_geos, 'brand': selected_brands, 'platform': selected_platforms,
+    'traffic_source': selected_sources, 'agent': selected_agents,
+}
 period_days = (end_date - start_date).days + 1
 prev_start = start_date - timedelta(days=period_days)
 prev_end = start_date - timedelta(days=1)
-df_prev = filter_traffic(df_traffic, prev_start, prev_end, selected_geos, selected_brands, selected_platforms, selected_sources, selected_agents)
+filter_universe = {
+    'geo': all_geos, 'brand': all_brands, 'platform': all_platforms,
+    'traffic_source': all_sources, 'agent': all_agents,
+}
+# Sorted per dimension, fully-selected dimensions as ALL: equal selections give equal keys
+filter_key = canonical_key(dim_filters, filter_universe)
+daily_totals = daily_sums(dataset, filter_key)
+
+# Traffic roll-ups per view: only the active view's sets are computed, in ONE
+# kernel call (ratios are derived from these sums afterwards, per view)
+VIEW_SETS = {
+    'executive': [('date',), ('geo',), ('platform',), ('traffic_source',), ('platform', 'brand')],
+    'daily': [('date',), ('geo',), ('platform',), ('traffic_source',), ('reg_method',)],
+    'payments': [('date',)],
+    'agents': [('agent',), ('agent', 'traffic_source')],
+}
+
+def view_rollups(view):
+    return rollups(dataset, 'cube', filter_key, start_date, end_date, VIEW_SETS[view])
+
+totals = daily_totals.window(start_date, end_date)
 
 # ══════════════════════════════════════════════
 # HELPER FUNCTIONS
@@ -727,31 +887,73 @@ def pct_change(current, previous):
         return 0
     return (current - previous) / previous
 
-def render_light_table(styler: pd.io.formats.style.Styler, *, height: int | None = None):
+def kpi_color(value, limits):
+    # Green on target, amber short of it, red past the critical threshold (kpi_rules.grade levels)
+    level = int(grade(value, limits['target'], limits['warning'], limits['critical'], limits['lower_better']))
+    return {NO_DATA: COLORS['blue'], OK: COLORS['green'], OFF_TARGET: COLORS['amber'],
+            WARNING: COLORS['amber'], CRITICAL: COLORS['red']}[level]
+
+def render_light_table(html: str, *, height: int | None = None):
     """Render a SaaS-looking table ONLY for light mode.
 
     Dark mode remains on st.dataframe (interactive) and is unchanged.
     """
-    # Hide index (compat between pandas versions)
-    try:
-        styler = styler.hide(axis="index")
-    except Exception:
-        try:
-            styler = styler.hide_index()
-        except Exception:
-            pass
-
-    # Force a stable class for our scoped CSS
-    styler = styler.set_table_attributes('class="saas-table"')
-
     max_h = f"max-height:{int(height)}px;" if height else ""
-    html = styler.to_html()
 
     st.markdown(
         f'<div class="theme-light"><div class="saas-table-card" style="{max_h}">{html}</div></div>',
         unsafe_allow_html=True
     )
 
+def interactive_heatmap(frame, formats, gradients, *, height: int | None = None, na_rep=None):
+    # Too many cells for a Styler: the plain frame (Arrow), unformatted and uncoloured
+    data = heatmap_styler(frame, formats, gradients, HEATMAP_CMAP, na_rep=na_rep) if fits_styler(frame) else frame
+    st.dataframe(data, use_container_width=True, hide_index=True, **({'height': height} if height else {}))
+
+def heatmap_table(frame, formats, gradients, *, height: int | None = None, na_rep=None):
+    # gradients: {column: (vmin, vmax)} over HEATMAP_CMAP. Colours come from the
+    # colormap's lookup table a column at a time (tables.py), not per-cell Styler calls
+    if MODE == "dark":
+        # ✅ Dark Mode: interactive dataframe
+        interactive_heatmap(frame, formats, gradients, height=height, na_rep=na_rep)
+    else:
+        # ✅ Light Mode: compact HTML table for full SaaS styling
+        render_light_table(heatmap_html(frame, formats, gradients, HEATMAP_CMAP, na_rep=na_rep), height=height)
+
+def paged_table(table_id, frame, formats, gradients, *, sort_by, ascending=False, page_size=50,
+                search_col=None, interactive=False, height: int | None = None, na_rep=None):
+    # Sort orders are kept per data slice (tables.PagedTable, shared by sessions);
+    # only the visible page is formatted and sent
+    table = query_cache().get(('paged', table_id, dataset.version, filter_key, start_date, end_date),
+                              lambda: PagedTable(frame, search_col=search_col))
+    _paged_table_page(table_id, table, formats, gradients, sort_by, ascending, page_size, interactive, height, na_rep)
+
+@st.fragment
+def _paged_table_page(table_id, table, formats, gradients, sort_by, ascending, page_size, interactive, height, na_rep):
+    # Page flips, sorting and search rerun only this table
+    started = time.perf_counter()
+    columns = list(table.frame.columns)
+    if table.search_col is not None:
+        c_search, c_sort, c_dir, c_page = st.columns([3, 2, 1, 1])
+        query = c_search.text_input("🔎 Search", key=f"{table_id}:search", placeholder=f"{table.search_col} contains…")
+    else:
+        c_sort, c_dir, c_page = st.columns([3, 1, 1])
+        query = ''
+    sort_col = c_sort.selectbox("Sort by", columns, index=columns.index(sort_by), key=f"{table_id}:sort")
+    descending = c_dir.toggle("Descending", value=not ascending, key=f"{table_id}:desc")
+    rows = table.rows(sort_col, not descending, query)
+    pages = max(1, -(-len(rows) // page_size))
+    if st.session_state.get(f"{table_id}:page", 1) > pages:   # fewer pages after a search
+        st.session_state[f"{table_id}:page"] = pages
+    page = c_page.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{table_id}:page")
+    visible = table.page(rows, int(page), page_size)
+    if interactive:
+        interactive_heatmap(visible, formats, gradients, height=height, na_rep=na_rep)
+    else:
+        heatmap_table(visible, formats, gradients, height=height, na_rep=na_rep)
+    st.caption(f"{len(rows):,} of {len(table):,} rows · page {int(page)} of {pages}")
+    note_timing(table_id, started)
+
 def scorecard_html(label, value, change_pct, sub_text="", accent_color="#5B8DEF"):
     direction = "up" if change_pct >= 0 else "down"
     symbol = "▲" if direction == "up" else "▼"
@@ -765,21 +967,22 @@ def scorecard_html(label, value, change_pct, sub_text="", accent_color="#5B8DEF"
     </div>
     """
 
-def compute_kpis(d):
-    regs = d['registrations'].sum()
-    ftd_c = d['ftd_count'].sum()
-    ftd_a = d['ftd_amount_usd'].sum()
-    net_rev = d['net_revenue_usd'].sum()
-    ggr = d['ggr_usd'].sum()
-    bonus = d['bonus_cost_usd'].sum()
-    cpa = d['cpa_cost_usd'].sum()
-    p_att = d['payment_attempts'].sum()
-    p_ok = d['payment_approved'].sum()
-    imp = d['impressions'].sum()
-    clk = d['clicks'].sum()
-    active = d['active_players'].sum()
-    sessions = d['sessions'].sum()
-    dep_total = d['deposits_total_usd'].sum()
+def compute_kpis(t):
+    # t: {measure: sum} for one window (DailySums.window)
+    regs = t['registrations']
+    ftd_c = t['ftd_count']
+    ftd_a = t['ftd_amount_usd']
+    net_rev = t['net_revenue_usd']
+    ggr = t['ggr_usd']
+    bonus = t['bonus_cost_usd']
+    cpa = t['cpa_cost_usd']
+    p_att = t['payment_attempts']
+    p_ok = t['payment_approved']
+    imp = t['impressions']
+    clk = t['clicks']
+    active = t['active_players']
+    sessions = t['sessions']
+    dep_total = t['deposits_total_usd']
 
     return {
         'registrations': regs, 'ftd_count': ftd_c, 'ftd_amount': ftd_a,
@@ -796,24 +999,79 @@ def compute_kpis(d):
         'impressions': imp, 'clicks': clk, 'deposits_total': dep_total,
     }
 
-kpi = compute_kpis(df)
-kpi_prev = compute_kpis(df_prev)
+def window_kpis(start, end):
+    # KPI dict of one window under the current filters
+    return query_cache().get(('kpis', dataset.version, filter_key, start, end),
+                             lambda: compute_kpis(daily_totals.window(start, end)))
+
+kpi = window_kpis(start_date, end_date)
+kpi_prev = window_kpis(prev_start, prev_end)
 
 # ══════════════════════════════════════════════
-# TABS
+# VIEWS
 # ══════════════════════════════════════════════
-tab_exec, tab_daily, tab_weekly, tab_payments, tab_agents = st.tabs([
+# A router instead of st.tabs: tabs only hide content in the browser, so every
+# rerun computed and sent all five. Only the selected view's function runs.
+VIEW_LABELS = [
     "🏠 Executive Summary",
     "📊 Daily Operations",
     "📈 Weekly Trends",
     "💳 Payment & Conversion Health",
     "👥 Traffic & Agent Efficiency",
-])
+]
+
+def note_timing(section, started):
+    # Render time of the last run of a section (full rerun, view, fragment)
+    st.session_state.setdefault('timings', {})[section] = (time.perf_counter() - started) * 1000
+
+def show_chart(chart_id, build):
+    # Figure cached per (data version, filters, period, chart) and theme; a theme
+    # switch restyles the cached figure instead of rebuilding it (see figures.py)
+    key = (dataset.version, filter_key, start_date, end_date, chart_id)
+    fig = figure_cache().get(key, MODE, build, lambda cached, its_mode: restyle(
+        cached, PALETTES[its_mode], PALETTES[MODE], theme_layout(its_mode), theme_layout(MODE)))
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+# Point budgets of a half-width trend chart (~700 px): line points across its
+# traces (~2 per pixel) and bars per trace
+LINE_POINTS = 1500
+BAR_POINTS = 365
+
+def trend_chart(chart_id, frame, build, *, columns, bars=False):
+    # build(frame) draws the chart from `frame` (sorted by date). Beyond the point
+    # budget lines are thinned with LTTB and bars summed to a coarser calendar
+    # grain (downsample.py); a zoom slider then re-fetches the chosen stretch
+    if len(frame) <= (BAR_POINTS if bars else LINE_POINTS):
+        show_chart(chart_id, lambda: build(frame))
+    else:
+        _zoomable_chart(chart_id, frame, build, columns, bars)
+
+@st.fragment
+def _zoomable_chart(chart_id, frame, build, columns, bars):
+    # Zooming reruns only this chart, at full resolution once the stretch fits the budget
+    started = time.perf_counter()
+    slot = st.container()
+    first, last = frame['date'].iloc[0].to_pydatetime(), frame['date'].iloc[-1].to_pydatetime()
+    lo, hi = st.slider("🔍 Zoom", min_value=first, max_value=last, value=(first, last),
+                       step=frame['date'].diff().min().to_pytimedelta(), key=f"{chart_id}:zoom")
+    window = frame[frame['date'].between(lo, hi)]
+    if bars:
+        shown, grain = rebin(window, 'date', columns, BAR_POINTS)
+        detail = f"bars per {grain}" if grain else "full resolution"
+    else:
+        shown = thin(window, 'date', columns, LINE_POINTS)
+        detail = "LTTB" if len(shown) < len(window) else "full resolution"
+    zoom = (lo, hi) if (lo, hi) != (first, last) else None
+    with slot:
+        show_chart((chart_id, zoom), lambda: build(shown))
+    st.caption(f"{len(shown):,} of {len(window):,} points · {detail}")
+    note_timing(chart_id, started)
 
 # ═══════════════════════════════════════════════════
-# TAB 1: EXECUTIVE SUMMARY
+# VIEW 1: EXECUTIVE SUMMARY
 # ═══════════════════════════════════════════════════
-with tab_exec:
+def render_executive():
+    agg = view_rollups('executive')
     st.markdown(f"""
     <div class="main-header">
         <h1>Traffic & Finance Dashboard</h1>
@@ -831,11 +1089,11 @@ with tab_exec:
         ("FTD Count", fmt_num(kpi['ftd_count']), pct_change(kpi['ftd_count'], kpi_prev['ftd_count']),
          f"vs prev: {fmt_num(kpi_prev['ftd_count'])}", COLORS['green']),
         ("Reg2Dep", fmt_pct(kpi['reg2dep']), pct_change(kpi['reg2dep'], kpi_prev['reg2dep']),
-         "Target: 18%", COLORS['purple']),
+         f"Target: {thresholds(dataset.targets, 'reg2dep_conversion')['target']:.0%}", COLORS['purple']),
         ("FTD Amount", fmt_money(kpi['ftd_amount']), pct_change(kpi['ftd_amount'], kpi_prev['ftd_amount']),
          f"Avg: {fmt_money(kpi['avg_ftd_check'])}", COLORS['cyan']),
         ("Approval Rate", fmt_pct(kpi['approval_rate']), pct_change(kpi['approval_rate'], kpi_prev['approval_rate']),
-         "Target: 85%", COLORS['amber']),
+         f"Target: {thresholds(dataset.targets, 'payment_approval_rate')['target']:.0%}", COLORS['amber']),
         ("Net Revenue", fmt_money(kpi['net_revenue']), pct_change(kpi['net_revenue'], kpi_prev['net_revenue']),
          f"Margin: {fmt_money(kpi['margin'])}", COLORS['red']),
     ]
@@ -997,6 +1255,12 @@ with tab_exec:
             </div>
             """, unsafe_allow_html=True)
 
+    # ════════════════════════════════════════════════════════════
+    # KPI TARGETS BY SEGMENT (DIM_KPI_Targets rules)
+    # ════════════════════════════════════════════════════════════
+    st.markdown('<div class="sec-label">🚨 KPI Targets by Segment</div>', unsafe_allow_html=True)
+    render_kpi_breaches()
+
     st.markdown('<div class="sec-label">Key Ratios</div>', unsafe_allow_html=True)
     
     # Using native Streamlit metrics
@@ -1019,101 +1283,92 @@ with tab_exec:
     col_left, col_right = st.columns(2)
 
     with col_left:
-        daily = df.groupby('date').agg(
-            registrations=('registrations', 'sum'),
-            ftd_count=('ftd_count', 'sum'),
-        ).reset_index()
-
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        fig.add_trace(go.Scatter(
-            x=daily['date'], y=daily['registrations'],
-            name='Registrations', line=dict(color=COLORS['blue'], width=2),
-            fill='tozeroy', fillcolor='rgba(91,141,239,0.05)',
-        ), secondary_y=False)
-        fig.add_trace(go.Scatter(
-            x=daily['date'], y=daily['ftd_count'],
-            name='FTD', line=dict(color=COLORS['green'], width=2),
-        ), secondary_y=True)
-        apply_layout(fig, MODE, title='Registrations & FTD')
-        fig.update_yaxes(title_text="Registrations", secondary_y=False)
-        fig.update_yaxes(title_text="FTD", secondary_y=True)
-        st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+        daily = agg[('date',)][['date', 'registrations', 'ftd_count']]
+
+        def build_fig(daily):
+            Scatter = scatter_type(len(daily))
+            fig = make_subplots(specs=[[{"secondary_y": True}]])
+            fig.add_trace(Scatter(
+                x=daily['date'], y=daily['registrations'],
+                name='Registrations', line=dict(color=COLORS['blue'], width=2),
+                fill='tozeroy', fillcolor='rgba(91,141,239,0.05)',
+            ), secondary_y=False)
+            fig.add_trace(Scatter(
+                x=daily['date'], y=daily['ftd_count'],
+                name='FTD', line=dict(color=COLORS['green'], width=2),
+            ), secondary_y=True)
+            apply_layout(fig, MODE, title='Registrations & FTD')
+            fig.update_yaxes(title_text="Registrations", secondary_y=False)
+            fig.update_yaxes(title_text="FTD", secondary_y=True)
+            return fig
+        trend_chart('executive/registrations_ftd', daily, build_fig, columns=['registrations', 'ftd_count'])
 
     with col_right:
-        daily_rev = df.groupby('date').agg(
-            net_revenue=('net_revenue_usd', 'sum'),
-            cpa_cost=('cpa_cost_usd', 'sum'),
-            bonus_cost=('bonus_cost_usd', 'sum'),
-        ).reset_index()
-
-        fig2 = go.Figure()
-        fig2.add_trace(go.Bar(x=daily_rev['date'], y=daily_rev['net_revenue'], 
-                              name='Net Revenue', marker_color=COLORS['green']))
-        fig2.add_trace(go.Bar(x=daily_rev['date'], y=daily_rev['cpa_cost'],
-                              name='CPA Cost', marker_color=COLORS['red']))
-        apply_layout(fig2, MODE, title='Revenue vs Costs', barmode='group')
-        st.plotly_chart(fig2, use_container_width=True, config={'displayModeBar': False})
+        daily_rev = agg[('date',)].rename(columns={
+            'net_revenue_usd': 'net_revenue', 'cpa_cost_usd': 'cpa_cost', 'bonus_cost_usd': 'bonus_cost',
+        })
+
+        def build_fig2(daily_rev):
+            fig2 = go.Figure()
+            fig2.add_trace(go.Bar(x=daily_rev['date'], y=daily_rev['net_revenue'], 
+                                  name='Net Revenue', marker_color=COLORS['green']))
+            fig2.add_trace(go.Bar(x=daily_rev['date'], y=daily_rev['cpa_cost'],
+                                  name='CPA Cost', marker_color=COLORS['red']))
+            apply_layout(fig2, MODE, title='Revenue vs Costs', barmode='group')
+            return fig2
+        trend_chart('executive/revenue_costs', daily_rev, build_fig2, columns=['net_revenue', 'cpa_cost'], bars=True)
 
     st.markdown('<div class="sec-label">Split Analysis</div>', unsafe_allow_html=True)
     c1, c2, c3 = st.columns(3)
 
     with c1:
-        plat_data = df.groupby('platform')['ftd_count'].sum().reset_index()
-        fig_plat = px.pie(plat_data, values='ftd_count', names='platform', hole=0.65,
-                          color_discrete_sequence=COLOR_SEQ)
-        apply_layout(fig_plat, MODE, title='Platform Split (FTD)')
-        st.plotly_chart(fig_plat, use_container_width=True, config={'displayModeBar': False})
+        plat_data = agg[('platform',)][['platform', 'ftd_count']]
+        def build_fig_plat():
+            fig_plat = px.pie(plat_data, values='ftd_count', names='platform', hole=0.65,
+                              color_discrete_sequence=COLOR_SEQ)
+            apply_layout(fig_plat, MODE, title='Platform Split (FTD)')
+            return fig_plat
+        show_chart('executive/platform_split', build_fig_plat)
 
     with c2:
-        src_data = df.groupby('traffic_source')['registrations'].sum().reset_index()
-        fig_src = px.pie(src_data, values='registrations', names='traffic_source', hole=0.65,
-                         color_discrete_sequence=COLOR_SEQ)
-        apply_layout(fig_src, MODE, title='Traffic Source (Regs)')
-        st.plotly_chart(fig_src, use_container_width=True, config={'displayModeBar': False})
+        src_data = agg[('traffic_source',)][['traffic_source', 'registrations']]
+        def build_fig_src():
+            fig_src = px.pie(src_data, values='registrations', names='traffic_source', hole=0.65,
+                             color_discrete_sequence=COLOR_SEQ)
+            apply_layout(fig_src, MODE, title='Traffic Source (Regs)')
+            return fig_src
+        show_chart('executive/source_split', build_fig_src)
 
     with c3:
-        geo_data = df.groupby('geo')['ftd_amount_usd'].sum().reset_index()
-        fig_geo = px.pie(geo_data, values='ftd_amount_usd', names='geo', hole=0.65,
-                         color_discrete_sequence=COLOR_SEQ)
-        apply_layout(fig_geo, MODE, title='GEO (FTD Amount)')
-        st.plotly_chart(fig_geo, use_container_width=True, config={'displayModeBar': False})
+        geo_data = agg[('geo',)][['geo', 'ftd_amount_usd']]
+        def build_fig_geo():
+            fig_geo = px.pie(geo_data, values='ftd_amount_usd', names='geo', hole=0.65,
+                             color_discrete_sequence=COLOR_SEQ)
+            apply_layout(fig_geo, MODE, title='GEO (FTD Amount)')
+            return fig_geo
+        show_chart('executive/geo_split', build_fig_geo)
 
     st.markdown('<div class="sec-label">Country Performance Matrix</div>', unsafe_allow_html=True)
 
-    geo_table = df.groupby('geo').agg(
-        Registrations=('registrations', 'sum'),
-        FTD=('ftd_count', 'sum'),
-        FTD_Amount=('ftd_amount_usd', 'sum'),
-        Net_Revenue=('net_revenue_usd', 'sum'),
-        Payment_Attempts=('payment_attempts', 'sum'),
-        Payment_Approved=('payment_approved', 'sum'),
-        CPA_Cost=('cpa_cost_usd', 'sum'),
-        Bonus_Cost=('bonus_cost_usd', 'sum'),
-    ).reset_index()
-
-    geo_table['Reg2Dep'] = (geo_table['FTD'] / geo_table['Registrations'].replace(0, np.nan) * 100).round(1)
-    geo_table['Approval_%'] = (geo_table['Payment_Approved'] / geo_table['Payment_Attempts'].replace(0, np.nan) * 100).round(1)
-    geo_table['eCPA'] = (geo_table['CPA_Cost'] / geo_table['FTD'].replace(0, np.nan)).round(0)
+    geo_ratios = with_ratios(agg[('geo',)])
+    geo_table = geo_ratios.rename(columns={
+        'registrations': 'Registrations', 'ftd_count': 'FTD', 'ftd_amount_usd': 'FTD_Amount',
+        'net_revenue_usd': 'Net_Revenue',
+    })
+
+    geo_table['Reg2Dep'] = (geo_ratios['reg2dep'] * 100).round(1)
+    geo_table['Approval_%'] = (geo_ratios['approval_rate'] * 100).round(1)
+    geo_table['eCPA'] = geo_ratios['ecpa'].round(0)
 
     display_cols = ['geo', 'Registrations', 'FTD', 'Reg2Dep', 'FTD_Amount', 'Approval_%', 'Net_Revenue', 'eCPA']
     geo_display = geo_table[display_cols].sort_values('FTD_Amount', ascending=False)
     geo_display.columns = ['GEO', 'Regs', 'FTD', 'Reg2Dep %', 'FTD Amt $', 'Approval %', 'Net Rev $', 'eCPA $']
 
-    geo_styler = (
-        geo_display.style.format({
-            'Regs': '{:,.0f}', 'FTD': '{:,.0f}', 'Reg2Dep %': '{:.1f}%',
-            'FTD Amt $': '${:,.0f}', 'Approval %': '{:.1f}%', 
-            'Net Rev $': '${:,.0f}', 'eCPA $': '${:,.0f}'
-        }, na_rep="—")
-        .background_gradient(subset=['Reg2Dep %'], cmap=HEATMAP_CMAP, vmin=0, vmax=25)
-    )
-
-    if MODE == "dark":
-        # ✅ Dark Mode: keep existing interactive dataframe (unchanged)
-        st.dataframe(geo_styler, use_container_width=True, hide_index=True)
-    else:
-        # ✅ Light Mode: render HTML table for full SaaS styling
-        render_light_table(geo_styler)
+    heatmap_table(geo_display, {
+        'Regs': '{:,.0f}', 'FTD': '{:,.0f}', 'Reg2Dep %': '{:.1f}%',
+        'FTD Amt $': '${:,.0f}', 'Approval %': '{:.1f}%',
+        'Net Rev $': '${:,.0f}', 'eCPA $': '${:,.0f}'
+    }, {'Reg2Dep %': (0, 25)}, na_rep="—")
     
     # ════════════════════════════════════════════════════════════
     # ADVANCED BREAKDOWNS
@@ -1124,40 +1379,39 @@ with tab_exec:
     
     with adv_col1:
         # Traffic Source Performance with Reg2Dep
-        src_perf = df.groupby('traffic_source').agg(
-            Regs=('registrations', 'sum'),
-            FTD=('ftd_count', 'sum'),
-            Revenue=('net_revenue_usd', 'sum'),
-            CPA=('cpa_cost_usd', 'sum'),
-        ).reset_index()
-        src_perf['Reg2Dep'] = src_perf['FTD'] / src_perf['Regs'].replace(0, np.nan)
+        src_perf = with_ratios(agg[('traffic_source',)]).rename(columns={
+            'registrations': 'Regs', 'ftd_count': 'FTD', 'net_revenue_usd': 'Revenue',
+            'cpa_cost_usd': 'CPA', 'reg2dep': 'Reg2Dep',
+        })
         src_perf['ROI'] = ((src_perf['Revenue'] - src_perf['CPA']) / src_perf['CPA'].replace(0, np.nan))
         src_perf = src_perf.sort_values('Revenue', ascending=True)
         
-        fig_src = go.Figure()
-        fig_src.add_trace(go.Bar(
-            y=src_perf['traffic_source'], x=src_perf['Revenue'],
-            name='Net Revenue', orientation='h', marker_color=COLORS['green'],
-            text=src_perf['Reg2Dep'].apply(lambda x: f"{x:.1%}"),
-            textposition='inside', textfont=dict(color='white', size=11),
-        ))
+        def build_fig_src():
+            fig_src = go.Figure()
+            fig_src.add_trace(go.Bar(
+                y=src_perf['traffic_source'], x=src_perf['Revenue'],
+                name='Net Revenue', orientation='h', marker_color=COLORS['green'],
+                text=src_perf['Reg2Dep'].apply(lambda x: f"{x:.1%}"),
+                textposition='inside', textfont=dict(color='white', size=11),
+            ))
         
-        apply_layout(fig_src, MODE, title='📡 Traffic Source Performance (Revenue & Reg2Dep %)')
-        st.plotly_chart(fig_src, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_src, MODE, title='📡 Traffic Source Performance (Revenue & Reg2Dep %)')
+            return fig_src
+        show_chart('executive/source_performance', build_fig_src)
     
     with adv_col2:
         # Platform + Brand Matrix
-        plat_brand = df.groupby(['platform', 'brand']).agg(
-            FTD=('ftd_count', 'sum'),
-        ).reset_index()
+        plat_brand = agg[('platform', 'brand')].rename(columns={'ftd_count': 'FTD'})
         
-        fig_pb = px.sunburst(
-            plat_brand, path=['platform', 'brand'], values='FTD',
-            color='FTD', color_continuous_scale='Viridis',
-        )
-        apply_layout(fig_pb, MODE, title='📱🏷️ Platform × Brand Distribution')
-        fig_pb.update_traces(textinfo='label+percent parent')
-        st.plotly_chart(fig_pb, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_pb():
+            fig_pb = px.sunburst(
+                plat_brand, path=['platform', 'brand'], values='FTD',
+                color='FTD', color_continuous_scale='Viridis',
+            )
+            apply_layout(fig_pb, MODE, title='📱🏷️ Platform × Brand Distribution')
+            fig_pb.update_traces(textinfo='label+percent parent')
+            return fig_pb
+        show_chart('executive/platform_brand', build_fig_pb)
     
     # ════════════════════════════════════════════════════════════
     # CONVERSION FUNNEL SANKEY
@@ -1167,30 +1421,32 @@ with tab_exec:
     total_impressions = int(kpi['impressions'])
     total_clicks = int(kpi['clicks'])
     total_regs = int(kpi['registrations'])
-    total_attempts = int(df['payment_attempts'].sum())
-    total_approved = int(df['payment_approved'].sum())
+    total_attempts = int(totals['payment_attempts'])
+    total_approved = int(totals['payment_approved'])
     total_ftd = int(kpi['ftd_count'])
     
     # Sankey diagram for funnel
-    fig_sankey = go.Figure(data=[go.Sankey(
-        node=dict(
-            pad=15,
-            thickness=20,
-            line=dict(color="black", width=0.5),
-            label=["Impressions", "Clicks", "Registrations", "Payment Attempts", "Approved", "FTD"],
-            color=[COLORS['cyan'], COLORS['blue'], COLORS['purple'], COLORS['amber'], COLORS['green'], COLORS['green']],
-        ),
-        link=dict(
-            source=[0, 1, 2, 3, 4],
-            target=[1, 2, 3, 4, 5],
-            value=[total_clicks, total_regs, total_attempts, total_approved, total_ftd],
-            color=['rgba(91,141,239,0.3)', 'rgba(155,122,239,0.3)', 'rgba(240,176,90,0.3)', 
-                   'rgba(61,223,160,0.3)', 'rgba(61,223,160,0.5)'],
-        )
-    )])
+    def build_fig_sankey():
+        fig_sankey = go.Figure(data=[go.Sankey(
+            node=dict(
+                pad=15,
+                thickness=20,
+                line=dict(color="black", width=0.5),
+                label=["Impressions", "Clicks", "Registrations", "Payment Attempts", "Approved", "FTD"],
+                color=[COLORS['cyan'], COLORS['blue'], COLORS['purple'], COLORS['amber'], COLORS['green'], COLORS['green']],
+            ),
+            link=dict(
+                source=[0, 1, 2, 3, 4],
+                target=[1, 2, 3, 4, 5],
+                value=[total_clicks, total_regs, total_attempts, total_approved, total_ftd],
+                color=['rgba(91,141,239,0.3)', 'rgba(155,122,239,0.3)', 'rgba(240,176,90,0.3)', 
+                       'rgba(61,223,160,0.3)', 'rgba(61,223,160,0.5)'],
+            )
+        )])
     
-    apply_layout(fig_sankey, MODE, title='Conversion Funnel Flow', height=400)
-    st.plotly_chart(fig_sankey, use_container_width=True, config={'displayModeBar': False})
+        apply_layout(fig_sankey, MODE, title='Conversion Funnel Flow', height=400)
+        return fig_sankey
+    show_chart('executive/funnel_sankey', build_fig_sankey)
     
     # Add funnel metrics below
     funnel_cols = st.columns(6)
@@ -1207,25 +1463,91 @@ with tab_exec:
         with funnel_cols[i]:
             st.metric(stage, value, rate)
 
-# ═══════════════════════════════════════════════════
+KPI_LABELS = {
+    'payment_approval_rate': 'Approval Rate', 'reg2dep_conversion': 'Reg2Dep', 'avg_ftd_check': 'Avg FTD Check',
+    'effective_cpa': 'eCPA', 'net_revenue_per_ftd': 'Net Rev / FTD', 'ggr_margin': 'GGR Margin',
+}
+
+def render_kpi_breaches():
+    # Every DIM_KPI_Targets rule graded over every geo x brand x platform x traffic_source
+    # segment: the period totals give the ranked breaches, every segment-day the timeline
+    # (kpi_rules.py). The agent is not a segment dimension, so its filter cannot narrow them
+    started = time.perf_counter()
+    rules, segments = kpi_rules(dataset), segment_days(dataset)
+    if not len(rules):
+        st.info("DIM_KPI_Targets has no KPI that can be evaluated on the traffic data")
+        return
+
+    def compute():
+        mask = segments.select(key_filters(filter_key, filter_universe))
+        return (rank_breaches(rules, segments, start_date, end_date, mask),
+                alert_timeline(rules, segments, start_date, end_date, mask), int(mask.sum()))
+    breaches, timeline, n_segments = query_cache().get(
+        ('kpi_breaches', dataset.version, filter_key, start_date, end_date), compute)
+    n_days = timeline['date'].nunique()
+    n_critical = int((breaches['level'] == CRITICAL).sum())
+    st.caption(f"{len(rules)} rules × {n_segments:,} segments × {n_days} days "
+               f"({n_segments * n_days:,} segment-days) · {n_critical} critical and "
+               f"{len(breaches) - n_critical} warning breaches over the period"
+               + (" · the agent filter does not narrow segments" if dict(filter_key)['agent'] is not ALL else ""))
+
+    if timeline.empty:
+        return
+    # Segments past the warning threshold per day, stacked by KPI
+    timeline = timeline.assign(kpi=timeline['kpi_name'].map(lambda n: KPI_LABELS.get(n, n)),
+                               breaching=timeline['warning'] + timeline['critical'])
+    per_day = timeline.pivot(index='date', columns='kpi', values='breaching')[
+        [KPI_LABELS.get(n, n) for n in rules.names]].reset_index()
+    kpi_columns = list(per_day.columns[1:])
+
+    def build_fig_breaches(per_day):
+        fig_breaches = go.Figure()
+        for i, col in enumerate(kpi_columns):
+            fig_breaches.add_trace(go.Bar(x=per_day['date'], y=per_day[col], name=col,
+                                          marker_color=COLOR_SEQ[i % len(COLOR_SEQ)]))
+        apply_layout(fig_breaches, MODE, title='Segments Past Warning per Day', barmode='stack')
+        return fig_breaches
+    trend_chart('executive/kpi_breaches', per_day, build_fig_breaches, columns=kpi_columns, bars=True)
+
+    if not breaches.empty:
+        units = dataset.targets.set_index('kpi_name')['unit']
+
+        def fmt_kpi(name, value):
+            return f"{value:.1%}" if units[name] == '%' else f"${value:,.2f}" if units[name] == 'USD' else f"{value:,.2f}"
+        table = pd.DataFrame({
+            'Level': breaches['level'].map(LEVEL_NAMES),
+            'KPI': breaches['kpi_name'].map(lambda n: KPI_LABELS.get(n, n)),
+            **{d.replace('_', ' ').title(): breaches[d] for d in segments.dims},
+            'Value': [fmt_kpi(n, v) for n, v in zip(breaches['kpi_name'], breaches['value'])],
+            'Target': [fmt_kpi(n, v) for n, v in zip(breaches['kpi_name'], breaches['target'])],
+            'Volume': breaches['volume'],
+            'Drag': breaches['drag'],
+        })
+        paged_table('executive/kpi_breaches', table, {'Volume': '{:,.0f}', 'Drag': '{:.2%}'}, {'Drag': (0, 0.01)},
+                    sort_by='Drag', page_size=20, search_col='KPI')
+        st.caption("Drag: how far the segment pulls its KPI over the selected segments from target, "
+                   "relative to the target · volume is the KPI's denominator "
+                   "(registrations, payment attempts, FTDs or deposits)")
+    note_timing('KPI rules', started)
 
 # ═══════════════════════════════════════════════════
-# TAB 2: DAILY OPERATIONS
+# VIEW 2: DAILY OPERATIONS
 # ═══════════════════════════════════════════════════
-with tab_daily:
+def render_daily():
+    agg = view_rollups('daily')
     # ════════════════════════════════════════════════════════════
     # TODAY vs YESTERDAY KPI COMPARISON (FIRST!)
     # ════════════════════════════════════════════════════════════
     st.markdown('<div class="sec-label">Daily Change Analysis (vs Previous Day)</div>', unsafe_allow_html=True)
     
-    today_date = df['date'].max()
+    if agg[('date',)].empty:
+        st.info("Немає даних за вибраними фільтрами.")
+        return
+    today_date = agg[('date',)]['date'].max()
     yesterday_date = today_date - timedelta(days=1)
     
-    today_data = df[df['date'] == today_date]
-    yesterday_data = df[df['date'] == yesterday_date]
-    
-    today_kpi = compute_kpis(today_data)
-    yesterday_kpi = compute_kpis(yesterday_data)
+    today_kpi = window_kpis(today_date, today_date)
+    yesterday_kpi = window_kpis(yesterday_date, yesterday_date)
     
     st.markdown(f"**Today ({today_date.strftime('%Y-%m-%d')})** vs **Yesterday ({yesterday_date.strftime('%Y-%m-%d')})**")
     
@@ -1272,38 +1594,39 @@ with tab_daily:
     
     with platform_col1:
         # Platform - Regs vs FTD
-        plat_agg = df.groupby('platform').agg(
-            Regs=('registrations', 'sum'),
-            FTD=('ftd_count', 'sum'),
-        ).reset_index().sort_values('Regs', ascending=False)
+        plat_agg = with_ratios(agg[('platform',)]).rename(columns={
+            'registrations': 'Regs', 'ftd_count': 'FTD', 'reg2dep': 'Reg2Dep',
+        }).sort_values('Regs', ascending=False)
         
-        fig_plat = go.Figure()
-        fig_plat.add_trace(go.Bar(
-            x=plat_agg['platform'], y=plat_agg['Regs'],
-            name='Regs', marker_color=COLORS['blue'], opacity=0.8
-        ))
-        fig_plat.add_trace(go.Bar(
-            x=plat_agg['platform'], y=plat_agg['FTD'],
-            name='FTD', marker_color=COLORS['green']
-        ))
+        def build_fig_plat():
+            fig_plat = go.Figure()
+            fig_plat.add_trace(go.Bar(
+                x=plat_agg['platform'], y=plat_agg['Regs'],
+                name='Regs', marker_color=COLORS['blue'], opacity=0.8
+            ))
+            fig_plat.add_trace(go.Bar(
+                x=plat_agg['platform'], y=plat_agg['FTD'],
+                name='FTD', marker_color=COLORS['green']
+            ))
         
-        apply_layout(fig_plat, MODE, title='Regs vs FTD', barmode='group')
-        st.plotly_chart(fig_plat, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_plat, MODE, title='Regs vs FTD', barmode='group')
+            return fig_plat
+        show_chart('daily/platform_volume', build_fig_plat)
     
     with platform_col2:
         # Platform - Reg2Dep Conversion Rate
-        plat_agg['Reg2Dep'] = plat_agg['FTD'] / plat_agg['Regs'].replace(0, np.nan)
-        
-        fig_plat_conv = go.Figure()
-        fig_plat_conv.add_trace(go.Bar(
-            x=plat_agg['platform'], y=plat_agg['Reg2Dep'],
-            marker_color=COLORS['purple'],
-            text=plat_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
-            textposition='outside',
-        ))
+        def build_fig_plat_conv():
+            fig_plat_conv = go.Figure()
+            fig_plat_conv.add_trace(go.Bar(
+                x=plat_agg['platform'], y=plat_agg['Reg2Dep'],
+                marker_color=COLORS['purple'],
+                text=plat_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
+                textposition='outside',
+            ))
         
-        apply_layout(fig_plat_conv, MODE, title='Conversion Rate by Platform', yaxis_tickformat='.0%')
-        st.plotly_chart(fig_plat_conv, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_plat_conv, MODE, title='Conversion Rate by Platform', yaxis_tickformat='.0%')
+            return fig_plat_conv
+        show_chart('daily/platform_conversion', build_fig_plat_conv)
     
     # ════════════════════════════════════════════════════════════
     # REG METHODS
@@ -1314,38 +1637,39 @@ with tab_daily:
     
     with reg_col1:
         # Registration Methods - By Method (Horizontal bars)
-        reg_method_agg = df.groupby('reg_method').agg(
-            Regs=('registrations', 'sum'),
-            FTD=('ftd_count', 'sum'),
-        ).reset_index().sort_values('Regs', ascending=True)
+        reg_method_agg = with_ratios(agg[('reg_method',)]).rename(columns={
+            'registrations': 'Regs', 'ftd_count': 'FTD', 'reg2dep': 'Reg2Dep',
+        }).sort_values('Regs', ascending=True)
         
-        fig_rm = go.Figure()
-        fig_rm.add_trace(go.Bar(
-            y=reg_method_agg['reg_method'], x=reg_method_agg['Regs'],
-            name='Regs', orientation='h', marker_color=COLORS['blue'], opacity=0.8
-        ))
-        fig_rm.add_trace(go.Bar(
-            y=reg_method_agg['reg_method'], x=reg_method_agg['FTD'],
-            name='FTD', orientation='h', marker_color=COLORS['green']
-        ))
+        def build_fig_rm():
+            fig_rm = go.Figure()
+            fig_rm.add_trace(go.Bar(
+                y=reg_method_agg['reg_method'], x=reg_method_agg['Regs'],
+                name='Regs', orientation='h', marker_color=COLORS['blue'], opacity=0.8
+            ))
+            fig_rm.add_trace(go.Bar(
+                y=reg_method_agg['reg_method'], x=reg_method_agg['FTD'],
+                name='FTD', orientation='h', marker_color=COLORS['green']
+            ))
         
-        apply_layout(fig_rm, MODE, title='By Method', barmode='group')
-        st.plotly_chart(fig_rm, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_rm, MODE, title='By Method', barmode='group')
+            return fig_rm
+        show_chart('daily/reg_method_volume', build_fig_rm)
     
     with reg_col2:
         # Registration Methods - Conversion Rate
-        reg_method_agg['Reg2Dep'] = reg_method_agg['FTD'] / reg_method_agg['Regs'].replace(0, np.nan)
-        
-        fig_rm_conv = go.Figure()
-        fig_rm_conv.add_trace(go.Bar(
-            y=reg_method_agg['reg_method'], x=reg_method_agg['Reg2Dep'],
-            orientation='h', marker_color=COLORS['purple'],
-            text=reg_method_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
-            textposition='outside',
-        ))
+        def build_fig_rm_conv():
+            fig_rm_conv = go.Figure()
+            fig_rm_conv.add_trace(go.Bar(
+                y=reg_method_agg['reg_method'], x=reg_method_agg['Reg2Dep'],
+                orientation='h', marker_color=COLORS['purple'],
+                text=reg_method_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
+                textposition='outside',
+            ))
         
-        apply_layout(fig_rm_conv, MODE, title='Conversion Rate by Method', xaxis_tickformat='.0%')
-        st.plotly_chart(fig_rm_conv, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_rm_conv, MODE, title='Conversion Rate by Method', xaxis_tickformat='.0%')
+            return fig_rm_conv
+        show_chart('daily/reg_method_conversion', build_fig_rm_conv)
     
     # ════════════════════════════════════════════════════════════
     # ADDITIONAL INSIGHTS
@@ -1356,185 +1680,167 @@ with tab_daily:
     
     with insight_col1:
         # Traffic Source Performance
-        traffic_agg = df.groupby('traffic_source').agg(
-            Regs=('registrations', 'sum'),
-            FTD=('ftd_count', 'sum'),
-            Revenue=('net_revenue_usd', 'sum'),
-        ).reset_index()
-        traffic_agg['Reg2Dep'] = traffic_agg['FTD'] / traffic_agg['Regs'].replace(0, np.nan)
-        traffic_agg = traffic_agg.sort_values('Revenue', ascending=True)
+        # Same traffic_source roll-up as the Executive tab's src_perf
+        traffic_agg = with_ratios(agg[('traffic_source',)]).rename(columns={
+            'registrations': 'Regs', 'ftd_count': 'FTD', 'net_revenue_usd': 'Revenue', 'reg2dep': 'Reg2Dep',
+        }).sort_values('Revenue', ascending=True)
         
-        fig_traffic = go.Figure()
-        fig_traffic.add_trace(go.Bar(
-            y=traffic_agg['traffic_source'], x=traffic_agg['Revenue'],
-            orientation='h', marker_color=COLORS['cyan'],
-            text=traffic_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
-            textposition='inside', textfont=dict(color='white', size=11),
-        ))
+        def build_fig_traffic():
+            fig_traffic = go.Figure()
+            fig_traffic.add_trace(go.Bar(
+                y=traffic_agg['traffic_source'], x=traffic_agg['Revenue'],
+                orientation='h', marker_color=COLORS['cyan'],
+                text=traffic_agg['Reg2Dep'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
+                textposition='inside', textfont=dict(color='white', size=11),
+            ))
         
-        apply_layout(fig_traffic, MODE, title='📡 Traffic Source Revenue & Conversion')
-        st.plotly_chart(fig_traffic, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_traffic, MODE, title='📡 Traffic Source Revenue & Conversion')
+            return fig_traffic
+        show_chart('daily/source_revenue', build_fig_traffic)
     
     with insight_col2:
         # Top GEO Performance
-        geo_agg = df.groupby('geo').agg(
-            FTD=('ftd_count', 'sum'),
-            Revenue=('net_revenue_usd', 'sum'),
-        ).reset_index().sort_values('Revenue', ascending=False).head(10)
+        geo_agg = agg[('geo',)].rename(columns={
+            'ftd_count': 'FTD', 'net_revenue_usd': 'Revenue',
+        }).sort_values('Revenue', ascending=False).head(10)
         
-        fig_geo = go.Figure()
-        fig_geo.add_trace(go.Bar(
-            x=geo_agg['geo'], y=geo_agg['Revenue'],
-            marker_color=COLORS['green'],
-            text=geo_agg['FTD'].apply(lambda x: f"{int(x)} FTD"),
-            textposition='outside',
-        ))
+        def build_fig_geo():
+            fig_geo = go.Figure()
+            fig_geo.add_trace(go.Bar(
+                x=geo_agg['geo'], y=geo_agg['Revenue'],
+                marker_color=COLORS['green'],
+                text=geo_agg['FTD'].apply(lambda x: f"{int(x)} FTD"),
+                textposition='outside',
+            ))
         
-        apply_layout(fig_geo, MODE, title='🌍 Top 10 GEO by Revenue')
-        st.plotly_chart(fig_geo, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_geo, MODE, title='🌍 Top 10 GEO by Revenue')
+            return fig_geo
+        show_chart('daily/top_geo', build_fig_geo)
     
     # ════════════════════════════════════════════════════════════
     # DAILY OPERATIONS TABLE (AT THE END!)
     # ════════════════════════════════════════════════════════════
     st.markdown('<div class="sec-label">Daily Operations — Performance Table</div>', unsafe_allow_html=True)
     
-    daily_tbl = df.groupby('date').agg(
-        Regs=('registrations', 'sum'),
-        FTD=('ftd_count', 'sum'),
-        FTD_Amt=('ftd_amount_usd', 'sum'),
-        Net_Rev=('net_revenue_usd', 'sum'),
-        P_Att=('payment_attempts', 'sum'),
-        P_App=('payment_approved', 'sum'),
-    ).reset_index().sort_values('date', ascending=False)
-
-    daily_tbl['Reg2Dep'] = (daily_tbl['FTD'] / daily_tbl['Regs'].replace(0, np.nan) * 100).round(1)
-    daily_tbl['Approval'] = (daily_tbl['P_App'] / daily_tbl['P_Att'].replace(0, np.nan) * 100).round(1)
+    daily_tbl = with_ratios(agg[('date',)]).rename(columns={
+        'registrations': 'Regs', 'ftd_count': 'FTD', 'ftd_amount_usd': 'FTD_Amt', 'net_revenue_usd': 'Net_Rev',
+    })
+
+    daily_tbl['Reg2Dep'] = (daily_tbl['reg2dep'] * 100).round(1)
+    daily_tbl['Approval'] = (daily_tbl['approval_rate'] * 100).round(1)
     daily_tbl['Day'] = daily_tbl['date'].dt.strftime('%a')
     
-    display_daily = daily_tbl[['date', 'Day', 'Regs', 'FTD', 'Reg2Dep', 'FTD_Amt', 'Approval', 'Net_Rev']].head(30)
-    display_daily.columns = ['Date', 'Day', 'Regs', 'FTD', 'Reg2Dep %', 'FTD Amt $', 'Approval %', 'Net Rev $']
-
-    daily_styler = (
-        display_daily.style.format({
-            'Date': lambda x: x.strftime('%b %d'),
-            'Regs': '{:,.0f}',
-            'FTD': '{:,.0f}',
-            'Reg2Dep %': '{:.1f}%',
-            'FTD Amt $': '${:,.0f}',
-            'Approval %': '{:.1f}%',
-            'Net Rev $': '${:,.0f}'
-        })
-        .background_gradient(subset=['Reg2Dep %'], cmap=HEATMAP_CMAP, vmin=0, vmax=25)
-        .background_gradient(subset=['Approval %'], cmap=HEATMAP_CMAP, vmin=50, vmax=95)
-    )
-
-    if MODE == "dark":
-        # ✅ Dark Mode: keep existing interactive dataframe (unchanged)
-        st.dataframe(daily_styler, use_container_width=True, hide_index=True, height=500)
-    else:
-        # ✅ Light Mode: render HTML table for full SaaS styling
-        render_light_table(daily_styler, height=500)
+    display_daily = daily_tbl[['date', 'Day', 'Regs', 'FTD', 'Reg2Dep', 'FTD_Amt', 'Approval', 'Net_Rev']].set_axis(
+        ['Date', 'Day', 'Regs', 'FTD', 'Reg2Dep %', 'FTD Amt $', 'Approval %', 'Net Rev $'], axis=1)
+
+    # Whole period, 30 days a page (newest first)
+    paged_table('daily/operations', display_daily, {
+        'Date': lambda x: x.strftime('%b %d'),
+        'Regs': '{:,.0f}',
+        'FTD': '{:,.0f}',
+        'Reg2Dep %': '{:.1f}%',
+        'FTD Amt $': '${:,.0f}',
+        'Approval %': '{:.1f}%',
+        'Net Rev $': '${:,.0f}'
+    }, {'Reg2Dep %': (0, 25), 'Approval %': (50, 95)}, sort_by='Date', page_size=30, height=500)
 
 # ═══════════════════════════════════════════════════
-# TAB 3: WEEKLY TRENDS
+# VIEW 3: WEEKLY TRENDS
 # ═══════════════════════════════════════════════════
-with tab_weekly:
+def render_weekly():
     st.markdown('<div class="sec-label">Weekly Trends</div>', unsafe_allow_html=True)
     
-    df_full = filter_traffic(df_traffic, min_date, max_date, selected_geos, selected_brands, selected_platforms, selected_sources, selected_agents)
-    weekly = df_full.copy()
-    weekly['week'] = weekly['date'].dt.isocalendar().week.astype(int)
-    weekly['year'] = weekly['date'].dt.year
-    
-    wk = weekly.groupby(['year', 'week']).agg(
-        regs=('registrations', 'sum'),
-        ftd=('ftd_count', 'sum'),
-        ftd_amt=('ftd_amount_usd', 'sum'),
-        net_rev=('net_revenue_usd', 'sum'),
-        cpa=('cpa_cost_usd', 'sum'),
-        bonus=('bonus_cost_usd', 'sum'),
-        attempts=('payment_attempts', 'sum'),
-        approved=('payment_approved', 'sum'),
-    ).reset_index()
+    # Served from the materialized (ISO week × segment) roll-up — no daily rows touched
+    weekly_index = traffic_index(dataset, 'weekly')
+    wk = rollups(dataset, 'weekly', filter_key, weekly_index.min_date, weekly_index.max_date,
+                 [('week_start',)])[('week_start',)].rename(columns={
+        'registrations': 'regs', 'ftd_count': 'ftd', 'ftd_amount_usd': 'ftd_amt', 'net_revenue_usd': 'net_rev',
+        'cpa_cost_usd': 'cpa', 'bonus_cost_usd': 'bonus', 'payment_attempts': 'attempts',
+        'payment_approved': 'approved',
+    })
+    week_cal = calendar(weekly_index.day0, weekly_index.n_days).set_index('date')
+    wk = wk.join(week_cal[['iso_year', 'iso_week']], on='week_start')
     
     wk['reg2dep'] = wk['ftd'] / wk['regs'].replace(0, np.nan)
     wk['approval_rate'] = wk['approved'] / wk['attempts'].replace(0, np.nan)
     wk['ecpa'] = wk['cpa'] / wk['ftd'].replace(0, np.nan)
     wk['roi'] = ((wk['net_rev'] - wk['cpa'] - wk['bonus']) / (wk['cpa'] + wk['bonus']).replace(0, np.nan))
-    wk['period'] = wk['year'].astype(str) + '-W' + wk['week'].astype(str).str.zfill(2)
-    wk = wk.sort_values(['year', 'week'], ascending=False)
+    wk['period'] = wk['iso_year'].astype(str) + '-W' + wk['iso_week'].astype(str).str.zfill(2)
+    wk = wk.sort_values('week_start', ascending=False)
     
     col_w1, col_w2 = st.columns(2)
     
     with col_w1:
-        fig_wv = make_subplots(specs=[[{"secondary_y": True}]])
-        fig_wv.add_trace(go.Bar(x=wk['period'][::-1], y=wk['regs'][::-1], name='Registrations',
-                                marker_color=COLORS['blue'], opacity=0.5), secondary_y=False)
-        fig_wv.add_trace(go.Scatter(x=wk['period'][::-1], y=wk['ftd'][::-1], name='FTD',
-                                    line=dict(color=COLORS['green'], width=2.5)), secondary_y=True)
-        apply_layout(fig_wv, MODE, title='Weekly Volume')
-        fig_wv.update_yaxes(title_text="Registrations", secondary_y=False)
-        fig_wv.update_yaxes(title_text="FTD", secondary_y=True)
-        st.plotly_chart(fig_wv, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_wv():
+            fig_wv = make_subplots(specs=[[{"secondary_y": True}]])
+            fig_wv.add_trace(go.Bar(x=wk['period'][::-1], y=wk['regs'][::-1], name='Registrations',
+                                    marker_color=COLORS['blue'], opacity=0.5), secondary_y=False)
+            fig_wv.add_trace(go.Scatter(x=wk['period'][::-1], y=wk['ftd'][::-1], name='FTD',
+                                        line=dict(color=COLORS['green'], width=2.5)), secondary_y=True)
+            apply_layout(fig_wv, MODE, title='Weekly Volume')
+            fig_wv.update_yaxes(title_text="Registrations", secondary_y=False)
+            fig_wv.update_yaxes(title_text="FTD", secondary_y=True)
+            return fig_wv
+        show_chart('weekly/volume', build_fig_wv)
     
     with col_w2:
-        fig_wr = go.Figure()
-        fig_wr.add_trace(go.Bar(x=wk['period'][::-1], y=wk['net_rev'][::-1], name='Net Revenue',
-                                marker_color=COLORS['green']))
-        apply_layout(fig_wr, MODE, title='Weekly Revenue')
-        st.plotly_chart(fig_wr, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_wr():
+            fig_wr = go.Figure()
+            fig_wr.add_trace(go.Bar(x=wk['period'][::-1], y=wk['net_rev'][::-1], name='Net Revenue',
+                                    marker_color=COLORS['green']))
+            apply_layout(fig_wr, MODE, title='Weekly Revenue')
+            return fig_wr
+        show_chart('weekly/revenue', build_fig_wr)
     
     # ════════════════════════════════════════════════════════════
     # WEEKLY SUMMARY TABLE
     # ════════════════════════════════════════════════════════════
     st.markdown('<div class="sec-label">📊 Weekly Summary</div>', unsafe_allow_html=True)
     
-    wk_display = wk[['period', 'regs', 'ftd', 'reg2dep', 'ftd_amt', 'approval_rate', 'net_rev', 'ecpa', 'roi']].copy()
-    wk_display.columns = ['Week', 'Regs', 'FTD', 'Reg2Dep', 'FTD Amt $', 'Approval %', 'Net Rev $', 'eCPA $', 'ROI']
+    wk_display = wk[['period', 'regs', 'ftd', 'reg2dep', 'ftd_amt', 'approval_rate', 'net_rev', 'ecpa', 'roi']].set_axis(
+        ['Week', 'Regs', 'FTD', 'Reg2Dep', 'FTD Amt $', 'Approval %', 'Net Rev $', 'eCPA $', 'ROI'], axis=1)
     
-    wk_styler = (
-        wk_display.style.format({
-            'Regs': '{:,.0f}', 'FTD': '{:,.0f}', 'Reg2Dep': '{:.1%}',
-            'FTD Amt $': '${:,.0f}', 'Approval %': '{:.1%}',
-            'Net Rev $': '${:,.0f}', 'eCPA $': '${:,.0f}', 'ROI': '{:.1%}'
-        })
-        .background_gradient(subset=['Reg2Dep'], cmap=HEATMAP_CMAP, vmin=0, vmax=0.25)
-        .background_gradient(subset=['Approval %'], cmap=HEATMAP_CMAP, vmin=0.5, vmax=0.95)
-        .background_gradient(subset=['ROI'], cmap=HEATMAP_CMAP, vmin=-0.5, vmax=0.5)
-    )
-
-    if MODE == "dark":
-        # ✅ Dark Mode: keep existing interactive dataframe (unchanged)
-        st.dataframe(wk_styler, use_container_width=True, hide_index=True, height=500)
-    else:
-        # ✅ Light Mode: render HTML table for full SaaS styling
-        render_light_table(wk_styler, height=500)
+    heatmap_table(wk_display, {
+        'Regs': '{:,.0f}', 'FTD': '{:,.0f}', 'Reg2Dep': '{:.1%}',
+        'FTD Amt $': '${:,.0f}', 'Approval %': '{:.1%}',
+        'Net Rev $': '${:,.0f}', 'eCPA $': '${:,.0f}', 'ROI': '{:.1%}'
+    }, {'Reg2Dep': (0, 0.25), 'Approval %': (0.5, 0.95), 'ROI': (-0.5, 0.5)}, height=500)
 
 # ═══════════════════════════════════════════════════
-# TAB 4: PAYMENT & CONVERSION HEALTH
+# VIEW 4: PAYMENT & CONVERSION HEALTH
 # ═══════════════════════════════════════════════════
-with tab_payments:
+def render_payments():
+    agg = view_rollups('payments')
     st.markdown('<div class="sec-label">Payment & Conversion Health</div>', unsafe_allow_html=True)
+
+    # FACT_Payments is per (date, geo, payment_method): the period and geos are
+    # sliced out of the payments cube, other sidebar filters cannot apply to it
+    payments = payments_cube(dataset)
+    pm_daily = payments.daily(start_date, end_date, selected_geos)
+    unpushed = [label for dim, label in (('brand', 'brand'), ('platform', 'platform'),
+                                         ('traffic_source', 'traffic source'), ('agent', 'agent'))
+                if dict(filter_key)[dim] is not ALL]
+    if unpushed:
+        st.caption(f"ℹ️ Payment data is recorded per geo and payment method only — the {', '.join(unpushed)} "
+                   f"filter{'s' if len(unpushed) > 1 else ''} do{'' if len(unpushed) > 1 else 'es'} not narrow "
+                   f"the current-hour, method and status figures below.")
     
     # ════════════════════════════════════════════════════════════
     # CURRENT HOUR APPROVAL RATE ALERT
     # ════════════════════════════════════════════════════════════
+    # Newest bucket of the payments ring: the current hour when the workbook has
+    # FACT_Payments_Hourly, else only the latest day (and the card says so)
+    ring = payments_ring(dataset)
+    hourly = ring.bucket <= pd.Timedelta(hours=1)
+    bucket_label, stamp_format = ("Hour", '%Y-%m-%d %H:00') if hourly else ("Day", '%Y-%m-%d')
     try:
-        # Get current hour data (using latest hour in dataset as "current")
-        pm = df_payments[
-            (df_payments['date'].dt.date >= start_date) &
-            (df_payments['date'].dt.date <= end_date) &
-            (df_payments['geo'].isin(selected_geos))
-        ].copy()
-        
-        if not pm.empty:
-            # Get latest hour
-            latest_date = pm['date'].max()
-            current_hour_data = pm[pm['date'] == latest_date]
+        if ring.latest is not None:
+            current_hour_data = ring.window(1, selected_geos)
+            latest_date = ring.latest
             
-            if not current_hour_data.empty:
-                hour_attempts = current_hour_data['txn_count'].sum()
-                hour_approved = current_hour_data['approved_count'].sum()
+            if current_hour_data['txn_count']:
+                hour_attempts = current_hour_data['txn_count']
+                hour_approved = current_hour_data['approved_count']
                 hour_ar = safe_div(hour_approved, hour_attempts)
                 
                 # Determine status
@@ -1561,7 +1867,7 @@ with tab_payments:
                     text-align: center;
                 ">
                     <div style="font-size: 11px; color: #8B90AD; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 8px;">
-                        Current Hour Approval Rate
+                        {'Current Hour' if hourly else 'Latest Day'} Approval Rate
                     </div>
                     <div style="font-family: 'JetBrains Mono', monospace; font-size: 48px; font-weight: 700; color: {alert_color}; margin-bottom: 8px;">
                         {hour_ar*100:.1f}%
@@ -1570,21 +1876,40 @@ with tab_payments:
                         {status}
                     </div>
                     <div style="font-size: 13px; color: #8B90AD;">
-                        {int(hour_attempts)} attempts · {latest_date.strftime('%Y-%m-%d %H:00')}
+                        {int(hour_attempts)} attempts · {latest_date.strftime(stamp_format)}
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
+
+                # Rolling last 24 buckets, from the same ring
+                recent = ring.series(24, selected_geos)
+                recent['approval_rate'] = recent['approved_count'] / recent['txn_count'].replace(0, np.nan)
+
+                def build_fig_recent():
+                    fig_recent = go.Figure(go.Scatter(
+                        x=recent['date'], y=recent['approval_rate'], mode='lines',
+                        line=dict(color=alert_color, width=2), fill='tozeroy', connectgaps=False,
+                    ))
+                    fig_recent.add_hline(y=0.85, line_dash="dot", line_color=COLORS['amber'])
+                    apply_layout(fig_recent, MODE, title=f'Approval Rate · last 24 {bucket_label.lower()}s',
+                                 height=180, margin=dict(l=20, r=20, t=40, b=20), showlegend=False,
+                                 yaxis_tickformat='.0%')
+                    return fig_recent
+                show_chart(('payments/recent_approval', latest_date), build_fig_recent)
+            else:
+                st.info(f"No payment attempts in the latest {bucket_label.lower()} "
+                        f"({latest_date.strftime(stamp_format)}) for the selected geos")
     except Exception as e:
         st.info("Current hour data unavailable")
     
     st.markdown("#### Payment Funnel")
     funnel_cols = st.columns(6)
     
-    clicks = int(df['clicks'].sum())
-    regs = int(df['registrations'].sum())
-    attempts = int(df['payment_attempts'].sum())
-    approved = int(df['payment_approved'].sum())
-    ftd = int(df['ftd_count'].sum())
+    clicks = int(totals['clicks'])
+    regs = int(totals['registrations'])
+    attempts = int(totals['payment_attempts'])
+    approved = int(totals['payment_approved'])
+    ftd = int(totals['ftd_count'])
     
     with funnel_cols[0]:
         st.metric("Clicks", fmt_num(clicks))
@@ -1608,30 +1933,27 @@ with tab_payments:
     
     with ar_col1:
         # Daily Approval Rate Trend
-        trend = df.groupby('date').agg(
-            attempts=('payment_attempts', 'sum'),
-            approved=('payment_approved', 'sum'),
-        ).reset_index()
-        trend['approval_rate'] = trend['approved'] / trend['attempts'].replace(0, np.nan)
+        trend = with_ratios(agg[('date',)])
         trend['ma7'] = trend['approval_rate'].rolling(7, min_periods=1).mean()
         
-        fig_ap = go.Figure()
-        fig_ap.add_trace(go.Scatter(x=trend['date'], y=trend['approval_rate'],
-                                    name='Daily AR', line=dict(color=COLORS['green'], width=1), opacity=0.4))
-        fig_ap.add_trace(go.Scatter(x=trend['date'], y=trend['ma7'],
-                                    name='7-day MA', line=dict(color=COLORS['green'], width=2.5)))
-        fig_ap.add_hline(y=0.85, line_dash="dot", line_color=COLORS['amber'], 
-                         annotation_text="Target 85%")
-        apply_layout(fig_ap, MODE, title='Daily Approval Rate', yaxis_tickformat='.0%')
-        st.plotly_chart(fig_ap, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_ap(trend):
+            Scatter = scatter_type(len(trend))
+            fig_ap = go.Figure()
+            fig_ap.add_trace(Scatter(x=trend['date'], y=trend['approval_rate'],
+                                     name='Daily AR', line=dict(color=COLORS['green'], width=1), opacity=0.4))
+            fig_ap.add_trace(Scatter(x=trend['date'], y=trend['ma7'],
+                                     name='7-day MA', line=dict(color=COLORS['green'], width=2.5)))
+            fig_ap.add_hline(y=0.85, line_dash="dot", line_color=COLORS['amber'], 
+                             annotation_text="Target 85%")
+            apply_layout(fig_ap, MODE, title='Daily Approval Rate', yaxis_tickformat='.0%')
+            return fig_ap
+        trend_chart('payments/approval_trend', trend, build_fig_ap, columns=['approval_rate', 'ma7'])
     
     with ar_col2:
         # AR by Payment Method
-        if not pm.empty:
-            pm_method = pm.groupby('payment_method').agg(
-                Attempts=('txn_count', 'sum'),
-                Approved=('approved_count', 'sum'),
-            ).reset_index()
+        if not pm_daily.empty:
+            pm_method = payments.window(start_date, end_date, selected_geos, by='payment_method').rename(
+                columns={'txn_count': 'Attempts', 'approved_count': 'Approved'})
             pm_method['AR'] = pm_method['Approved'] / pm_method['Attempts'].replace(0, np.nan)
             pm_method = pm_method.sort_values('AR', ascending=True)
             
@@ -1640,51 +1962,46 @@ with tab_payments:
                                            else COLORS['amber'] if x >= 0.75 
                                            else COLORS['red']).tolist()
             
-            fig_pm = go.Figure()
-            fig_pm.add_trace(go.Bar(
-                y=pm_method['payment_method'], x=pm_method['AR'],
-                orientation='h', marker_color=colors,
-                text=pm_method['AR'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
-                textposition='outside',
-            ))
-            fig_pm.add_vline(x=0.85, line_dash="dot", line_color=COLORS['amber'],
-                            annotation_text="Target")
-            apply_layout(fig_pm, MODE, title='AR by Payment Method', xaxis_tickformat='.0%')
-            st.plotly_chart(fig_pm, use_container_width=True, config={'displayModeBar': False})
+            def build_fig_pm():
+                fig_pm = go.Figure()
+                fig_pm.add_trace(go.Bar(
+                    y=pm_method['payment_method'], x=pm_method['AR'],
+                    orientation='h', marker_color=colors,
+                    text=pm_method['AR'].apply(lambda x: f"{x:.1%}" if pd.notna(x) else ""),
+                    textposition='outside',
+                ))
+                fig_pm.add_vline(x=0.85, line_dash="dot", line_color=COLORS['amber'],
+                                annotation_text="Target")
+                apply_layout(fig_pm, MODE, title='AR by Payment Method', xaxis_tickformat='.0%')
+                return fig_pm
+            show_chart('payments/method_approval', build_fig_pm)
     
     # ════════════════════════════════════════════════════════════
     # STATUS BREAKDOWN
     # ════════════════════════════════════════════════════════════
     st.markdown('<div class="sec-label">📊 Payment Status Breakdown (Daily)</div>', unsafe_allow_html=True)
     
-    if not pm.empty:
-        # Daily status breakdown - check which columns exist
-        available_cols = pm.columns.tolist()
-        
-        agg_dict = {
-            'Approved': ('approved_count', 'sum'),
-            'Declined': ('declined_count', 'sum'),
-        }
-        
-        # Add pending if it exists
-        if 'pending_count' in available_cols:
-            agg_dict['Pending'] = ('pending_count', 'sum')
-        
-        status_daily = pm.groupby('date').agg(**agg_dict).reset_index()
+    if not pm_daily.empty:
+        # Daily status breakdown - pending only if the sheet records it
+        status_names = {'approved_count': 'Approved', 'declined_count': 'Declined', 'pending_count': 'Pending'}
+        status_daily = pm_daily[['date', *(c for c in status_names if c in payments.measures)]].rename(columns=status_names)
         
         # Create figure
-        fig_status = go.Figure()
-        fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Approved'],
-                                   name='Approved', marker_color=COLORS['green']))
-        fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Declined'],
-                                   name='Declined', marker_color=COLORS['red']))
+        def build_fig_status(status_daily):
+            fig_status = go.Figure()
+            fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Approved'],
+                                       name='Approved', marker_color=COLORS['green']))
+            fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Declined'],
+                                       name='Declined', marker_color=COLORS['red']))
         
-        if 'Pending' in status_daily.columns:
-            fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Pending'],
-                                       name='Pending', marker_color=COLORS['amber']))
+            if 'Pending' in status_daily.columns:
+                fig_status.add_trace(go.Bar(x=status_daily['date'], y=status_daily['Pending'],
+                                           name='Pending', marker_color=COLORS['amber']))
         
-        apply_layout(fig_status, MODE, title='Payment Status Breakdown', barmode='stack')
-        st.plotly_chart(fig_status, use_container_width=True, config={'displayModeBar': False})
+            apply_layout(fig_status, MODE, title='Payment Status Breakdown', barmode='stack')
+            return fig_status
+        trend_chart('payments/status_breakdown', status_daily, build_fig_status,
+                    columns=[c for c in ('Approved', 'Declined', 'Pending') if c in status_daily.columns], bars=True)
         
         # Status summary
         total_approved = int(status_daily['Approved'].sum())
@@ -1706,41 +2023,208 @@ with tab_payments:
             else:
                 st.metric("⏳ Pending", "0", "0%")
 
+    # ════════════════════════════════════════════════════════════
+    # PSP LATENCY & TICKET SIZE
+    # ════════════════════════════════════════════════════════════
+    st.markdown('<div class="sec-label">⏱️ PSP Latency & Ticket Size</div>', unsafe_allow_html=True)
+
+    # Per (day, geo, method) quantile sketches merged for the period and geos (payments_store.py)
+    sketches = payments_sketches(dataset)
+    latency = sketches.quantiles('processing_time_sec', start_date, end_date, selected_geos)
+    ticket = sketches.quantiles('avg_txn_usd', start_date, end_date, selected_geos)
+
+    if not latency.empty:
+        lat_col, size_col = st.columns(2)
+
+        with lat_col:
+            latency = latency.sort_values('p95', ascending=True)
+
+            def build_fig_latency():
+                fig_latency = go.Figure()
+                fig_latency.add_trace(go.Bar(
+                    y=latency['payment_method'], x=latency['p95'], orientation='h',
+                    name='p95', marker_color=COLORS['blue'],
+                    text=latency['p95'].map(lambda x: f"{x:.1f}s"), textposition='outside',
+                ))
+                fig_latency.add_trace(go.Scatter(
+                    y=latency['payment_method'], x=latency['p50'], mode='markers',
+                    name='p50', marker=dict(color=COLORS['amber'], size=8, symbol='diamond'),
+                ))
+                apply_layout(fig_latency, MODE, title='PSP Latency p95 by Method', xaxis_title='seconds')
+                return fig_latency
+            show_chart('payments/latency_p95', build_fig_latency)
+
+        with size_col:
+            quantile_table = latency[['payment_method', 'weight', 'p50', 'p95', 'p99']].merge(
+                ticket[['payment_method', 'p50', 'p95']], on='payment_method', suffixes=('', ' $'))
+            quantile_table = quantile_table.sort_values('p95', ascending=False).rename(columns={
+                'payment_method': 'Method', 'weight': 'Txns',
+                'p50': 'p50 s', 'p95': 'p95 s', 'p99': 'p99 s', 'p50 $': 'Ticket p50', 'p95 $': 'Ticket p95',
+            })
+            heatmap_table(quantile_table, {
+                'Txns': '{:,.0f}', 'p50 s': '{:.1f}', 'p95 s': '{:.1f}', 'p99 s': '{:.1f}',
+                'Ticket p50': '${:,.0f}', 'Ticket p95': '${:,.0f}',
+            }, {}, height=420)
+
+        alpha = max(b.alpha for b in sketches.buckets.values())
+        st.caption(f"Quantiles over transactions, each at its day's average for the geo and method "
+                   f"(FACT_Payments holds daily averages) · sketch error ≤ {alpha:.0%} of the value")
+
+    # ════════════════════════════════════════════════════════════
+    # CHARGEBACKS
+    # ════════════════════════════════════════════════════════════
+    st.markdown('<div class="sec-label">↩️ Chargebacks</div>', unsafe_allow_html=True)
+    render_chargebacks(payments)
+
+CHARGEBACK_MEASURES = ('chargeback_count', 'chargeback_amount_usd', 'approved_count', 'approved_amount_usd')
+
+def render_chargebacks(payments):
+    # Chargeback rate = chargebacks / approved payments, against the 'chargeback_rate'
+    # row of DIM_KPI_Targets. Every figure is a slice of the payments cube's additive
+    # measures (period x geos, by method / geo / week): no pass over FACT_Payments
+    started = time.perf_counter()
+    if not set(CHARGEBACK_MEASURES) <= set(payments.measures):
+        st.info("FACT_Payments has no chargeback columns")
+        return
+    by_geo = payments.window(start_date, end_date, selected_geos, by='geo')
+    if by_geo.empty:
+        st.info("Немає даних за вибраними фільтрами.")
+        return
+    cb_kpi = thresholds(dataset.targets, 'chargeback_rate')
+
+    def with_cb_rate(frame):
+        frame['cb_rate'] = frame['chargeback_count'] / frame['approved_count'].replace(0, np.nan)
+        return frame
+
+    cb_count, cb_amount = by_geo['chargeback_count'].sum(), by_geo['chargeback_amount_usd'].sum()
+    cb_rate = safe_div(cb_count, by_geo['approved_count'].sum())
+    cb_cols = st.columns(4)
+    with cb_cols[0]:
+        st.metric("Chargebacks", fmt_num(cb_count))
+    with cb_cols[1]:
+        st.metric("CB Amount", fmt_money(cb_amount))
+    with cb_cols[2]:
+        st.metric("CB Rate", f"{cb_rate:.2%}", f"{cb_rate - cb_kpi['target']:+.2%} vs target",
+                  delta_color='inverse' if cb_kpi['lower_better'] else 'normal')
+    with cb_cols[3]:
+        st.metric("CB Amount Rate", f"{safe_div(cb_amount, by_geo['approved_amount_usd'].sum()):.2%}")
+
+    # Weekly trend vs the target and its thresholds
+    weekly = with_cb_rate(payments.weekly(start_date, end_date, selected_geos))
+
+    def build_fig_cb_trend():
+        fig_cb = go.Figure()
+        fig_cb.add_trace(go.Bar(x=weekly['week_start'], y=weekly['chargeback_count'], name='Chargebacks',
+                                marker_color=COLORS['purple'], opacity=0.35, yaxis='y2'))
+        fig_cb.add_trace(go.Scatter(x=weekly['week_start'], y=weekly['cb_rate'], name='CB rate',
+                                    mode='lines+markers', line=dict(color=COLORS['blue'], width=2.5)))
+        for level, color, dash in (('target', 'green', 'dot'), ('warning', 'amber', 'dot'), ('critical', 'red', 'dash')):
+            fig_cb.add_hline(y=cb_kpi[level], line_dash=dash, line_color=COLORS[color],
+                             annotation_text=f"{level.title()} {cb_kpi[level]:.1%}")
+        apply_layout(fig_cb, MODE, title='Weekly Chargeback Rate vs Target', yaxis_tickformat='.1%')
+        fig_cb.update_layout(yaxis2=dict(overlaying='y', side='right', showgrid=False))
+        return fig_cb
+    show_chart('payments/chargeback_trend', build_fig_cb_trend)
+
+    # By payment method and by geo, coloured against the target
+    def rate_bars(frame, label, title):
+        frame = with_cb_rate(frame).sort_values('cb_rate', ascending=False)
+
+        def build():
+            fig = go.Figure(go.Bar(
+                y=frame[label], x=frame['cb_rate'], orientation='h',
+                marker_color=[kpi_color(x, cb_kpi) for x in frame['cb_rate']],
+                text=frame['cb_rate'].apply(lambda x: f"{x:.2%}" if pd.notna(x) else ""),
+                textposition='outside',
+            ))
+            fig.add_vline(x=cb_kpi['target'], line_dash="dot", line_color=COLORS['green'], annotation_text="Target")
+            apply_layout(fig, MODE, title=title, xaxis_tickformat='.1%')
+            return fig
+        return build
+
+    method_col, geo_col = st.columns(2)
+    with method_col:
+        show_chart('payments/chargeback_method', rate_bars(
+            payments.window(start_date, end_date, selected_geos, by='payment_method'), 'payment_method',
+            'Chargeback Rate by Method'))
+    with geo_col:
+        show_chart('payments/chargeback_geo', rate_bars(by_geo, 'geo', 'Chargeback Rate by Geo'))
+
+    st.caption(f"Chargeback rate = chargebacks / approved payments · target {cb_kpi['target']:.1%}, "
+               f"warning {cb_kpi['warning']:.1%}, critical {cb_kpi['critical']:.1%} (DIM_KPI_Targets) · "
+               f"weeks run Monday–Sunday, the first and last cut to the period")
+    note_timing('Chargebacks', started)
+
+@st.fragment
+def agent_deep_dive(agents):
+    # Picking an agent reruns only this section
+    started = time.perf_counter()
+    selected_agent = st.selectbox("Select agent for detailed analysis:", [''] + agents)
+    
+    if selected_agent:
+        agent_key = tuple((d, (selected_agent,) if d == 'agent' else v) for d, v in filter_key)
+        agent_data = with_ratios(rollups(dataset, 'cube', agent_key, start_date, end_date,
+                                         [('date',)])[('date',)]).rename(columns={
+            'registrations': 'Regs', 'ftd_count': 'FTD', 'net_revenue_usd': 'Revenue', 'reg2dep': 'Reg2FTD',
+        })
+        
+        deep_col1, deep_col2 = st.columns(2)
+        
+        with deep_col1:
+            def build_fig_agent_vol():
+                fig_agent_vol = go.Figure()
+                fig_agent_vol.add_trace(go.Bar(x=agent_data['date'], y=agent_data['Regs'],
+                                              name='Regs', marker_color=COLORS['blue']))
+                fig_agent_vol.add_trace(go.Scatter(x=agent_data['date'], y=agent_data['FTD'],
+                                                   name='FTD', line=dict(color=COLORS['green'], width=2),
+                                                   yaxis='y2'))
+                apply_layout(fig_agent_vol, MODE, title=f'{selected_agent} - Volume Trend')
+                fig_agent_vol.update_layout(yaxis2=dict(overlaying='y', side='right'))
+                return fig_agent_vol
+            show_chart(f'agents/deep_dive_volume:{selected_agent}', build_fig_agent_vol)
+        
+        with deep_col2:
+            def build_fig_agent_cr():
+                fig_agent_cr = go.Figure()
+                fig_agent_cr.add_trace(go.Scatter(x=agent_data['date'], y=agent_data['Reg2FTD'],
+                                                  line=dict(color=COLORS['purple'], width=2),
+                                                  fill='tozeroy'))
+                apply_layout(fig_agent_cr, MODE, title=f'{selected_agent} - Conversion Rate',
+                            yaxis_tickformat='.0%')
+                return fig_agent_cr
+            show_chart(f'agents/deep_dive_conversion:{selected_agent}', build_fig_agent_cr)
+    note_timing('Agent Deep Dive', started)
+
 # ═══════════════════════════════════════════════════
-# TAB 5: TRAFFIC & AGENT EFFICIENCY
+# VIEW 5: TRAFFIC & AGENT EFFICIENCY
 # ═══════════════════════════════════════════════════
-with tab_agents:
+def render_agents():
+    agg = view_rollups('agents')
     st.markdown('<div class="sec-label">Traffic & Agent Efficiency</div>', unsafe_allow_html=True)
     
-    a = df.copy()
-    if a.empty:
+    if agg[('agent',)].empty:
         st.info("Немає даних за вибраними фільтрами.")
     else:
         # ════════════════════════════════════════════════════════════
         # TOP PERFORMERS & KEY METRICS
         # ════════════════════════════════════════════════════════════
-        agg = a.groupby('agent', as_index=False).agg(
-            Clicks=('clicks','sum'),
-            Regs=('registrations','sum'),
-            FTD=('ftd_count','sum'),
-            FTD_Amt=('ftd_amount_usd','sum'),
-            Net_Rev=('net_revenue_usd','sum'),
-            CPA=('cpa_cost_usd','sum'),
-            Attempts=('payment_attempts','sum'),
-            Approved=('payment_approved','sum'),
-        )
-        
-        agg['Reg2FTD %'] = agg['FTD'] / agg['Regs'].replace(0, np.nan)
-        agg['Click2Reg %'] = agg['Regs'] / agg['Clicks'].replace(0, np.nan)
-        agg['Approval %'] = agg['Approved'] / agg['Attempts'].replace(0, np.nan)
-        agg['ROI'] = ((agg['Net_Rev'] - agg['CPA']) / agg['CPA'].replace(0, np.nan))
-        agg['eCPA'] = agg['CPA'] / agg['FTD'].replace(0, np.nan)
-        agg = agg.sort_values('FTD_Amt', ascending=False)
+        agent_cols = {
+            'clicks': 'Clicks', 'registrations': 'Regs', 'ftd_count': 'FTD', 'ftd_amount_usd': 'FTD_Amt',
+            'net_revenue_usd': 'Net_Rev', 'cpa_cost_usd': 'CPA', 'payment_attempts': 'Attempts',
+            'payment_approved': 'Approved',
+            'reg2dep': 'Reg2FTD %', 'click2reg': 'Click2Reg %', 'approval_rate': 'Approval %', 'ecpa': 'eCPA',
+        }
+        agent_agg = with_ratios(agg[('agent',)])
+        agent_agg['ROI'] = (agent_agg['net_revenue_usd'] - agent_agg['cpa_cost_usd']) / agent_agg['cpa_cost_usd'].replace(0, np.nan)
+        agent_agg = agent_agg.rename(columns=agent_cols)[
+            ['agent', 'Clicks', 'Regs', 'FTD', 'FTD_Amt', 'Net_Rev', 'CPA', 'Attempts', 'Approved',
+             'Reg2FTD %', 'Click2Reg %', 'Approval %', 'ROI', 'eCPA']
+        ].sort_values('FTD_Amt', ascending=False)
         
         # Top 3 Performers
         st.markdown("### 🏆 Top Performers")
         top3_cols = st.columns(3)
-        for idx, (i, row) in enumerate(agg.head(3).iterrows()):
+        for idx, (i, row) in enumerate(agent_agg.head(3).iterrows()):
             with top3_cols[idx]:
                 medal = ["🥇", "🥈", "🥉"][idx]
                 st.markdown(f"""
@@ -1769,17 +2253,19 @@ with tab_agents:
         st.markdown('<div class="sec-label">📊 Agent Performance Analysis</div>', unsafe_allow_html=True)
         
         # Top 10 by Revenue - full width
-        top10_rev = agg.head(10).sort_values('Net_Rev', ascending=True)
+        top10_rev = agent_agg.head(10).sort_values('Net_Rev', ascending=True)
         
-        fig_rev = go.Figure()
-        fig_rev.add_trace(go.Bar(
-            y=top10_rev['agent'], x=top10_rev['Net_Rev'],
-            orientation='h', marker_color=COLORS['green'],
-            text=top10_rev['Net_Rev'].apply(lambda x: fmt_money(x)),
-            textposition='outside',
-        ))
-        apply_layout(fig_rev, MODE, title='Top 10 Agents by Revenue')
-        st.plotly_chart(fig_rev, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_rev():
+            fig_rev = go.Figure()
+            fig_rev.add_trace(go.Bar(
+                y=top10_rev['agent'], x=top10_rev['Net_Rev'],
+                orientation='h', marker_color=COLORS['green'],
+                text=top10_rev['Net_Rev'].apply(lambda x: fmt_money(x)),
+                textposition='outside',
+            ))
+            apply_layout(fig_rev, MODE, title='Top 10 Agents by Revenue')
+            return fig_rev
+        show_chart('agents/top_revenue', build_fig_rev)
         
         # ════════════════════════════════════════════════════════════
         # TRAFFIC SOURCE BREAKDOWN BY AGENT
@@ -1787,69 +2273,81 @@ with tab_agents:
         st.markdown('<div class="sec-label">📡 Traffic Mix by Top Agents</div>', unsafe_allow_html=True)
         
         # Get top 5 agents
-        top5_agents = agg.head(5)['agent'].tolist()
-        agent_source = a[a['agent'].isin(top5_agents)].groupby(['agent', 'traffic_source']).agg(
-            Regs=('registrations', 'sum')
-        ).reset_index()
+        top5_agents = agent_agg.head(5)['agent'].tolist()
+        agent_source = agg[('agent', 'traffic_source')].rename(columns={'registrations': 'Regs'})
+        agent_source = agent_source[agent_source['agent'].isin(top5_agents)]
         
-        fig_mix = px.bar(
-            agent_source, x='agent', y='Regs', color='traffic_source',
-            color_discrete_sequence=COLOR_SEQ,
-            barmode='stack'
-        )
-        apply_layout(fig_mix, MODE, title='Traffic Source Mix (Top 5 Agents)')
-        st.plotly_chart(fig_mix, use_container_width=True, config={'displayModeBar': False})
+        def build_fig_mix():
+            fig_mix = px.bar(
+                agent_source, x='agent', y='Regs', color='traffic_source',
+                color_discrete_sequence=COLOR_SEQ,
+                barmode='stack'
+            )
+            apply_layout(fig_mix, MODE, title='Traffic Source Mix (Top 5 Agents)')
+            return fig_mix
+        show_chart('agents/source_mix', build_fig_mix)
         
         # ════════════════════════════════════════════════════════════
         # FULL AGENT TABLE
         # ════════════════════════════════════════════════════════════
         st.markdown('<div class="sec-label">📋 Complete Agent Leaderboard</div>', unsafe_allow_html=True)
         
-        st.dataframe(
-            agg.style.format({
-                'Clicks':'{:,.0f}','Regs':'{:,.0f}','FTD':'{:,.0f}',
-                'Click2Reg %':'{:.1%}','Reg2FTD %':'{:.1%}','Approval %':'{:.1%}',
-                'FTD_Amt':'${:,.0f}','Net_Rev':'${:,.0f}','eCPA':'${:,.0f}','ROI':'{:.1%}'
-            }).background_gradient(subset=['Reg2FTD %'], cmap=HEATMAP_CMAP, vmin=0, vmax=0.20)
-             .background_gradient(subset=['ROI'], cmap=HEATMAP_CMAP, vmin=-0.5, vmax=0.5)
-             .background_gradient(subset=['Approval %'], cmap=HEATMAP_CMAP, vmin=0.6, vmax=0.95),
-            use_container_width=True, hide_index=True, height=500
-        )
+        paged_table('agents/leaderboard', agent_agg, {
+            'Clicks':'{:,.0f}','Regs':'{:,.0f}','FTD':'{:,.0f}',
+            'Click2Reg %':'{:.1%}','Reg2FTD %':'{:.1%}','Approval %':'{:.1%}',
+            'FTD_Amt':'${:,.0f}','Net_Rev':'${:,.0f}','eCPA':'${:,.0f}','ROI':'{:.1%}'
+        }, {'Reg2FTD %': (0, 0.20), 'ROI': (-0.5, 0.5), 'Approval %': (0.6, 0.95)},
+            sort_by='FTD_Amt', search_col='agent', interactive=True, height=500)
         
         # ════════════════════════════════════════════════════════════
         # AGENT TRENDS (Optional Deep Dive)
         # ════════════════════════════════════════════════════════════
         st.markdown('<div class="sec-label">🔍 Agent Deep Dive (Optional)</div>', unsafe_allow_html=True)
-        
-        selected_agent = st.selectbox("Select agent for detailed analysis:", 
-                                      [''] + sorted(a['agent'].dropna().unique().tolist()))
-        
-        if selected_agent:
-            agent_data = a[a['agent'] == selected_agent].groupby('date').agg(
-                Regs=('registrations', 'sum'),
-                FTD=('ftd_count', 'sum'),
-                Revenue=('net_revenue_usd', 'sum'),
-            ).reset_index()
-            agent_data['Reg2FTD'] = agent_data['FTD'] / agent_data['Regs'].replace(0, np.nan)
-            
-            deep_col1, deep_col2 = st.columns(2)
-            
-            with deep_col1:
-                fig_agent_vol = go.Figure()
-                fig_agent_vol.add_trace(go.Bar(x=agent_data['date'], y=agent_data['Regs'],
-                                              name='Regs', marker_color=COLORS['blue']))
-                fig_agent_vol.add_trace(go.Scatter(x=agent_data['date'], y=agent_data['FTD'],
-                                                   name='FTD', line=dict(color=COLORS['green'], width=2),
-                                                   yaxis='y2'))
-                apply_layout(fig_agent_vol, MODE, title=f'{selected_agent} - Volume Trend')
-                fig_agent_vol.update_layout(yaxis2=dict(overlaying='y', side='right'))
-                st.plotly_chart(fig_agent_vol, use_container_width=True, config={'displayModeBar': False})
-            
-            with deep_col2:
-                fig_agent_cr = go.Figure()
-                fig_agent_cr.add_trace(go.Scatter(x=agent_data['date'], y=agent_data['Reg2FTD'],
-                                                  line=dict(color=COLORS['purple'], width=2),
-                                                  fill='tozeroy'))
-                apply_layout(fig_agent_cr, MODE, title=f'{selected_agent} - Conversion Rate',
-                            yaxis_tickformat='.0%')
-                st.plotly_chart(fig_agent_cr, use_container_width=True, config={'displayModeBar': False})
+        agent_deep_dive(sorted(agent_agg['agent'].dropna().unique().tolist()))
+
+# ══════════════════════════════════════════════
+# VIEW ROUTER
+# ══════════════════════════════════════════════
+VIEWS = dict(zip(VIEW_LABELS, [render_executive, render_daily, render_weekly, render_payments, render_agents]))
+
+@st.fragment
+def view_router():
+    # Switching views reruns only this fragment: the sidebar, data loading and
+    # filter resolution of the full script are not repeated
+    active_view = st.radio("View", VIEW_LABELS, horizontal=True, key="view", label_visibility="collapsed")
+    started = time.perf_counter()
+    VIEWS[active_view]()
+    note_timing(active_view, started)
+
+view_router()
+
+# ══════════════════════════════════════════════
+# DATA SOURCE STATUS (rendered last: shows the sheets this rerun touched)
+# ══════════════════════════════════════════════
+with st.sidebar:
+    st.markdown("---")
+    with st.expander("⚙️ Data source"):
+        _store = dataset_store()
+        st.caption(f"Version `{dataset.version}` · loaded {dataset.loaded_at:%Y-%m-%d %H:%M:%S}")
+        if _store.refreshing:
+            st.caption("🔄 New dataset version is loading in the background…")
+        if _store.last_error is not None:
+            st.caption(f"⚠️ Last reload failed: {_store.last_error}")
+        st.caption(f"Traffic cube: {len(cube_index):,} cells · "
+                   f"{cube_index.frame.memory_usage(deep=True).sum()/2**20:.1f} MB")
+        _payments = dataset.built('payments_cube')
+        if _payments is not None:
+            st.caption(f"Payments cube: {_payments.n_days:,} days × {len(_payments.geos)} geos × "
+                       f"{len(_payments.methods)} methods · {_payments.cum.nbytes/2**20:.1f} MB")
+        _ring = dataset.built('payments_ring')
+        if _ring is not None:
+            _grain = 'hourly' if _ring.bucket == pd.Timedelta(hours=1) else 'daily' if _ring.bucket == pd.Timedelta(days=1) else _ring.bucket
+            st.caption(f"Payments ring: {_ring.retention} {_grain} buckets · newest {_ring.latest} · "
+                       f"{_ring.nbytes/2**10:.0f} KB · {_ring.dropped} late records dropped")
+        _queries = query_cache()
+        st.caption(f"Queries: {len(_queries)} cached · " + " · ".join(f"{k} {v}" for k, v in _queries.stats.items()))
+        _figures = figure_cache()
+        st.caption(f"Figures: {len(_figures)} cached · " + " · ".join(f"{k} {v}" for k, v in _figures.stats.items()))
+        st.dataframe(load_stats_frame(dataset), use_container_width=True, hide_index=True)
+        note_timing('Full rerun', _rerun_started)
+        st.caption(" · ".join(f"{k}: {v:.0f} ms" for k, v in st.session_state.timings.items()))
@@ -0,0 +1,107 @@
+"""Chargeback view at growing payment volume.
+
+Volume is scaled by repeating every FACT_Payments row ``factor`` times (more
+payments per day, geo and method; the history keeps its length).  Per rerun,
+for the whole period and 4 of the 8 geos: the scan the view would otherwise
+need (date range + geo ``isin``, then a groupby per method, per geo and per
+week) vs the payments cube (``window`` by method and by geo, ``weekly``).
+
+Render: the Payment & Conversion Health view run headless
+(``streamlit.testing``) on a copy of the workbook whose FACT_Payments
+snapshot holds the scaled rows; each factor runs in its own process so the
+app's process-wide caches start empty.  ``Chargebacks`` is the section's own
+timing (``st.session_state.timings``): first visit (figures built) and
+revisit (cached figures); ``view`` is the whole view on the revisit.
+
+    python benchmarks/bench_chargebacks.py
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from synthetic import ROOT, sample_dataset, timeit  # first: puts the repo root on sys.path
+from data_store import DATA_PATH, SnapshotCache
+from payments_store import PaymentsCube
+
+FACTORS = (1, 10, 100)
+MEASURES = ['chargeback_count', 'chargeback_amount_usd', 'approved_count']
+
+
+def more_volume(frame, factor):
+    return frame if factor == 1 else pd.concat([frame] * factor, ignore_index=True)
+
+
+def scan(payments, start, end, geos):
+    pm = payments[
+        (payments['date'].dt.date >= start) &
+        (payments['date'].dt.date <= end) &
+        (payments['geo'].isin(geos))
+    ]
+    by_method = pm.groupby('payment_method', observed=True)[MEASURES].sum()
+    by_geo = pm.groupby('geo', observed=True)[MEASURES].sum()
+    by_week = pm.groupby(pm['date'].dt.to_period('W-SUN').dt.start_time)[MEASURES].sum()
+    return by_method, by_geo, by_week
+
+
+def sliced(cube, start, end, geos):
+    return (cube.window(start, end, geos, by='payment_method'), cube.window(start, end, geos, by='geo'),
+            cube.weekly(start, end, geos))
+
+
+def render(factor):
+    # One process per factor: print "<first visit ms> <revisit ms> <view revisit ms>"
+    import pandas.io.formats.style  # noqa: F401  (pandas 3 no longer imports it for pd.io.formats.style)
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = Path(tmp) / DATA_PATH
+        shutil.copy(ROOT / DATA_PATH, workbook)
+        raw, _ = SnapshotCache(ROOT / DATA_PATH).load('FACT_Payments')
+        SnapshotCache(workbook)._write('FACT_Payments', more_volume(raw, factor), 0.0)
+
+        at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=600)
+        os.chdir(tmp)   # the app opens DATA_PATH relative to the working directory
+        at.run()
+        labels = at.radio(key='view').options
+        view = next(label for label in labels if 'Payment' in label)
+        times = []
+        for label in (view, labels[0], view):
+            at.radio(key='view').set_value(label).run()
+            assert not at.exception, [e.value for e in at.exception]
+            if label == view:
+                times.append(at.session_state.timings['Chargebacks'])
+        print(*times, at.session_state.timings[view])
+
+
+def main():
+    base = sample_dataset().payments
+    geos = sorted(base['geo'].unique())[:4]
+    start, end = base['date'].min().date(), base['date'].max().date()
+    print(f"{'factor':>7}{'rows':>11}{'build s':>9}{'scan ms':>9}{'cube ms':>9}"
+          f"{'first ms':>10}{'revisit ms':>12}{'view ms':>9}")
+    for factor in FACTORS:
+        payments = more_volume(base, factor)
+        cube = PaymentsCube(payments)
+        build = timeit(lambda: PaymentsCube(payments), repeat=1)
+        old, new = scan(payments, start, end, geos), sliced(cube, start, end, geos)
+        for want, got in zip(old, new):
+            assert (want['chargeback_count'].to_numpy() == got['chargeback_count'].to_numpy()).all()
+        t_scan = timeit(lambda: scan(payments, start, end, geos), repeat=3)
+        t_cube = timeit(lambda: sliced(cube, start, end, geos))
+        out = subprocess.run([sys.executable, __file__, '--render', str(factor)],
+                             capture_output=True, text=True, check=True).stdout.split()
+        first, revisit, view = map(float, out[-3:])
+        print(f"{factor:>7}{len(payments):>11,}{build:>9.2f}{t_scan * 1e3:>9.1f}{t_cube * 1e3:>9.2f}"
+              f"{first:>10.0f}{revisit:>12.0f}{view:>9.0f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--render']:
+        render(int(sys.argv[2]))
+    else:
+        main()
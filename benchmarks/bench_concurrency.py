@@ -0,0 +1,97 @@
+"""Morning-report burst: N sessions open the dashboard at once, default filters.
+
+Every session runs one rerun's expensive part against a cold process-wide
+cache: per-day sums and the four KPI windows, the Executive and Daily
+roll-ups, and two of their charts.  Latency per session is measured with
+the single-flight ``LRUCache`` / ``FigureCache`` and with the same caches
+minus coalescing (every concurrent miss computes, as before).
+
+    python benchmarks/bench_concurrency.py
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import plotly.express as px
+
+from synthetic import sample_dataset, stretch_history  # first: puts the repo root on sys.path
+from cube import DailySums, grouping_sets
+from figures import FigureCache
+from query_cache import LRUCache, canonical_key, key_filters
+from traffic_index import FILTER_DIMS, TrafficIndex
+
+SETS = {
+    'executive': [('date',), ('geo',), ('platform',), ('traffic_source',), ('platform', 'brand')],
+    'daily': [('date',), ('geo',), ('platform',), ('traffic_source',), ('reg_method',)],
+}
+
+
+class Uncoalesced(LRUCache):
+    # The cache before single-flight: every concurrent miss computes
+    def get(self, key, compute):
+        found = self._lookup(key)
+        return found[0] if found is not None else self._fill(key, compute)[0]
+
+
+class UncoalescedFigures(FigureCache):
+    def get(self, key, mode, build, restyle_from):
+        return self._make(key, mode, build, restyle_from)
+
+
+def session(index, universe, queries, figures):
+    end = index.max_date
+    start = end - timedelta(days=29)
+    key = canonical_key(universe, universe)
+    sums = queries.get(('daily_sums', key), lambda: DailySums(index, key_filters(key, universe)))
+    for s, e in ((start, end), (start - timedelta(days=30), start - timedelta(days=1)), (end, end),
+                 (end - timedelta(days=1), end - timedelta(days=1))):
+        queries.get(('kpis', key, s, e), lambda: sums.window(s, e))
+    for view, sets in SETS.items():
+        agg = queries.get(('rollups', view, key, start, end), lambda: grouping_sets(
+            index, index.select(start, end, key_filters(key, universe)), sets))
+        figures.get((view, key, 'trend'), 'dark', lambda: px.line(agg[('date',)], x='date', y='registrations'),
+                    None)
+        figures.get((view, key, 'geo'), 'dark', lambda: px.pie(agg[('geo',)], values='ftd_count', names='geo'),
+                    None)
+
+
+def burst(n, index, universe, queries, figures):
+    latencies = [0.0] * n
+    gate = threading.Barrier(n)
+
+    def run(i):
+        gate.wait()
+        t0 = time.perf_counter()
+        session(index, universe, queries, figures)
+        latencies[i] = time.perf_counter() - t0
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies)
+
+
+def main():
+    index = TrafficIndex(stretch_history(sample_dataset().cube, 10))
+    universe = {dim: list(index.labels[dim]) for dim in FILTER_DIMS}
+    burst(1, index, universe, LRUCache(), FigureCache())   # warm imports / plotly validators
+    print(f"{'sessions':>9}{'':>3}{'p50 ms':>9}{'p95 ms':>9}{'computed':>10}"
+          f"{'':>4}{'p50 ms':>9}{'p95 ms':>9}{'computed':>10}")
+    print(f"{'':>12}{'--- uncoalesced ---':^28}{'':>4}{'--- single-flight ---':^28}")
+    for n in (1, 4, 16, 32, 64):
+        row = f"{n:>9}{'':>3}"
+        for queries_cls, figures_cls in ((Uncoalesced, UncoalescedFigures), (LRUCache, FigureCache)):
+            caches = [(queries_cls(), figures_cls()) for _ in range(3)]   # a cold cache per burst
+            lat = np.concatenate([burst(n, index, universe, q, f) for q, f in caches])
+            queries, figures = caches[0]
+            computed = queries.stats['misses'] + figures.stats['builds']
+            row += f"{np.percentile(lat, 50)*1e3:>9.0f}{np.percentile(lat, 95)*1e3:>9.0f}{computed:>10}{'':>4}"
+        print(row)
+    print("computed = cache fills + figure builds of the first of the 3 bursts (one session needs 11)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Long-range trend charts over one year of hourly points.
+
+The four trend charts (Registrations & FTD, Revenue vs Costs, Daily Approval
+Rate, Payment Status Breakdown) built as app.py builds them, from every point
+(SVG traces) vs through ``trend_chart``'s budget (LTTB lines, bars summed to
+a coarser grain, Scattergl when still dense).  Reports the figure JSON size
+and the time to build and serialize it, plus one zoomed week at full resolution.
+
+First checks ``lttb`` against a plain-loop LTTB on random series with NaNs
+(integer and datetime x): both must keep the same points.
+
+    python benchmarks/bench_downsample.py
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from synthetic import timeit  # first: puts the repo root on sys.path
+from downsample import lttb, rebin, scatter_type, thin
+
+# app.py's budgets
+LINE_POINTS = 1500
+BAR_POINTS = 365
+
+
+def reference_lttb(x, y, n_out):
+    # Textbook LTTB, one bucket at a time, with lttb()'s buckets and NaN rules
+    n = len(x)
+    x = np.asarray(x).view(np.int64).astype(np.float64) if np.asarray(x).dtype.kind == 'M' else np.asarray(x, float)
+    y = np.asarray(y, dtype=np.float64)
+    edges = [i * (n - 2) // (n_out - 2) + 1 for i in range(n_out - 1)]
+    keep, a = [0], 0
+    for i in range(n_out - 2):
+        if i + 2 < len(edges):
+            nxt = range(edges[i + 1], edges[i + 2])
+            ys = [y[j] for j in nxt if not np.isnan(y[j])]
+            cx = sum(x[j] for j in nxt) / len(nxt)
+            cy = sum(ys) / len(ys) if ys else np.nan
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        best, pick = -1.0, edges[i]
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if not np.isnan(area) and area > best:
+                best, pick = area, j
+        keep.append(pick)
+        a = pick
+    return np.array(keep + [n - 1])
+
+
+def check_lttb(trials=200, seed=0):
+    rng = np.random.default_rng(seed)
+    for kind in ('int', 'datetime'):
+        for _ in range(trials):
+            n = int(rng.integers(10, 400))
+            x = np.cumsum(rng.integers(1, 5, n))
+            if kind == 'datetime':
+                x = np.datetime64('2025-01-01T00') + x.astype('timedelta64[h]')
+            y = rng.normal(0, 1, n).round(2)
+            y[rng.random(n) < 0.1] = np.nan
+            n_out = int(rng.integers(3, n))
+            assert (lttb(x, y, n_out) == reference_lttb(x, y, n_out)).all(), (kind, n, n_out)
+    print(f"lttb == reference LTTB on {2 * trials} random series with NaNs")
+
+
+def hourly_year(seed=0):
+    rng = np.random.default_rng(seed)
+    date = pd.date_range('2025-01-01', periods=365 * 24, freq='h')
+    shape = 1 + 0.6 * np.sin(2 * np.pi * (date.hour - 6) / 24) + 0.2 * np.sin(2 * np.pi * date.dayofyear / 365)
+    frame = pd.DataFrame({'date': date})
+    frame['registrations'] = rng.poisson(40 * shape)
+    frame['ftd_count'] = rng.binomial(frame['registrations'], 0.12)
+    frame['net_revenue'] = rng.normal(900, 400, len(date)) * shape
+    frame['cpa_cost'] = frame['ftd_count'] * 60.0
+    frame['Approved'] = rng.poisson(80 * shape)
+    frame['Declined'] = rng.poisson(14 * shape)
+    frame['Pending'] = rng.poisson(3, len(date))
+    frame['approval_rate'] = frame['Approved'] / (frame['Approved'] + frame['Declined'])
+    frame['ma7'] = frame['approval_rate'].rolling(7, min_periods=1).mean()
+    return frame
+
+
+def registrations_ftd(d):
+    Scatter = scatter_type(len(d))
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(Scatter(x=d['date'], y=d['registrations'], name='Registrations', fill='tozeroy'), secondary_y=False)
+    fig.add_trace(Scatter(x=d['date'], y=d['ftd_count'], name='FTD'), secondary_y=True)
+    return fig
+
+
+def revenue_costs(d):
+    return go.Figure([go.Bar(x=d['date'], y=d['net_revenue'], name='Net Revenue'),
+                      go.Bar(x=d['date'], y=d['cpa_cost'], name='CPA Cost')])
+
+
+def approval_trend(d):
+    Scatter = scatter_type(len(d))
+    return go.Figure([Scatter(x=d['date'], y=d['approval_rate'], name='Daily AR', opacity=0.4),
+                      Scatter(x=d['date'], y=d['ma7'], name='7-day MA')])
+
+
+def status_breakdown(d):
+    return go.Figure([go.Bar(x=d['date'], y=d[c], name=c) for c in ('Approved', 'Declined', 'Pending')])
+
+
+CHARTS = (
+    ('Registrations & FTD', registrations_ftd, ['registrations', 'ftd_count'], False),
+    ('Revenue vs Costs', revenue_costs, ['net_revenue', 'cpa_cost'], True),
+    ('Daily Approval Rate', approval_trend, ['approval_rate', 'ma7'], False),
+    ('Payment Status', status_breakdown, ['Approved', 'Declined', 'Pending'], True),
+)
+
+
+def budgeted(frame, build, columns, bars):
+    # What trend_chart hands to build()
+    if bars:
+        return build(rebin(frame, 'date', columns, BAR_POINTS)[0])
+    return build(thin(frame, 'date', columns, LINE_POINTS))
+
+
+def main():
+    check_lttb()
+    year = hourly_year()
+    week = year[year['date'].between('2025-06-02', '2025-06-08 23:00')]
+    print(f"{len(year):,} hourly points per series")
+    print(f"{'chart':<22}{'all KB':>8}{'ms':>7}{'budget KB':>11}{'ms':>7}{'points':>8}"
+          f"{'traces':>12}{'zoomed week KB':>16}")
+    total = [0, 0]
+    for name, build, columns, bars in CHARTS:
+        full, small = build(year), budgeted(year, build, columns, bars)
+        t_full = timeit(lambda: build(year).to_json(), repeat=3)
+        t_small = timeit(lambda: budgeted(year, build, columns, bars).to_json(), repeat=3)
+        size_full, size_small = len(full.to_json()), len(small.to_json())
+        total[0] += size_full
+        total[1] += size_small
+        zoomed = len(budgeted(week, build, columns, bars).to_json())
+        print(f"{name:<22}{size_full/1024:>8.0f}{t_full*1e3:>7.0f}{size_small/1024:>11.0f}{t_small*1e3:>7.0f}"
+              f"{len(small.data[0].x):>8}{small.data[0].type:>12}{zoomed/1024:>16.0f}")
+    print(f"{'total':<22}{total[0]/1024:>8.0f}{'':>7}{total[1]/1024:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
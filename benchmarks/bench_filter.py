@@ -0,0 +1,74 @@
+"""filter_traffic latency on 1x/10x/100x stretched histories.
+
+1. date range: per-row ``dt.date`` comparison vs sorted date index
+2. dimension filters: five ``isin`` masks vs packed per-value bitmaps
+
+    python benchmarks/bench_filter.py
+"""
+from datetime import timedelta
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from traffic_index import FILTER_DIMS, TrafficIndex
+
+
+def mask_filter(df, start, end):
+    # The original implementation: builds Python date objects for every row
+    return df[(df['date'].dt.date >= start) & (df['date'].dt.date <= end)]
+
+
+def isin_filter(df, filters):
+    # The original mask construction: one isin scan per dimension, always
+    mask = None
+    for dim, values in filters.items():
+        m = df[dim].isin(values)
+        mask = m if mask is None else mask & m
+    return df[mask]
+
+
+def bench_dates(base):
+    print(f"{'scale':>6}{'rows':>10}{'window':>10}{'dt.date ms':>12}{'index ms':>10}{'speedup':>9}")
+    for factor in (1, 10, 100):
+        frame = stretch_history(base, factor)
+        index = TrafficIndex(frame)
+        end = index.max_date
+        windows = {
+            '30d': (end - timedelta(days=29), end),
+            'prev 30d': (end - timedelta(days=59), end - timedelta(days=30)),
+            'all': (index.min_date, end),
+        }
+        for name, (s, e) in windows.items():
+            old = timeit(lambda: mask_filter(frame, s, e), repeat=3)
+            new = timeit(lambda: index.date_slice(s, e))
+            assert len(mask_filter(frame, s, e)) == len(index.date_slice(s, e))
+            print(f"{factor:>5}x{len(frame):>10}{name:>10}{old*1e3:>12.2f}{new*1e3:>10.3f}{old/new:>8.0f}×")
+
+
+def bench_dims(base):
+    print(f"\n{'scale':>6}{'rows':>10}{'selection':>14}{'isin ms':>10}{'bitmap ms':>11}{'speedup':>9}")
+    for factor in (1, 10, 100):
+        index = TrafficIndex(stretch_history(base, factor))
+        labels = index.labels
+        everything = {dim: list(labels[dim]) for dim in FILTER_DIMS}
+        scenarios = {
+            'all': everything,
+            '3 geos': {**everything, 'geo': list(labels['geo'][:3])},
+            'mixed': {**everything, 'geo': list(labels['geo'][:5]), 'platform': list(labels['platform'][:2]),
+                      'agent': list(labels['agent'][::3])},
+        }
+        s, e = index.min_date, index.max_date
+        sliced = index.date_slice(s, e)
+        for name, filters in scenarios.items():
+            old = timeit(lambda: isin_filter(sliced, filters), repeat=3)
+            new = timeit(lambda: index.filtered(s, e, filters))
+            assert len(isin_filter(sliced, filters)) == len(index.filtered(s, e, filters))
+            print(f"{factor:>5}x{len(index):>10}{name:>14}{old*1e3:>10.2f}{new*1e3:>11.3f}{old/new:>8.1f}×")
+
+
+def main():
+    base = sample_dataset().traffic
+    bench_dates(base)
+    bench_dims(base)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""One rerun's traffic roll-ups: pandas groupby chain vs the grouping-sets kernel.
+
+    python benchmarks/bench_grouping.py
+"""
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from cube import build_cube, grouping_sets
+from traffic_index import TrafficIndex
+
+SETS = [
+    (), ('date',), ('geo',), ('platform',), ('traffic_source',), ('reg_method',),
+    ('platform', 'brand'), ('agent',), ('agent', 'traffic_source'),
+]
+
+
+def groupby_chain(df):
+    # The groupbys the Executive / Daily / Agents tabs used to run, duplicates included
+    s = lambda *cols: {c: 'sum' for c in cols}  # noqa: E731
+    return [
+        df.groupby('date').agg(s('registrations', 'ftd_count')),
+        df.groupby('date').agg(s('net_revenue_usd', 'cpa_cost_usd', 'bonus_cost_usd')),
+        df.groupby('platform', observed=True)['ftd_count'].sum(),
+        df.groupby('traffic_source', observed=True)['registrations'].sum(),
+        df.groupby('geo', observed=True)['ftd_amount_usd'].sum(),
+        df.groupby('geo', observed=True).agg(s('registrations', 'ftd_count', 'ftd_amount_usd', 'net_revenue_usd',
+                                               'payment_attempts', 'payment_approved', 'cpa_cost_usd',
+                                               'bonus_cost_usd')),
+        df.groupby('traffic_source', observed=True).agg(s('registrations', 'ftd_count', 'net_revenue_usd',
+                                                          'cpa_cost_usd')),
+        df.groupby(['platform', 'brand'], observed=True).agg(s('ftd_count')),
+        df.groupby('platform', observed=True).agg(s('registrations', 'ftd_count')),
+        df.groupby('reg_method', observed=True).agg(s('registrations', 'ftd_count')),
+        df.groupby('traffic_source', observed=True).agg(s('registrations', 'ftd_count', 'net_revenue_usd')),
+        df.groupby('geo', observed=True).agg(s('ftd_count', 'net_revenue_usd')),
+        df.groupby('date').agg(s('registrations', 'ftd_count', 'ftd_amount_usd', 'net_revenue_usd',
+                                 'payment_attempts', 'payment_approved')),
+        df.groupby('date').agg(s('payment_attempts', 'payment_approved')),
+        df.groupby('agent', observed=True).agg(s('clicks', 'registrations', 'ftd_count', 'ftd_amount_usd',
+                                                 'net_revenue_usd', 'cpa_cost_usd', 'payment_attempts',
+                                                 'payment_approved')),
+        df.groupby(['agent', 'traffic_source'], observed=True).agg(s('registrations')),
+    ]
+
+
+def main():
+    base = sample_dataset().traffic
+    print(f"{'scale':>6}{'cube rows':>11}{'groupby ms':>12}{'kernel ms':>11}{'speedup':>9}")
+    for factor in (1, 10, 100):
+        index = TrafficIndex(build_cube(stretch_history(base, factor)))
+        sel = index.select(index.min_date, index.max_date)
+        frame = index.frame
+        old = timeit(lambda: groupby_chain(frame), repeat=3)
+        new = timeit(lambda: grouping_sets(index, sel, SETS), repeat=3)
+        print(f"{factor:>5}x{len(index):>11}{old*1e3:>12.1f}{new*1e3:>11.1f}{old/new:>8.1f}×")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""KPI totals of one rerun's four windows (period, previous period, today,
+yesterday): filter + per-measure ``.sum()`` vs ``DailySums`` prefix sums.
+
+    python benchmarks/bench_kpi_window.py
+"""
+from datetime import timedelta
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from cube import ADDITIVE_MEASURES, DailySums
+from traffic_index import FILTER_DIMS, TrafficIndex
+
+
+def windows(index, days=30):
+    end = index.max_date
+    days = days or index.n_days
+    start = end - timedelta(days=days - 1)
+    return [
+        (start, end),
+        (start - timedelta(days=days), start - timedelta(days=1)),
+        (end, end),
+        (end - timedelta(days=1), end - timedelta(days=1)),
+    ]
+
+
+def scan_totals(index, filters, wins):
+    # What compute_kpis() used to do: filter the rows, then one sum per measure
+    out = []
+    for s, e in wins:
+        part = index.filtered(s, e, filters)
+        out.append({m: part[m].sum() for m in ADDITIVE_MEASURES})
+    return out
+
+
+def main():
+    base = sample_dataset().cube
+    print(f"{'scale':>6}{'days':>8}{'window':>8}{'scan ms':>10}{'build ms':>10}{'prefix µs':>11}")
+    for factor in (1, 10, 100):
+        index = TrafficIndex(stretch_history(base, factor))
+        filters = {**{dim: list(index.labels[dim]) for dim in FILTER_DIMS},
+                   'geo': list(index.labels['geo'][:3])}
+        for days in (30, 365, None):
+            wins = windows(index, days)
+            old = timeit(lambda: scan_totals(index, filters, wins), repeat=3)
+            build = timeit(lambda: DailySums(index, filters), repeat=3)
+            sums = DailySums(index, filters)
+            new = timeit(lambda: [sums.window(s, e) for s, e in wins])
+            for got, want in zip([sums.window(s, e) for s, e in wins], scan_totals(index, filters, wins)):
+                assert all(abs(got[m] - want[m]) <= 1e-6 * max(abs(want[m]), 1) + 1e-2 for m in ADDITIVE_MEASURES)
+            print(f"{factor:>5}x{index.n_days:>8}{f'{days}d' if days else 'all':>8}{old*1e3:>10.2f}{build*1e3:>10.2f}{new*1e6:>11.1f}")
+    print("\nbuild = once per filter combination (cached); prefix = every rerun")
+
+
+if __name__ == '__main__':
+    main()
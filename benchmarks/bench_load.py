@@ -0,0 +1,29 @@
+"""Cold-load time of every sheet: openpyxl (xlsx) vs Arrow snapshot.
+
+    python benchmarks/bench_load.py [path/to/workbook.xlsx]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_store import DATA_PATH, SHEETS, SnapshotCache, read_sheet_xlsx  # noqa: E402
+
+
+def main(path):
+    with tempfile.TemporaryDirectory() as root:
+        cache = SnapshotCache(path, root=root)
+        print(f"{'sheet':<22}{'rows':>8}{'xlsx s':>10}{'snapshot s':>12}{'speedup':>10}")
+        for sheet in SHEETS:
+            t0 = time.perf_counter()
+            df = read_sheet_xlsx(path, sheet)
+            xlsx_s = time.perf_counter() - t0
+            cache._write(sheet, df, xlsx_s)
+            _, stat = cache.load(sheet)
+            print(f"{sheet:<22}{stat.rows:>8}{xlsx_s:>10.3f}{stat.seconds:>12.4f}{stat.speedup:>9.0f}×")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).resolve().parents[1] / DATA_PATH))
@@ -0,0 +1,57 @@
+"""Process memory as sessions come and go.
+
+Opens N sessions one after another in one process (``streamlit.testing``),
+each visiting every view, and reports the RSS after each.  The dataset is
+held once per process, so after the first session the growth per session
+should be close to zero.  ``traced KB/rerun`` is what one warm rerun
+allocates and keeps alive until it returns (peak, ``tracemalloc``).
+
+    python benchmarks/bench_memory.py [path/to/app.py] [sessions]
+"""
+import gc
+import sys
+import tracemalloc
+
+import pandas.io.formats.style  # noqa: F401  (pandas 3 no longer imports it for pd.io.formats.style)
+from streamlit.testing.v1 import AppTest
+
+from synthetic import ROOT
+
+
+def rss_mb():
+    # Linux: current resident set size
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def visit_all(at):
+    at.run()
+    router = [r for r in at.radio if r.key == 'view']
+    for label in router[0].options if router else []:
+        at.radio(key='view').set_value(label)
+        at.run()
+    assert not at.exception, [e.value for e in at.exception]
+
+
+def main(app=ROOT / 'app.py', sessions=8):
+    rss = []
+    for _ in range(int(sessions)):
+        at = AppTest.from_file(str(app), default_timeout=300)
+        visit_all(at)
+        gc.collect()
+        rss.append(rss_mb())
+    tracemalloc.start()
+    at.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("RSS after each session (MB): " + " ".join(f"{x:.0f}" for x in rss))
+    growth = (rss[-1] - rss[1]) / max(len(rss) - 2, 1)
+    print(f"first session {rss[0]:.0f} MB · per further session {growth:+.1f} MB · "
+          f"traced KB/rerun {peak/1024:.0f}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
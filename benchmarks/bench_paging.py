@@ -0,0 +1,45 @@
+"""Agent leaderboard: whole table vs one page of a ``PagedTable``.
+
+Per rerun: time to build what ``st.dataframe`` sends (the styled frame, or
+the plain frame beyond the Styler cell limit) and its serialized size.
+For the paged table also the one-off cost of a sort order and of a search.
+
+    python benchmarks/bench_paging.py
+"""
+import pandas as pd
+
+from bench_tables import CMAP, FORMATS, GRADIENTS, leaderboard, marshall  # first: puts the repo root on sys.path
+from synthetic import timeit
+from tables import PagedTable, fits_styler, heatmap_styler
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+
+PAGE = 50
+
+
+def payload(frame):
+    # What one st.dataframe call serializes for this frame
+    if fits_styler(frame):
+        return marshall(heatmap_styler(frame, FORMATS, GRADIENTS, CMAP)).ByteSize()
+    return len(convert_anything_to_arrow_bytes(frame))
+
+
+def main():
+    print(f"{'agents':>8}{'whole ms':>10}{'whole KB':>10}{'page ms':>9}{'page KB':>9}{'sort ms':>9}{'search ms':>11}")
+    for n in (1_000, 10_000, 50_000):
+        frame = leaderboard(n)
+        frame['agent'] = frame['agent'].astype('category')
+        ranked = frame.sort_values('FTD_Amt', ascending=False)
+        whole = timeit(lambda: payload(ranked), repeat=1)
+
+        table = PagedTable(ranked, search_col='agent')
+        sort = timeit(lambda: PagedTable(ranked).order('ROI', False), repeat=3)
+        search = timeit(lambda: table.rows('FTD_Amt', False, 'agt-01'), repeat=3)
+        rows = table.rows('FTD_Amt', False)
+        page = timeit(lambda: payload(table.page(table.rows('FTD_Amt', False), 7, PAGE)))
+        pd.testing.assert_frame_equal(table.page(rows, 1, PAGE), ranked.head(PAGE).reset_index(drop=True))
+        print(f"{n:>8}{whole*1e3:>10.0f}{payload(ranked)/1024:>10.0f}{page*1e3:>9.1f}"
+              f"{payload(table.page(rows, 7, PAGE))/1024:>9.1f}{sort*1e3:>9.1f}{search*1e3:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
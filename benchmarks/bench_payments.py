@@ -0,0 +1,51 @@
+"""Payment & Conversion Health queries as payment history grows.
+
+Per rerun, for the last 30 days and 4 of the 8 geos: the previous path
+(``dt.date`` range + geo ``isin`` over FACT_Payments, then a groupby per
+payment method and per date) vs ``PaymentsCube.window()`` + ``daily()``.
+
+    python benchmarks/bench_payments.py
+"""
+from datetime import timedelta
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from payments_store import PaymentsCube
+
+
+def scan(payments, start, end, geos):
+    pm = payments[
+        (payments['date'].dt.date >= start) &
+        (payments['date'].dt.date <= end) &
+        (payments['geo'].isin(geos))
+    ]
+    by_method = pm.groupby('payment_method').agg(Attempts=('txn_count', 'sum'), Approved=('approved_count', 'sum'))
+    by_date = pm.groupby('date').agg(Approved=('approved_count', 'sum'), Declined=('declined_count', 'sum'))
+    return by_method, by_date
+
+
+def sliced(cube, start, end, geos):
+    return cube.window(start, end, geos), cube.daily(start, end, geos)
+
+
+def main():
+    base = sample_dataset().payments
+    geos = sorted(base['geo'].unique())[:4]
+    print(f"{'days':>7}{'rows':>11}{'build s':>9}{'cube MB':>9}{'scan ms':>9}{'cube ms':>9}")
+    for factor in (1, 10, 50):
+        payments = stretch_history(base, factor)
+        end = payments['date'].max().date()
+        start = end - timedelta(days=29)
+        build = timeit(lambda: PaymentsCube(payments), repeat=1)
+        cube = PaymentsCube(payments)
+        old = scan(payments, start, end, geos)
+        new = sliced(cube, start, end, geos)
+        assert (old[0]['Attempts'].to_numpy() == new[0]['txn_count'].to_numpy()).all()
+        assert (old[1]['Declined'].to_numpy() == new[1]['declined_count'].to_numpy()).all()
+        t_scan = timeit(lambda: scan(payments, start, end, geos))
+        t_cube = timeit(lambda: sliced(cube, start, end, geos))
+        print(f"{cube.n_days:>7,}{len(payments):>11,}{build:>9.2f}{cube.cum.nbytes / 2**20:>9.1f}"
+              f"{t_scan * 1e3:>9.1f}{t_cube * 1e3:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Result cache keyed on canonical filter state.
+
+1. keys: sessions picking the same selections in different orders --
+   distinct keys, hit rate, build / hash cost and size of a raw per-order
+   key, the sorted key the app used before, and ``canonical_key`` (whose
+   ALL sentinel keeps fully-selected dimensions short)
+2. hit: serving one view's roll-ups from ``st.cache_data`` (a pickle round
+   trip per hit) vs the shared ``LRUCache`` (returns the object)
+
+    python benchmarks/bench_query_cache.py
+"""
+import pickle
+import random
+from datetime import timedelta
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from cube import grouping_sets
+from query_cache import ALL, LRUCache, canonical_key, key_filters
+from traffic_index import FILTER_DIMS, TrafficIndex
+
+SETS = [('date',), ('geo',), ('platform',), ('traffic_source',), ('platform', 'brand')]
+
+
+def session_filters(universe, rng, n_combos=6, n_sessions=400):
+    # A few popular selections, each ticked in whatever order the user clicked
+    combos = [{dim: rng.sample(values, rng.randint(1, len(values))) if rng.random() < 0.4 else list(values)
+               for dim, values in universe.items()} for _ in range(n_combos)]
+    for _ in range(n_sessions):
+        combo = rng.choice(combos)
+        yield {dim: rng.sample(values, len(values)) for dim, values in rng.sample(list(combo.items()), len(combo))}
+
+
+def raw_key(filters):
+    return tuple((d, tuple(v)) for d, v in filters.items())
+
+
+def sorted_key(filters):
+    # The previous app key: values sorted, dimensions in sidebar order
+    return tuple((d, tuple(sorted(filters[d]))) for d in FILTER_DIMS)
+
+
+def key_size(key):
+    return sum(1 if values is ALL else len(values) for _, values in key)
+
+
+def main():
+    index = TrafficIndex(stretch_history(sample_dataset().cube, 10))
+    universe = {dim: [str(v) for v in index.labels[dim]] for dim in FILTER_DIMS}
+    end = index.max_date
+    start = end - timedelta(days=29)
+
+    print(f"{'key':<12}{'distinct':>10}{'hit rate':>10}{'build µs':>10}{'hash µs':>9}{'values':>8}")
+    sessions = list(session_filters(universe, random.Random(7)))
+    everything = {dim: universe[dim] for dim in FILTER_DIMS}
+    for name, make in (('per-order', raw_key), ('sorted', sorted_key),
+                       ('canonical', lambda f: canonical_key(f, universe))):
+        cache = LRUCache(max_entries=64)
+        for f in sessions:
+            cache.get(make(f), lambda: None)
+        build = timeit(lambda: [make(f) for f in sessions[:50]]) / 50
+        keys = [make(f) for f in sessions[:50]]
+        hashing = timeit(lambda: [hash(k) for k in keys]) / 50
+        hits = cache.stats['hits'] / len(sessions)
+        print(f"{name:<12}{len(cache) + cache.stats['evictions']:>10}{hits:>10.0%}{build*1e6:>10.1f}"
+              f"{hashing*1e6:>9.2f}{key_size(make(everything)):>8}")
+    print("values = size of the default (everything selected) key")
+
+    key = canonical_key({dim: universe[dim] for dim in FILTER_DIMS}, universe)
+    result = grouping_sets(index, index.select(start, end, key_filters(key, universe)), SETS)
+    blob = pickle.dumps(result)
+    cache = LRUCache()
+    cache.get(key, lambda: result)
+    unpickle = timeit(lambda: pickle.loads(blob))
+    shared = timeit(lambda: cache.get(key, lambda: result))
+    print(f"\nroll-up hit ({len(blob)/1024:.0f} KB pickled): st.cache_data-style {unpickle*1e3:.3f} ms"
+          f" · LRUCache {shared*1e6:.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
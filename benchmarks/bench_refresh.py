@@ -0,0 +1,91 @@
+"""Workbook replaced while a version is being served.
+
+A version loads its sheets lazily, so the workbook can be replaced between
+two sheet accesses of the same version (stale-while-revalidate keeps
+serving it until the reload is in).  On a copy of the workbook:
+
+1. version h1 loads FACT_Daily_Traffic only;
+2. the workbook is overwritten in place with FACT_Payments.txn_count = 999999;
+3. h1 loads FACT_Payments: it must get h1's payments, not the new bytes;
+4. the reload gives version h2, with the new payments;
+5. the original workbook is written back: a new store (same cache
+   directory, so h1's snapshots are reused) must serve h1's payments;
+6. the first store swaps back to h1, then to a third version h3: the cache
+   keeps the directories of the current and the replaced version only.
+
+Also timed: ``pin_workbook`` for a new version (hash, copy, hash of the
+copy) and for a known one (hash only).
+
+    python benchmarks/bench_refresh.py
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from synthetic import ROOT, timeit  # first: puts the repo root on sys.path
+from data_store import DATA_PATH, WORKBOOK_COPY, DatasetStore, pin_workbook
+
+MARK = 999999
+
+
+def marked_copy(source, target, mark=MARK):
+    # The workbook with every FACT_Payments txn_count set to ``mark``
+    wb = load_workbook(source)
+    ws = wb['FACT_Payments']
+    column = [c.value for c in ws[1]].index('txn_count') + 1
+    for row in range(2, ws.max_row + 1):
+        ws.cell(row, column).value = mark
+    wb.save(target)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        workbook, original, marked = tmp / DATA_PATH, tmp / 'original.xlsx', tmp / 'marked.xlsx'
+        shutil.copy(ROOT / DATA_PATH, original)
+        shutil.copy(original, workbook)
+        marked_copy(original, marked)
+        root = tmp / 'cache'
+
+        store = DatasetStore(workbook, cache_root=root)
+        h1 = store.current()
+        h1.traffic
+        shutil.copyfile(marked, workbook)   # in place, as a plain overwrite would
+        assert h1.payments['txn_count'].max() < MARK
+        assert store.check()
+        store.wait()
+        h2 = store.current()
+        assert h2.content_hash != h1.content_hash and (h2.payments['txn_count'] == MARK).all()
+
+        shutil.copyfile(original, workbook)
+        again = DatasetStore(workbook, cache_root=root).current()
+        assert again.content_hash == h1.content_hash and again.payments['txn_count'].max() < MARK
+        print(f"workbook replaced between two sheet loads of {h1.version}: "
+              f"{h1.version} kept its payments, {h2.version} got the new ones, snapshots clean")
+
+        def versions():
+            return {d.name for d in root.iterdir() if d.is_dir()}
+        assert store.check()
+        store.wait()
+        assert store.current() is not h1 and store.current().content_hash == h1.content_hash
+        assert versions() == {h1.content_hash, h2.content_hash}
+        marked_copy(original, workbook, MARK + 1)
+        assert store.check()
+        store.wait()
+        h3 = store.current()
+        assert versions() == {h1.content_hash, h3.content_hash}, versions()
+        print(f"after swapping to {h3.version}: cache holds {h3.version} and {h1.version} only")
+
+        def pin_new():
+            (root / h3.content_hash / WORKBOOK_COPY).unlink()
+            pin_workbook(workbook, root)
+        t_new = timeit(pin_new, repeat=3)
+        t_known = timeit(lambda: pin_workbook(workbook, root))
+        size = workbook.stat().st_size / 2**20
+        print(f"pin_workbook, {size:.1f} MB: new version {t_new * 1e3:.1f} ms, known version {t_known * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
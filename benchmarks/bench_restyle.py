@@ -0,0 +1,63 @@
+"""Theme switch: restyled figures against figures built in the new theme.
+
+One session starts dark, visits every view, switches to light and visits
+every view again -- each chart now a restyle of its cached dark figure
+(``figures.restyle``).  A second process, whose figure cache starts empty,
+opens the dashboard in light and builds every chart.  Every chart spec (data
+and layout) must be the same in both, including the charts that set their
+own layout over the theme (margins, titles, axes).
+
+    python benchmarks/bench_restyle.py
+"""
+import json
+import subprocess
+import sys
+
+import pandas.io.formats.style  # noqa: F401  (pandas 3 no longer imports it for pd.io.formats.style)
+from streamlit.testing.v1 import AppTest
+
+from synthetic import ROOT
+
+
+def chart_specs(at):
+    """``{view: [chart spec, ...]}`` over every view of the router."""
+    specs = {}
+    for label in at.radio(key='view').options:
+        at.radio(key='view').set_value(label).run()
+        assert not at.exception, [e.value for e in at.exception]
+        specs[label] = [json.loads(c.proto.spec) for c in at.main.get('plotly_chart')]
+    return specs
+
+
+def fresh_light():
+    # Own process: the figure cache is process-wide
+    at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=300)
+    at.session_state['theme_mode'] = 'light'
+    at.run()
+    print(json.dumps(chart_specs(at)))
+
+
+def main():
+    at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=300)
+    at.run()
+    chart_specs(at)
+    [t for t in at.toggle if t.label == 'Dark mode'][0].set_value(False).run()
+    restyled = chart_specs(at)
+    out = subprocess.run([sys.executable, __file__, '--fresh'], capture_output=True, text=True, check=True)
+    built = json.loads(out.stdout.splitlines()[-1])
+
+    assert list(restyled) == list(built)
+    n = 0
+    for view, charts in restyled.items():
+        assert len(charts) == len(built[view]), view
+        for i, (got, want) in enumerate(zip(charts, built[view])):
+            assert got == want, (view, i, want.get('layout', {}).get('title'))
+            n += 1
+    print(f"{n} charts over {len(restyled)} views: restyled dark -> light == built in light")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--fresh']:
+        fresh_light()
+    else:
+        main()
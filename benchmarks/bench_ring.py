@@ -0,0 +1,73 @@
+"""Current-hour card: ``PaymentsRing`` vs scanning the payment history.
+
+Hourly payment records (per geo x payment_method) for histories of growing
+length.  The scan is the card's previous query -- ``date.max()``, then the rows of
+that timestamp for the selected geos -- over the whole frame; the ring keeps
+one week of hourly buckets.  Reports the ring's memory, batch ingest rate,
+single-record append, and the card's two queries (current hour + last 24h).
+
+    python benchmarks/bench_ring.py
+"""
+import numpy as np
+import pandas as pd
+
+from synthetic import timeit  # first: puts the repo root on sys.path
+from payments_store import PaymentsRing
+
+GEOS = ['BR', 'UA', 'KZ', 'IN', 'PH', 'PL', 'DE', 'TH']
+METHODS = [f"M{i:02d}" for i in range(19)]
+SELECTED = GEOS[:4]
+
+
+def hourly_payments(days, seed=0):
+    # ~20% of the geo x method cells have traffic in a given hour
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range('2020-01-01', periods=days * 24, freq='h')
+    cells = len(GEOS) * len(METHODS)
+    per_hour = max(cells // 5, 1)
+    n = len(hours) * per_hour
+    txn = rng.integers(1, 60, n)
+    return pd.DataFrame({
+        'date': np.repeat(hours, per_hour),
+        'geo': pd.Categorical(rng.choice(GEOS, n), categories=GEOS),
+        'payment_method': pd.Categorical(rng.choice(METHODS, n), categories=METHODS),
+        'txn_count': txn,
+        'approved_count': rng.binomial(txn, 0.85),
+        'declined_count': 0,
+        'total_amount_usd': txn * 90.0,
+    })
+
+
+def scan(records):
+    latest = records['date'].max()
+    hour = records[(records['date'] == latest) & records['geo'].isin(SELECTED)]
+    day = records[(records['date'] > latest - pd.Timedelta(hours=24)) & records['geo'].isin(SELECTED)]
+    return hour['txn_count'].sum(), day.groupby('date')['approved_count'].sum()
+
+
+def card(ring):
+    return ring.window(1, SELECTED)['txn_count'], ring.series(24, SELECTED)
+
+
+def main():
+    print(f"{'days':>6}{'records':>11}{'ring KB':>9}{'ingest rec/s':>14}{'append us':>11}"
+          f"{'scan ms':>9}{'ring ms':>9}")
+    for days in (30, 365, 1825):
+        records = hourly_payments(days)
+        ring = PaymentsRing('1h', 7 * 24)
+        # Stream the history through the ring in hourly batches of ~a day
+        started = pd.Timestamp.now()
+        for _, batch in records.groupby(records['date'].dt.floor('D'), observed=True, sort=True):
+            ring.ingest(batch)
+        ingest_s = (pd.Timestamp.now() - started).total_seconds()
+        assert ring.window(1, SELECTED)['txn_count'] == scan(records)[0]
+        last = records.iloc[-1]
+        append = timeit(lambda: ring.append(last['date'], last['geo'], last['payment_method'], [1, 1, 0, 90.0]))
+        t_scan = timeit(lambda: scan(records), repeat=3)
+        t_ring = timeit(lambda: card(ring))
+        print(f"{days:>6}{len(records):>11,}{ring.nbytes / 1024:>9.0f}{len(records) / ingest_s:>14,.0f}"
+              f"{append * 1e6:>11.1f}{t_scan * 1e3:>9.1f}{t_ring * 1e3:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Processing-time / ticket-size quantiles per payment method: sketches vs exact.
+
+Accuracy: for random (period, geos) filters, p50/p95/p99 per method from the
+merged sketches against the exact transaction-weighted quantiles of the same
+rows; the relative error must stay within each sketch family's ``alpha``.
+
+Null codes: a row with a blank payment method and one with a blank geo
+are left out of every method (and of every geo selection), as in the exact
+computation.
+
+Speed: one filter change -- the previous way (filter FACT_Payments, then
+sort each method's rows for exact quantiles) vs ``PaymentSketches.quantiles``
+-- as payment history grows.
+
+    python benchmarks/bench_sketches.py
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from payments_store import SKETCHED, PaymentSketches
+from sketches import weighted_quantiles
+
+QS = (0.5, 0.95, 0.99)
+
+
+def exact(payments, column, start, end, geos):
+    pm = payments[(payments['date'].dt.date >= start) & (payments['date'].dt.date <= end) & payments['geo'].isin(geos)]
+    return {method: weighted_quantiles(g[column], g['txn_count'], QS)
+            for method, g in pm.groupby('payment_method', observed=True)}
+
+
+def accuracy(payments, sketches, trials=300, seed=0):
+    rng = np.random.default_rng(seed)
+    geos = sorted(payments['geo'].unique())
+    first, last = payments['date'].min().date(), payments['date'].max().date()
+    worst = dict.fromkeys(SKETCHED, 0.0)
+    for _ in range(trials):
+        start = first + timedelta(days=int(rng.integers(0, (last - first).days + 1)))
+        end = min(start + timedelta(days=int(rng.integers(0, 90))), last)
+        selected = list(rng.choice(geos, rng.integers(1, len(geos) + 1), replace=False))
+        for column in SKETCHED:
+            want = exact(payments, column, start, end, selected)
+            got = sketches.quantiles(column, start, end, selected, QS)
+            assert sorted(want) == list(got['payment_method'])
+            for row in got.itertuples(index=False):
+                err = np.abs(np.array(row[2:]) - want[row.payment_method]) / want[row.payment_method]
+                worst[column] = max(worst[column], float(err.max()))
+    return worst
+
+
+def check_null_codes(payments):
+    payments = payments.astype({'payment_method': object, 'geo': object})
+    payments.loc[0, 'payment_method'] = None
+    payments.loc[1, 'geo'] = None
+    sketches = PaymentSketches(payments)
+    last_geo = sorted(payments['geo'].dropna().unique())[-1]   # a null geo code (-1) used to index its mask entry
+    first, last = payments['date'].min().date(), payments['date'].max().date()
+    for geos in (None, [last_geo]):
+        pm = payments if geos is None else payments[payments['geo'].isin(geos)]
+        want = pm.groupby('payment_method')['txn_count'].sum()
+        for column in SKETCHED:
+            got = sketches.quantiles(column, first, last, geos, QS).set_index('payment_method')['weight']
+            assert (got == want.reindex(got.index)).all() and sorted(got.index) == sorted(want.index), (column, geos)
+
+
+def main():
+    base = sample_dataset().payments
+    check_null_codes(base)
+    print("one blank payment method + one blank geo: left out of every method and geo selection\n")
+    sketches = PaymentSketches(base)
+    worst = accuracy(base, sketches)
+    print("max relative error over 300 filters x p50/p95/p99 x methods:")
+    for column, err in worst.items():
+        alpha = SKETCHED[column].alpha
+        assert err <= alpha * (1 + 1e-9), (column, err)
+        print(f"  {column:<22}{err:.4%}  (bound {alpha:.0%}, {SKETCHED[column].n} buckets)")
+
+    geos = sorted(base['geo'].unique())[:4]
+    print(f"\n{'days':>7}{'rows':>11}{'build s':>9}{'exact ms':>10}{'sketch ms':>11}")
+    for factor in (1, 10, 50):
+        payments = stretch_history(base, factor)
+        end = payments['date'].max().date()
+        start = end - timedelta(days=29)
+        build = timeit(lambda: PaymentSketches(payments), repeat=1)
+        sketches = PaymentSketches(payments)
+        t_exact = timeit(lambda: exact(payments, 'processing_time_sec', start, end, geos), repeat=3)
+        t_sketch = timeit(lambda: sketches.quantiles('processing_time_sec', start, end, geos, QS))
+        print(f"{sketches.n_days:>7,}{len(payments):>11,}{build:>9.2f}{t_exact * 1e3:>10.1f}{t_sketch * 1e3:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
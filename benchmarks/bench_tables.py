@@ -0,0 +1,95 @@
+"""Heatmap tables (Complete Agent Leaderboard shape) at 1k and 50k rows.
+
+light: ``Styler.format().background_gradient()`` + ``to_html()`` vs ``heatmap_html``
+dark:  what ``st.dataframe`` does with the Styler (``marshall_styler``),
+       ``background_gradient`` vs ``heatmap_styler``
+
+Cell texts and colours of both paths are checked against the Styler ones.
+
+    python benchmarks/bench_tables.py
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pandas.io.formats.style  # noqa: F401  (pandas 3 no longer imports it for pd.io.formats.style)
+from matplotlib.colors import LinearSegmentedColormap
+from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+from streamlit.proto.ArrowData_pb2 import ArrowData
+
+from synthetic import timeit  # first: puts the repo root on sys.path
+from tables import heatmap_html, heatmap_styler
+
+# app.py's light-mode HEATMAP_CMAP
+CMAP = LinearSegmentedColormap.from_list("pastel_rdg", ["#FEE2E2", "#FCA5A5", "#FFF7ED", "#DCFCE7", "#86EFAC"])
+FORMATS = {
+    'Clicks': '{:,.0f}', 'Regs': '{:,.0f}', 'FTD': '{:,.0f}',
+    'Click2Reg %': '{:.1%}', 'Reg2FTD %': '{:.1%}', 'Approval %': '{:.1%}',
+    'FTD_Amt': '${:,.0f}', 'Net_Rev': '${:,.0f}', 'eCPA': '${:,.0f}', 'ROI': '{:.1%}',
+}
+GRADIENTS = {'Reg2FTD %': (0, 0.20), 'ROI': (-0.5, 0.5), 'Approval %': (0.6, 0.95)}
+
+
+def leaderboard(n, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'agent': [f"AGT-{i:05d}" for i in range(n)],
+        'Clicks': rng.integers(0, 50_000, n), 'Regs': rng.integers(0, 5_000, n), 'FTD': rng.integers(0, 500, n),
+        'Click2Reg %': rng.random(n) * 0.2, 'Reg2FTD %': rng.random(n) * 0.3, 'Approval %': rng.random(n),
+        'FTD_Amt': rng.random(n) * 1e5, 'Net_Rev': rng.normal(2e4, 3e4, n), 'eCPA': rng.random(n) * 300,
+        'ROI': rng.normal(0, 0.6, n),
+    })
+    frame.loc[::37, ['ROI', 'eCPA']] = np.nan   # agents without cost
+    return frame
+
+
+def gradient_styler(frame):
+    styler = frame.style.format(FORMATS)
+    for col, (vmin, vmax) in GRADIENTS.items():
+        styler = styler.background_gradient(subset=[col], cmap=CMAP, vmin=vmin, vmax=vmax)
+    return styler
+
+
+def styler_cells(styler):
+    # (text, css) of every body cell, as the Styler renders them
+    styler._compute()
+    body = styler._translate(False, False)['body']
+    css = {k: ''.join(f"{p}: {v};" for p, v in props) for k, props in styler.ctx.items()}
+    return [[(cell['display_value'], css.get((r, c), '')) for c, cell in enumerate(row[1:])]
+            for r, row in enumerate(body)]
+
+
+def html_cells(table):
+    rows = re.findall(r'<tr>(.*?)</tr>', table.split('<tbody>')[1])
+    return [[(text, css) for css, text in re.findall(r'<td(?: style="([^"]*)")?>(.*?)</td>', row)] for row in rows]
+
+
+def marshall(styler):
+    proto = ArrowData()
+    marshall_styler(proto, styler, 'bench')
+    return proto
+
+
+def main():
+    pd.set_option('styler.render.max_elements', 10 ** 7)
+    print(f"{'rows':>7}{'':>3}{'Styler html s':>14}{'KB':>8}{'new html s':>12}{'KB':>7}"
+          f"{'':>3}{'Styler st.df s':>15}{'new st.df s':>12}")
+    for n in (1_000, 50_000):
+        frame = leaderboard(n)
+        want = styler_cells(gradient_styler(frame))
+        assert styler_cells(heatmap_styler(frame, FORMATS, GRADIENTS, CMAP)) == want
+        assert html_cells(heatmap_html(frame, FORMATS, GRADIENTS, CMAP)) == want
+
+        repeat = 3 if n <= 1_000 else 1
+        old_html = gradient_styler(frame).hide(axis='index').set_table_attributes('class="saas-table"').to_html()
+        new_html = heatmap_html(frame, FORMATS, GRADIENTS, CMAP)
+        t_old_html = timeit(lambda: gradient_styler(frame).hide(axis='index').to_html(), repeat=repeat)
+        t_new_html = timeit(lambda: heatmap_html(frame, FORMATS, GRADIENTS, CMAP), repeat=repeat)
+        t_old_df = timeit(lambda: marshall(gradient_styler(frame)), repeat=repeat)
+        t_new_df = timeit(lambda: marshall(heatmap_styler(frame, FORMATS, GRADIENTS, CMAP)), repeat=repeat)
+        print(f"{n:>7}{'':>3}{t_old_html:>14.2f}{len(old_html)/1024:>8.0f}{t_new_html:>12.2f}"
+              f"{len(new_html)/1024:>7.0f}{'':>3}{t_old_df:>15.2f}{t_new_df:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
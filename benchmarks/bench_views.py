@@ -0,0 +1,90 @@
+"""Rerun latency and payload of the dashboard, per view.
+
+Runs app.py headless (``streamlit.testing``) and, for every view of the
+router, times the first visit (cold) and a revisit (warm roll-up cache),
+and sums the serialized size of every element the rerun sends.  An app
+without the ``view`` router (the old ``st.tabs`` layout) is measured as a
+single page.
+
+The test runner always reruns the whole script, so for interactions that
+are fragments in the app (view switch, agent deep dive) the script's own
+per-section timings (``st.session_state.timings``) give the fragment rerun
+cost next to the full rerun it replaces.  The last rows flip the theme
+toggle on the Agents view.
+
+    python benchmarks/bench_views.py [path/to/app.py]
+"""
+import sys
+import time
+
+import pandas.io.formats.style  # noqa: F401  (pandas 3 no longer imports it for pd.io.formats.style)
+from streamlit.testing.v1 import AppTest
+
+from synthetic import ROOT
+
+
+def payload_bytes(node):
+    """Serialized size of an element subtree (what the rerun sends to the browser)."""
+    size = 0
+    for child in getattr(node, 'children', {}).values():
+        size += payload_bytes(child)
+    proto = getattr(node, 'proto', None)
+    if proto is not None and hasattr(proto, 'ByteSize'):
+        size += proto.ByteSize()
+    return size
+
+
+def timed_run(at):
+    t0 = time.perf_counter()
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    return time.perf_counter() - t0
+
+
+def main(app=ROOT / 'app.py'):
+    at = AppTest.from_file(str(app), default_timeout=300)
+    timed_run(at)   # first run: loads the dataset, builds indexes
+    timed_run(at)
+    router = [r for r in at.radio if r.key == 'view']
+    print(f"{'view':<34}{'cold ms':>9}{'warm ms':>9}{'fragment ms':>13}{'payload KB':>12}{'charts':>8}")
+    if not router:
+        warm = min(timed_run(at) for _ in range(3))
+        print(f"{'all tabs (st.tabs)':<34}{'':>9}{warm*1e3:>9.0f}{'':>13}{payload_bytes(at._tree)/1024:>12.1f}"
+              f"{len(at.get('plotly_chart')):>8}")
+        return
+    labels = router[0].options
+    for label in labels:
+        at.radio(key='view').set_value(label)
+        cold = timed_run(at)
+        at.radio(key='view').set_value(labels[0] if label != labels[0] else labels[1])
+        timed_run(at)
+        at.radio(key='view').set_value(label)
+        warm = timed_run(at)
+        fragment = at.session_state.timings.get(label, float('nan'))
+        print(f"{label:<34}{cold*1e3:>9.0f}{warm*1e3:>9.0f}{fragment:>13.0f}{payload_bytes(at._tree)/1024:>12.1f}"
+              f"{len(at.get('plotly_chart')):>8}")
+
+    # Agent deep dive: pick an agent on the Agents view
+    at.radio(key='view').set_value(labels[-1])
+    timed_run(at)
+    picker = [s for s in at.selectbox if s.label.startswith('Select agent')]
+    if picker:
+        agent = picker[0].options[1]
+        picker[0].set_value(agent)
+        full = timed_run(at)
+        fragment = at.session_state.timings.get('Agent Deep Dive', float('nan'))
+        print(f"{'Agent Deep Dive: ' + agent:<34}{'':>9}{full*1e3:>9.0f}{fragment:>13.0f}"
+              f"{payload_bytes(at._tree)/1024:>12.1f}{len(at.get('plotly_chart')):>8}")
+
+    # Theme switch: the first toggle restyles cached figures, the second serves them
+    toggle = [t for t in at.toggle if t.label == 'Dark mode']
+    if toggle:
+        for name in ('Theme switch (restyle)', 'Theme switch back (hit)'):
+            toggle[0].set_value(not toggle[0].value)
+            full = timed_run(at)
+            print(f"{name:<34}{'':>9}{full*1e3:>9.0f}{'':>13}"
+                  f"{payload_bytes(at._tree)/1024:>12.1f}{len(at.get('plotly_chart')):>8}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
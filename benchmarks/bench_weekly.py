@@ -0,0 +1,62 @@
+"""Weekly Trends view on 1x/10x/100x stretched histories.
+
+1. render: filter the whole history + ``dt.isocalendar()`` + groupby vs the
+   materialized (week x segment) roll-up
+2. reload: full weekly rebuild vs incremental rebuild after the last day
+   changed (the incremental time includes hashing the new cube's days)
+
+    python benchmarks/bench_weekly.py
+"""
+import pandas as pd
+
+from synthetic import sample_dataset, stretch_history, timeit  # first: puts the repo root on sys.path
+from cube import ADDITIVE_MEASURES, build_weekly, day_fingerprints, grouping_sets
+from traffic_index import FILTER_DIMS, TrafficIndex
+
+
+def isocalendar_weekly(index, filters):
+    # The original tab: whole filtered history, per-row ISO calendar, regroup
+    weekly = index.filtered(index.min_date, index.max_date, filters).copy()
+    weekly['week'] = weekly['date'].dt.isocalendar().week.astype(int)
+    weekly['year'] = weekly['date'].dt.year
+    return weekly.groupby(['year', 'week'])[list(ADDITIVE_MEASURES)].sum().reset_index()
+
+
+def rollup_weekly(weekly_index, filters):
+    sel = weekly_index.select(weekly_index.min_date, weekly_index.max_date, filters)
+    return grouping_sets(weekly_index, sel, [('week_start',)])[('week_start',)]
+
+
+def touch_last_day(cube):
+    changed = cube.copy()
+    last = changed['date'] == changed['date'].max()
+    changed.loc[last, 'clicks'] += 1
+    return changed
+
+
+def main():
+    base = sample_dataset().cube
+    print(f"{'scale':>6}{'cube rows':>11}{'week rows':>11}{'isocal ms':>11}{'rollup ms':>11}"
+          f"{'full ms':>9}{'incr ms':>9}")
+    for factor in (1, 10, 100):
+        cube = stretch_history(base, factor)
+        index = TrafficIndex(cube)
+        filters = {**{dim: list(index.labels[dim]) for dim in FILTER_DIMS},
+                   'geo': list(index.labels['geo'][:3])}
+        weekly = build_weekly(cube)
+        weekly_index = TrafficIndex(weekly, date_col='week_start')
+        old = timeit(lambda: isocalendar_weekly(index, filters), repeat=3)
+        new = timeit(lambda: rollup_weekly(weekly_index, filters))
+
+        changed = touch_last_day(cube)
+        previous = (day_fingerprints(cube), weekly)   # kept by the version being replaced
+        full = timeit(lambda: build_weekly(changed), repeat=3)
+        incr = timeit(lambda: build_weekly(changed, previous), repeat=3)
+        pd.testing.assert_frame_equal(build_weekly(changed, previous), build_weekly(changed),
+                                      check_dtype=False)
+        print(f"{factor:>5}x{len(cube):>11}{len(weekly):>11}{old*1e3:>11.1f}{new*1e3:>11.2f}"
+              f"{full*1e3:>9.1f}{incr*1e3:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Memory of N server processes holding the same dataset version.
+
+Publishes a stretched cube as an Arrow snapshot (``write_arrow``), then starts N worker
+processes that each load it -- read into private memory (``read_feather``,
+as before) or memory-mapped (``read_arrow``) -- and touch every column.
+Reports the sum over workers of the RSS and of the PSS (proportional set
+size: shared pages split between the processes mapping them) that loading
+the dataset added to each worker.
+
+    python benchmarks/bench_workers.py [stretch factor]
+"""
+import multiprocessing as mp
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pyarrow.feather as feather
+
+from synthetic import sample_dataset, stretch_history  # first: puts the repo root on sys.path
+from data_store import read_arrow, write_arrow
+
+LOADERS = ('read_feather', 'read_arrow')
+
+
+def memory_kb():
+    # Linux: (rss, pss) of this process
+    fields = {}
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                fields[parts[0]] = int(parts[1])
+    return fields['Rss:'], fields['Pss:']
+
+
+def worker(path, loader, loaded, done, out):
+    before = memory_kb()
+    frame = read_arrow(path) if loader == 'read_arrow' else feather.read_feather(path)
+    for name in frame.columns:   # touch every page of every column
+        col = frame[name]
+        values = (col.cat.codes if col.dtype == 'category' else col).to_numpy()
+        values.view(np.uint8)[::4096].sum()
+    loaded.wait()                # every worker has mapped/read the file
+    after = memory_kb()
+    out.put((after[0] - before[0], after[1] - before[1]))
+    done.wait()
+
+
+def run(path, loader, n):
+    ctx = mp.get_context('spawn')
+    loaded, done, out = ctx.Barrier(n), ctx.Barrier(n + 1), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, loader, loaded, done, out)) for _ in range(n)]
+    for p in procs:
+        p.start()
+    deltas = [out.get() for _ in range(n)]
+    done.wait()
+    for p in procs:
+        p.join()
+    return sum(d[0] for d in deltas) / 1024, sum(d[1] for d in deltas) / 1024
+
+
+def main(factor=100):
+    cube = stretch_history(sample_dataset().cube, int(factor))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cube.arrow'
+        write_arrow(cube, path)
+        print(f"cube: {len(cube):,} rows, {path.stat().st_size / 2**20:.0f} MB on disk")
+        print(f"{'workers':>8}" + "".join(f"{name + ' RSS':>19}{'PSS MB':>8}" for name in LOADERS))
+        for n in (1, 2, 4, 8):
+            row = f"{n:>8}"
+            for loader in LOADERS:
+                rss, pss = run(str(path), loader, n)
+                row += f"{rss:>19.0f}{pss:>8.0f}"
+            print(row)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,38 @@
+"""Synthetic scale-ups of the sample workbook for benchmarks."""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from data_store import DATA_PATH, DatasetStore  # noqa: E402
+
+
+def sample_dataset():
+    return DatasetStore(ROOT / DATA_PATH).current()
+
+
+def stretch_history(frame, factor, date_col='date'):
+    """``factor`` back-to-back copies of ``frame``, each shifted by the full
+    history length, so the result has ``factor`` times more days and rows."""
+    if factor == 1:
+        return frame
+    span = frame[date_col].max() - frame[date_col].min() + pd.Timedelta(days=1)
+    copies = []
+    for i in range(factor):
+        part = frame.copy()
+        part[date_col] = part[date_col] - span * (factor - 1 - i)
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True)
+
+
+def timeit(fn, repeat=7):
+    import time
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
@@ -0,0 +1,266 @@
+"""Pre-aggregated daily cube of FACT_Daily_Traffic.
+
+One row per (date, geo, brand, platform, reg_method, traffic_source, agent)
+with additive measures only.  Every chart and table of the dashboard is a
+roll-up of this cube; ratios (Reg2Dep, Approval %, eCPA, ROI, ...) are
+always derived after summing, never stored.
+
+``grouping_sets()`` is the aggregation kernel over the cube: given a row
+selection and a list of dimension sets it produces every roll-up with
+``np.bincount`` over integer codes.  Sets whose combined grain is small are
+served from one shared pass over the rows.
+
+``DailySums`` keeps per-day running totals for one filter combination, so
+the KPI totals of any date window are a subtraction of two rows.
+
+``build_weekly()`` materialises (ISO week x segment) roll-ups for the
+Weekly view; on a reload only the weeks whose days changed are rebuilt.
+"""
+import numpy as np
+import pandas as pd
+
+CUBE_DIMS = ('date', 'geo', 'brand', 'platform', 'reg_method', 'traffic_source', 'agent')
+
+ADDITIVE_MEASURES = (
+    'impressions', 'clicks', 'registrations', 'ftd_count', 'ftd_amount_usd',
+    'deposits_total_usd', 'payment_attempts', 'payment_approved', 'payment_declined',
+    'active_players', 'sessions', 'net_revenue_usd', 'ggr_usd', 'bonus_cost_usd',
+    'cpa_cost_usd',
+)
+
+
+def _keep_compact(summed, source):
+    # groupby().sum() widens int32 -> int64; narrow back when the totals still fit
+    for col in summed.columns:
+        src = source[col].dtype
+        if src.kind in 'iu' and summed[col].dtype != src:
+            info = np.iinfo(src)
+            if len(summed) == 0 or (summed[col].min() >= info.min and summed[col].max() <= info.max):
+                summed[col] = summed[col].astype(src)
+    return summed
+
+
+def build_cube(traffic):
+    """Roll FACT_Daily_Traffic up to the cube grain, sorted by date."""
+    dims = [d for d in CUBE_DIMS if d in traffic.columns]
+    measures = [m for m in ADDITIVE_MEASURES if m in traffic.columns]
+    summed = traffic.groupby(dims, observed=True, sort=True)[measures].sum()
+    return _keep_compact(summed, traffic).reset_index()
+
+
+# ══════════════════════════════════════════════
+# GROUPING-SETS KERNEL
+# ══════════════════════════════════════════════
+DENSE_LIMIT = 1 << 22   # max cells of a dense bincount key
+
+
+def _bincount_columns(key, columns, size):
+    """Per-``key`` row count and ``(n_columns, size)`` sums (one bincount each)."""
+    counts = np.bincount(key, minlength=size)
+    sums = np.empty((len(columns), size))
+    for j, col in enumerate(columns):
+        sums[j] = np.bincount(key, weights=col, minlength=size)
+    return counts, sums
+
+
+def _plan(sets, cards, n_rows):
+    """Group the sets so each group is aggregated from the rows only once.
+
+    Sets join a group while the union of their dimensions stays well below
+    the row count; each set is then rolled up from its group's partials.
+    """
+    def size(dims):
+        return int(np.prod([cards[d] for d in dims])) if dims else 1
+    budget = min(DENSE_LIMIT, max(n_rows // 16, 1))
+    groups = []
+    for dims in sorted(sets, key=size, reverse=True):
+        for group in groups:
+            union = group[0] | set(dims)
+            if size(union) <= budget:
+                group[0] = union
+                group[1].append(dims)
+                break
+        else:
+            groups.append([set(dims), [dims]])
+    return [(tuple(sorted(union)), members) for union, members in groups]
+
+
+def grouping_sets(index, selection, sets, measures=ADDITIVE_MEASURES):
+    """Roll the selected cube rows up to several dimension sets at once.
+
+    ``index`` is a ``TrafficIndex`` over the cube, ``selection`` a result of
+    ``index.select()``.  Returns ``{dims: frame}`` with one row per observed
+    combination (sorted like ``groupby(sort=True)``), dimension columns as
+    labels and measures as sums.  The empty set ``()`` gives the grand total.
+    """
+    sets = [tuple(dims) for dims in sets]
+    measures = [m for m in measures if m in index.frame.columns]
+    int_cols = [m for m in measures if index.frame[m].dtype.kind in 'iu']
+    cards = {d: len(index.labels[d]) for dims in sets for d in dims}
+    n_rows = len(index.take(index.day, selection))
+    # Selected rows of every measure, gathered once and shared by all groups
+    columns = [index.take(index.frame[m].to_numpy(), selection).astype(np.float64) for m in measures]
+
+    out = {}
+    for union, members in _plan(sets, cards, n_rows):
+        shape = tuple(cards[d] for d in union)
+        if union:
+            key = np.ravel_multi_index(
+                [index.take(index.codes[d], selection).astype(np.intp) for d in union], shape)
+        else:
+            key = np.zeros(n_rows, dtype=np.intp)
+        counts, sums = _bincount_columns(key, columns, int(np.prod(shape)))
+        cells = np.flatnonzero(counts)
+        coords = dict(zip(union, np.unravel_index(cells, shape))) if union else {}
+        counts, sums = counts[cells], sums[:, cells]
+
+        for dims in members:
+            sub_shape = tuple(cards[d] for d in dims)
+            size = int(np.prod(sub_shape))
+            sub_key = np.ravel_multi_index([coords[d] for d in dims], sub_shape) if dims \
+                else np.zeros(len(cells), dtype=np.intp)
+            sub_counts, sub_sums = _bincount_columns(sub_key, sums, size)
+            # Observed cells only; the grand total always has its (possibly zero) row
+            seen = np.flatnonzero(sub_counts) if dims else np.zeros(1, dtype=np.intp)
+            frame = pd.DataFrame(sub_sums[:, seen].T, columns=measures)
+            frame[int_cols] = frame[int_cols].round().astype(np.int64)
+            if dims:
+                for i, (d, c) in enumerate(zip(dims, np.unravel_index(seen, sub_shape))):
+                    frame.insert(i, d, index.labels[d][c])
+            out[dims] = frame
+    return {dims: out[dims] for dims in sets}
+
+
+def with_ratios(frame):
+    """Add the derived KPI ratios to a roll-up (NaN where the denominator is 0)."""
+    def ratio(num, den):
+        return num / den.replace(0, np.nan)
+    f = frame.copy(deep=False)   # only adds columns
+    f['reg2dep'] = ratio(f['ftd_count'], f['registrations'])
+    f['approval_rate'] = ratio(f['payment_approved'], f['payment_attempts'])
+    f['ecpa'] = ratio(f['cpa_cost_usd'], f['ftd_count'])
+    f['click2reg'] = ratio(f['registrations'], f['clicks'])
+    f['roi'] = ratio(f['net_revenue_usd'] - f['cpa_cost_usd'] - f['bonus_cost_usd'],
+                     f['cpa_cost_usd'] + f['bonus_cost_usd'])
+    return f
+
+
+# ══════════════════════════════════════════════
+# PREFIX-SUM TIME INDEX
+# ══════════════════════════════════════════════
+class DailySums:
+    """Running per-day totals of the additive measures for one filter combination.
+
+    ``cum[k]`` is the sum over days ``0..k-1`` of the index, so the totals of
+    any date window are ``cum[end + 1] - cum[start]`` -- two row lookups,
+    whatever the length of the history or of the window.
+    """
+
+    def __init__(self, index, filters=None, measures=ADDITIVE_MEASURES):
+        self.index = index
+        self.measures = [m for m in measures if m in index.frame.columns]
+        self.int_cols = {m for m in self.measures if index.frame[m].dtype.kind in 'iu'}
+        daily = np.zeros((len(self.measures), index.n_days))
+        if index.n_days:
+            sel = index.select(index.min_date, index.max_date, filters)
+            columns = [index.take(index.frame[m].to_numpy(), sel).astype(np.float64) for m in self.measures]
+            _, daily = _bincount_columns(index.take(index.day, sel), columns, index.n_days)
+        self.cum = np.zeros((index.n_days + 1, len(self.measures)))
+        np.cumsum(daily.T, axis=0, out=self.cum[1:])
+
+    def window(self, start, end):
+        """``{measure: sum}`` over ``start..end`` (inclusive; days outside the history add 0)."""
+        n = self.index.n_days
+        s = min(max(self.index.day_offset(start), 0), n)
+        e = min(max(self.index.day_offset(end) + 1, s), n)
+        sums = self.cum[e] - self.cum[s]
+        return {m: int(round(v)) if m in self.int_cols else float(v) for m, v in zip(self.measures, sums)}
+
+
+# ══════════════════════════════════════════════
+# CALENDAR & WEEKLY ROLL-UPS
+# ══════════════════════════════════════════════
+# Dimensions a weekly roll-up row is kept per (the sidebar filters)
+SEGMENT_DIMS = ('geo', 'brand', 'platform', 'traffic_source', 'agent')
+
+
+def calendar(first_day, n_days):
+    """Calendar dimension: one row per day from ``first_day`` (ISO week, weekday, month)."""
+    dates = pd.DatetimeIndex(np.datetime64(first_day, 'D') + np.arange(n_days)).as_unit('ns')
+    iso = dates.isocalendar()
+    return pd.DataFrame({
+        'date': dates,
+        'iso_year': iso['year'].to_numpy(np.int32),
+        'iso_week': iso['week'].to_numpy(np.int32),
+        'weekday': dates.weekday.to_numpy(np.int8),
+        'month': dates.month.to_numpy(np.int8),
+        'week_start': dates - pd.to_timedelta(dates.weekday, unit='D'),
+    })
+
+
+def week_starts(dates):
+    """Monday of every date, via the calendar of the distinct days (no per-row date math)."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if len(days) == 0:
+        return np.array([], dtype='datetime64[ns]')
+    first = days.min()
+    cal = calendar(first, int((days.max() - first).astype(np.int64)) + 1)
+    return cal['week_start'].to_numpy()[(days - first).astype(np.int64)]
+
+
+def _column_hash(col):
+    # uint64 per row; categoricals hash their labels, so new categories keep old rows' hashes
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        labels = pd.util.hash_pandas_object(col.cat.categories.to_series(), index=False).to_numpy()
+        codes = col.cat.codes.to_numpy()
+        return np.where(codes >= 0, labels[codes], np.uint64(0))
+    values = col.to_numpy()
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[ns]')
+    return values.astype(np.float64).view(np.uint64) if values.dtype.kind == 'f' else values.astype(np.int64).view(np.uint64)
+
+
+def day_fingerprints(cube):
+    """Order-independent hash of each day's cube rows (``pd.Series`` by day)."""
+    with np.errstate(over='ignore'):
+        h = np.zeros(len(cube), dtype=np.uint64)
+        for name in cube.columns:
+            h = (h ^ _column_hash(cube[name])) * np.uint64(0x9E3779B97F4A7C15)
+            h ^= h >> np.uint64(29)
+        days, inverse = np.unique(cube['date'].to_numpy().astype('datetime64[D]'), return_inverse=True)
+        acc = np.zeros(len(days), dtype=np.uint64)
+        np.add.at(acc, inverse, h)   # wraps mod 2**64
+    return pd.Series(acc, index=days)
+
+
+def _roll_weeks(cube):
+    dims = [d for d in SEGMENT_DIMS if d in cube.columns]
+    measures = [m for m in ADDITIVE_MEASURES if m in cube.columns]
+    week = pd.Series(week_starts(cube['date']), index=cube.index, name='week_start')
+    summed = cube.groupby([week, *dims], observed=True, sort=True)[measures].sum()
+    return _keep_compact(summed, cube).reset_index()
+
+
+def build_weekly(cube, previous=None, fingerprints=None):
+    """Weekly roll-up of the cube: one row per (week_start, segment), additive measures.
+
+    ``previous`` is ``(old_fingerprints, old_weekly)`` of the version being
+    replaced (see ``day_fingerprints()``; ``fingerprints`` are this cube's):
+    weeks none of whose days changed are carried over and only the affected
+    weeks are re-aggregated.
+    """
+    if previous is None:
+        return _roll_weeks(cube)
+    old_fp, old_weekly = previous
+    new_fp = day_fingerprints(cube) if fingerprints is None else fingerprints
+    old_fp, new_fp = old_fp.align(new_fp, fill_value=0)
+    changed = old_fp.index[old_fp.to_numpy() != new_fp.to_numpy()]
+    weeks = pd.DatetimeIndex(np.unique(week_starts(changed))).as_unit('ns')
+
+    keep = old_weekly[~pd.DatetimeIndex(old_weekly['week_start']).as_unit('ns').isin(weeks)]
+    fresh = _roll_weeks(cube[pd.DatetimeIndex(week_starts(cube['date'])).isin(weeks)])
+    keep = keep.astype({c: fresh[c].dtype for c in fresh.columns if isinstance(fresh[c].dtype, pd.CategoricalDtype)})
+    merged = pd.concat([keep, fresh], ignore_index=True)
+    # Each week comes whole from one side, already sorted by segment: ordering weeks is enough
+    order = np.argsort(merged['week_start'].to_numpy(), kind='stable')
+    return merged.iloc[order].reset_index(drop=True)
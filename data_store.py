@@ -0,0 +1,526 @@
+"""Data layer for the dashboard workbook.
+
+The xlsx export is the source of truth, but parsing it with openpyxl takes
+seconds.  Every sheet is converted once into an Arrow IPC (Feather) snapshot
+keyed on the workbook's content hash; later cold loads read only the columnar
+files.  Snapshots are memory-mapped, so server processes serving the same
+version share one physical copy of them through the OS page cache.
+
+``DatasetStore`` holds the current version of the workbook for the whole
+process and swaps in a new one, loaded in the background, only when the file
+really changed.  A version's sheets are parsed from its own copy of the
+workbook (``pin_workbook``), never from the live file, which may have been
+replaced since the version was hashed.  Its frames are shared by every session and never copied:
+with Copy-on-Write a frame sliced from them is a view until it is written
+to, and a write never reaches the shared data.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from cube import build_cube, build_weekly, day_fingerprints
+
+# Always on from pandas 3; the shared frames rely on it
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# ══════════════════════════════════════════════
+# WORKBOOK LAYOUT
+# ══════════════════════════════════════════════
+DATA_PATH = "TF_Dashboard_Dataset_v2.xlsx"
+SNAPSHOT_DIR = ".tf_cache"
+WORKBOOK_COPY = "workbook.xlsx"   # a version's own copy of the workbook, in its snapshot directory
+
+# sheet name -> columns parsed as datetimes
+SHEETS = {
+    'FACT_Daily_Traffic': ['date'],
+    'FACT_Payments': ['date'],
+    'FACT_Agent_Weekly': ['week_start'],
+    'DIM_Geo': [],
+    'DIM_KPI_Targets': [],
+    'META_Data_Dictionary': [],
+}
+
+# Sheets a workbook may leave out (sheet name -> datetime columns); a missing
+# one loads as None
+OPTIONAL_SHEETS = {
+    'FACT_Payments_Hourly': ['date'],   # FACT_Payments at hour grain (or finer)
+}
+
+# Sheets converted to the compact typed layout described by META_Data_Dictionary
+TYPED_SHEETS = ('FACT_Daily_Traffic',)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_arrow(df, path):
+    # Uncompressed and one record batch per column: readable with zero-copy /
+    # memory mapping (several batches would be concatenated into a copy)
+    feather.write_feather(df, path, compression='uncompressed', chunksize=max(len(df), 1))
+
+
+def read_arrow(path):
+    """Frame over a memory-mapped Arrow IPC file (written by ``write_arrow``).
+
+    Number and timestamp columns without nulls point into the mapping instead
+    of being copied (``split_blocks`` skips pandas' block consolidation), so
+    they are read-only; categorical codes (a byte a row) are still copied.
+    Snapshot files are never rewritten in place, which keeps a mapping valid
+    for as long as the frame lives.
+    """
+    return feather.read_table(str(path), memory_map=True).to_pandas(split_blocks=True)
+
+
+def _publish(target, write):
+    # write(tmp) then an atomic rename; the tmp name is per process, so server
+    # processes publishing the same snapshot at once never share a half-written file
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write(tmp)
+    os.replace(tmp, target)
+
+
+def pin_workbook(path, root=None):
+    """``(source, sha256)``: a copy of the workbook that never changes, and its content hash.
+
+    Sheets are parsed lazily, possibly long after the live file was hashed
+    and replaced, so a version parses them from
+    ``<root>/<sha256>/workbook.xlsx``.  A new version is copied first and the
+    copy hashed, so the name always matches the bytes.  When the cache
+    directory is not writable the live file is returned (and no snapshot
+    can be published from it either).
+    """
+    path = Path(path)
+    root = Path(root) if root else path.parent / SNAPSHOT_DIR
+    content_hash = file_sha256(path)
+    pinned = root / content_hash / WORKBOOK_COPY
+    if pinned.exists():
+        return pinned, content_hash
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        tmp = root / f"{WORKBOOK_COPY}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(path, tmp)
+        content_hash = file_sha256(tmp)   # the file may have moved since it was hashed
+        pinned = root / content_hash / WORKBOOK_COPY
+        pinned.parent.mkdir(exist_ok=True)
+        os.replace(tmp, pinned)
+    except OSError:
+        return path, content_hash
+    return pinned, content_hash
+
+
+def prune_snapshots(root, keep):
+    """Delete the version directories of ``root`` whose hash is not in ``keep``; returns the hashes deleted."""
+    deleted = []
+    try:
+        entries = list(Path(root).iterdir())
+    except OSError:
+        return deleted
+    for entry in entries:
+        name = entry.name
+        if len(name) == 64 and all(c in '0123456789abcdef' for c in name) and name not in keep and entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+            deleted.append(name)
+    return deleted
+
+
+def read_sheet_xlsx(path, sheet):
+    df = pd.read_excel(path, sheet_name=sheet)
+    for col in SHEETS.get(sheet, OPTIONAL_SHEETS.get(sheet, [])):
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+
+# ══════════════════════════════════════════════
+# COLUMNAR SNAPSHOTS
+# ══════════════════════════════════════════════
+@dataclass
+class SheetLoad:
+    sheet: str
+    source: str            # 'xlsx' | 'snapshot'
+    seconds: float
+    xlsx_seconds: float    # parse time recorded when the snapshot was built
+    rows: int
+
+    @property
+    def speedup(self):
+        return self.xlsx_seconds / self.seconds if self.seconds > 0 else 0.0
+
+
+class SnapshotCache:
+    """Per-sheet Arrow IPC snapshots of one workbook version.
+
+    Snapshots live in ``<root>/<sha256>/<sheet>.arrow`` (``path`` must hold
+    exactly those bytes, see ``pin_workbook``) next to a small manifest with the xlsx parse time of every sheet, so each load can report
+    the speedup over going back to openpyxl.  An unwritable cache directory
+    is not an error: the sheet is then simply served from the workbook.
+    """
+
+    def __init__(self, path, root=None, content_hash=None):
+        self.path = Path(path)
+        self.root = Path(root) if root else self.path.parent / SNAPSHOT_DIR
+        self.content_hash = content_hash or file_sha256(self.path)
+        self.dir = self.root / self.content_hash
+
+    def sheet_path(self, sheet):
+        return self.dir / f"{sheet}.arrow"
+
+    def _manifest_path(self):
+        return self.dir / "manifest.json"
+
+    def _read_manifest(self):
+        try:
+            return json.loads(self._manifest_path().read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        _publish(self._manifest_path(), lambda tmp: tmp.write_text(json.dumps(manifest, indent=1)))
+
+    def load(self, sheet):
+        """Return ``(frame, SheetLoad)`` for one sheet.
+
+        An optional sheet the workbook does not have is ``(None, SheetLoad)``
+        with source ``'absent'``; that is remembered in the manifest.
+        """
+        target = self.sheet_path(sheet)
+        if target.exists():
+            t0 = time.perf_counter()
+            df = read_arrow(target)
+            elapsed = time.perf_counter() - t0
+            xlsx_s = self._read_manifest().get(sheet, {}).get('xlsx_seconds', 0.0)
+            return df, SheetLoad(sheet, 'snapshot', elapsed, xlsx_s, len(df))
+
+        if sheet in OPTIONAL_SHEETS and self._read_manifest().get(sheet, {}).get('absent'):
+            return None, SheetLoad(sheet, 'absent', 0.0, 0.0, 0)
+
+        t0 = time.perf_counter()
+        try:
+            df = read_sheet_xlsx(self.path, sheet)
+        except ValueError:   # pandas: "Worksheet named ... not found"
+            if sheet not in OPTIONAL_SHEETS:
+                raise
+            elapsed = time.perf_counter() - t0
+            try:
+                self._write_absent(sheet)
+            except OSError:
+                pass
+            return None, SheetLoad(sheet, 'absent', elapsed, elapsed, 0)
+        elapsed = time.perf_counter() - t0
+        try:
+            self._write(sheet, df, elapsed)
+            df = read_arrow(self.sheet_path(sheet))   # share the published copy
+        except OSError:
+            pass
+        return df, SheetLoad(sheet, 'xlsx', elapsed, elapsed, len(df))
+
+    def derived_frame(self, name, build):
+        """Frame derived from this workbook version, persisted beside the sheets."""
+        target = self.dir / f"{name}.arrow"
+        if target.exists():
+            return read_arrow(target)
+        df = build()
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            _publish(target, lambda tmp: write_arrow(df, tmp))
+            df = read_arrow(target)
+        except OSError:
+            pass
+        return df
+
+    def _write(self, sheet, df, xlsx_seconds):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _publish(self.sheet_path(sheet), lambda tmp: write_arrow(df, tmp))
+        manifest = self._read_manifest()
+        manifest[sheet] = {'xlsx_seconds': round(xlsx_seconds, 4), 'rows': len(df)}
+        self._write_manifest(manifest)
+
+    def _write_absent(self, sheet):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        manifest[sheet] = {'absent': True}
+        self._write_manifest(manifest)
+
+
+# ══════════════════════════════════════════════
+# COMPACT TYPED FRAMES
+# ══════════════════════════════════════════════
+def frame_memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _downcast_int(s):
+    # int32 first: unsigned sums would wrap on period-over-period differences
+    lo, hi = (int(s.min()), int(s.max())) if len(s) else (0, 0)
+    if np.iinfo(np.int32).min <= lo and hi <= np.iinfo(np.int32).max:
+        return s.astype(np.int32)
+    if lo >= 0 and hi <= np.iinfo(np.uint32).max:
+        return s.astype(np.uint32)
+    return s
+
+
+def _downcast_decimal(s):
+    # float32 only if every value still rounds to the same cent
+    x = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    x32 = x.astype(np.float32)
+    if np.array_equal(np.round(x32.astype(np.float64), 2), np.round(x, 2), equal_nan=True):
+        return pd.Series(x32, index=s.index, name=s.name)
+    return s
+
+
+def compact_frame(df, dictionary, sheet):
+    """Apply the types of ``META_Data_Dictionary`` to one sheet.
+
+    STRING -> categorical with a fixed (sorted) dictionary, INTEGER ->
+    int32/uint32, DECIMAL -> float32 where lossless to the cent.  Columns the
+    dictionary does not describe are left untouched.
+    """
+    spec = dictionary.loc[dictionary['sheet'] == sheet, ['field', 'type']]
+    out = df.copy(deep=False)   # columns are replaced, never written into
+    for field, ftype in spec.itertuples(index=False):
+        if field not in out.columns:
+            continue
+        col = out[field]
+        if ftype == 'STRING':
+            categories = sorted(col.dropna().unique())
+            out[field] = pd.Categorical(col, categories=categories)
+        elif ftype == 'INTEGER' and pd.api.types.is_integer_dtype(col):
+            out[field] = _downcast_int(col)
+        elif ftype == 'DECIMAL' and pd.api.types.is_float_dtype(col):
+            out[field] = _downcast_decimal(col)
+    return out
+
+
+# ══════════════════════════════════════════════
+# VERSIONED DATASET + CHANGE WATCHER
+# ══════════════════════════════════════════════
+@dataclass(frozen=True)
+class FileStamp:
+    mtime_ns: int
+    size: int
+
+
+def stat_file(path):
+    st_ = os.stat(path)
+    return FileStamp(st_.st_mtime_ns, st_.st_size)
+
+
+class Dataset:
+    """One immutable version of the workbook, identified by its content hash.
+
+    Sheets are loaded lazily: each one is parsed (or read from its snapshot)
+    on first access, independently of the others, so a view only pays for
+    the sheets it actually uses.  ``path`` is the version's own copy of the
+    workbook (``pin_workbook``).
+    """
+
+    def __init__(self, path, content_hash, cache_root=None, previous=None):
+        self.path = str(path)
+        self.content_hash = content_hash
+        self.version = content_hash[:12]
+        self.loaded_at = datetime.now()
+        self._cache = SnapshotCache(path, root=cache_root, content_hash=content_hash)
+        self._frames = {}
+        self._sheet_locks = {sheet: threading.Lock() for sheet in (*SHEETS, *OPTIONAL_SHEETS)}
+        self.load_stats = {}     # sheet -> SheetLoad, in load order
+        self.memory_stats = {}   # sheet -> (bytes as loaded, bytes typed)
+        self._derived = {}
+        self._derived_builders = {}
+        self._derived_lock = threading.RLock()   # derived structures build on each other
+        # The version this one replaces, while it is being warmed (incremental rebuilds)
+        self.previous = previous
+
+    def sheet(self, name):
+        frame = self._frames.get(name)
+        if frame is not None:
+            return frame
+        with self._sheet_locks[name]:
+            if name not in self._frames:
+                frame, stat = self._cache.load(name)
+                if name in TYPED_SHEETS:
+                    before = frame_memory(frame)
+                    frame = compact_frame(frame, self.sheet('META_Data_Dictionary'), name)
+                    self.memory_stats[name] = (before, frame_memory(frame))
+                self._frames[name], self.load_stats[name] = frame, stat
+        return self._frames[name]
+
+    def loaded_sheets(self):
+        return list(self._frames)
+
+    def derived(self, key, build):
+        """Structure computed once per version from this dataset (indexes, cubes)."""
+        value = self._derived.get(key)
+        if value is not None:
+            return value
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+                self._derived_builders[key] = build
+        return self._derived[key]
+
+    def built(self, key):
+        """Derived structure if it was already computed, else None (never builds)."""
+        return self._derived.get(key)
+
+    def warm(self, sheets, derived=None):
+        for name in sheets:
+            self.sheet(name)
+        for key, build in (derived or {}).items():
+            self.derived(key, build)
+
+    def warm_like(self, other):
+        """Load everything ``other`` (the version being replaced) had loaded."""
+        self.warm(other.loaded_sheets(), dict(other._derived_builders))
+
+    @property
+    def traffic(self):
+        return self.sheet('FACT_Daily_Traffic')
+
+    @property
+    def cube(self):
+        """Daily traffic cube (see ``cube.py``), persisted next to the snapshots.
+
+        A persisted cube is read without touching FACT_Daily_Traffic at all.
+        """
+        return self.derived('cube', lambda ds: ds._cache.derived_frame(
+            'cube', lambda: build_cube(ds.traffic)))
+
+    @property
+    def weekly(self):
+        """(ISO week x segment) roll-up of the cube, persisted like the cube.
+
+        When replacing a version that had it built, only the weeks whose days
+        changed are re-aggregated.
+        """
+        def build(ds):
+            prev = ds.previous
+            if prev is None or prev.built('weekly') is None:
+                return ds._cache.derived_frame('weekly', lambda: build_weekly(ds.cube))
+            return ds._cache.derived_frame('weekly', lambda: build_weekly(
+                ds.cube, (prev.day_fingerprints, prev.built('weekly')), ds.day_fingerprints))
+        return self.derived('weekly', build)
+
+    @property
+    def day_fingerprints(self):
+        """Per-day hash of the cube rows: tells the next version which days changed."""
+        return self.derived('day_fingerprints', lambda ds: day_fingerprints(ds.cube))
+
+    @property
+    def payments(self):
+        return self.sheet('FACT_Payments')
+
+    @property
+    def payments_hourly(self):
+        """FACT_Payments_Hourly, or None when the workbook has no such sheet."""
+        return self.sheet('FACT_Payments_Hourly')
+
+    @property
+    def agents(self):
+        return self.sheet('FACT_Agent_Weekly')
+
+    @property
+    def geo(self):
+        return self.sheet('DIM_Geo')
+
+    @property
+    def targets(self):
+        return self.sheet('DIM_KPI_Targets')
+
+
+class DatasetStore:
+    """Process-wide holder of the current ``Dataset`` (stale-while-revalidate).
+
+    ``current()`` costs one ``os.stat``.  When mtime or size moved, the file is
+    re-hashed and, if the content really changed, copied (``pin_workbook``)
+    and re-loaded on a background thread while callers keep getting the
+    previous version.  Only the very first load blocks.  A failed reload
+    (e.g. the file is still being copied) keeps the old version and is
+    retried on the next stamp change.
+
+    Each version has a directory of snapshots (and its workbook copy) in the
+    cache; a swap deletes all of them but the new version's and the one it
+    replaced, which other server processes may still be serving.
+    """
+
+    def __init__(self, path=DATA_PATH, cache_root=None):
+        self.path = str(path)
+        # Explicit: a version's source is a copy inside it (pin_workbook)
+        self.cache_root = Path(cache_root) if cache_root else Path(path).parent / SNAPSHOT_DIR
+        self._lock = threading.Lock()
+        self._current = None
+        self._stamp = None
+        self._refresh_thread = None
+        self.last_error = None
+        self.checked_at = None
+
+    def current(self):
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    stamp = stat_file(self.path)
+                    self._current = Dataset(*pin_workbook(self.path, self.cache_root), self.cache_root)
+                    self._stamp = stamp
+            return self._current
+        self.check()
+        return self._current
+
+    @property
+    def refreshing(self):
+        t = self._refresh_thread
+        return t is not None and t.is_alive()
+
+    def check(self):
+        """Start a background reload if the file's stamp changed."""
+        self.checked_at = datetime.now()
+        try:
+            stamp = stat_file(self.path)
+        except OSError as e:
+            self.last_error = e
+            return False
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if self.refreshing:
+                return True
+            self._refresh_thread = threading.Thread(
+                target=self._refresh, args=(stamp,), name="dataset-refresh", daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def _refresh(self, stamp):
+        try:
+            source, content_hash = pin_workbook(self.path, self.cache_root)
+            if content_hash != self._current.content_hash:
+                fresh = Dataset(source, content_hash, self.cache_root, previous=self._current)
+                # Load what the current version already serves, so the swap is seamless
+                fresh.warm_like(self._current)
+                fresh.previous = None
+                # File moved again while we were reading it -> let the next check retry
+                if stat_file(self.path) != stamp:
+                    return
+                replaced, self._current = self._current, fresh
+                prune_snapshots(self.cache_root, {fresh.content_hash, replaced.content_hash})
+            self._stamp = stamp
+            self.last_error = None
+        except Exception as e:  # keep serving the previous version
+            self.last_error = e
+
+    def wait(self, timeout=None):
+        t = self._refresh_thread
+        if t is not None:
+            t.join(timeout)
@@ -0,0 +1,100 @@
+"""Point budgets for long time series.
+
+A trend chart over a long range at a fine grain has far more points than it
+has pixels; sending them all costs JSON size and SVG rendering time without
+showing more.  Lines are thinned with largest-triangle-three-buckets (LTTB),
+which keeps the points that shape the curve -- peaks and drops survive, unlike
+with every-n-th sampling.  Bars are not sampled but summed to the finest
+calendar grain (hour, day, week, month) that fits the budget, so every bar
+is still a true total.  What is left of a dense line is drawn with WebGL.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Beyond this many points a line is drawn with Scattergl instead of SVG
+WEBGL_POINTS = 1000
+
+# Calendar grains bars are summed to: (resample rule, bucket width, label)
+BAR_GRAINS = (
+    ('h', pd.Timedelta(hours=1), 'hour'),
+    ('D', pd.Timedelta(days=1), 'day'),
+    ('W-MON', pd.Timedelta(days=7), 'week'),
+    ('MS', pd.Timedelta(days=31), 'month'),
+)
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'mM':
+        values = values.view(np.int64)
+    return values.astype(np.float64)
+
+
+def lttb(x, y, n_out):
+    """Positions of the ``n_out`` points of (x, y) that LTTB keeps (first and last always).
+
+    ``x`` must be sorted; NaN values of ``y`` are only kept when a bucket has
+    nothing else.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), _as_float(y)
+    # n_out - 2 buckets of the inner points; the last edge is exactly the last point
+    edges = np.arange(n_out - 1) * (n - 2) // (n_out - 2) + 1
+    # Third vertex of bucket i's triangles: mean of bucket i + 1 (the last point after the last bucket).
+    # Reduced over the inner points only, so the last bucket's sums stop before the last point
+    valid = ~np.isnan(y[:-1])
+    counts = np.add.reduceat(valid, edges[:-1])
+    cx = np.append(np.add.reduceat(x[:-1], edges[:-1]) / np.diff(edges), x[-1])[1:]
+    with np.errstate(invalid='ignore'):
+        cy = np.append(np.add.reduceat(np.where(valid, y[:-1], 0.0), edges[:-1]) / counts, y[-1])[1:]
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - cx[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy[i] - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        keep[i + 1] = a
+    return keep
+
+
+def thin(frame, x, columns, budget):
+    """Rows of ``frame`` LTTB keeps for any of ``columns`` -- at most ``budget`` rows in all.
+
+    Each column gets an equal share of the budget, so every line keeps its
+    own peaks; ``frame`` must be sorted by ``x``.
+    """
+    if len(frame) <= budget:
+        return frame
+    share = max(budget // len(columns), 3)
+    rows = np.unique(np.concatenate([lttb(frame[x].to_numpy(), frame[c].to_numpy(), share) for c in columns]))
+    return frame.iloc[rows]
+
+
+def bar_grain(x, budget):
+    """``BAR_GRAINS`` entry of the finest grain with at most ``budget`` buckets over ``x``."""
+    span = x.max() - x.min()
+    for grain in BAR_GRAINS:
+        if span // grain[1] + 1 <= budget:
+            return grain
+    return BAR_GRAINS[-1]
+
+
+def rebin(frame, x, columns, budget):
+    """``(frame, grain label)``: ``columns`` summed per bucket of the finest grain that fits ``budget``.
+
+    Frames already within the budget come back unchanged, with label None.
+    """
+    if len(frame) <= budget:
+        return frame, None
+    rule, _, label = bar_grain(frame[x], budget)
+    out = frame.set_index(x)[list(columns)].resample(rule, label='left', closed='left').sum(min_count=1)
+    return out.reset_index(), label
+
+
+def scatter_type(n_points):
+    """``go.Scattergl`` for a line of ``n_points`` beyond ``WEBGL_POINTS``, else ``go.Scatter``."""
+    return go.Scattergl if n_points > WEBGL_POINTS else go.Scatter
@@ -0,0 +1,139 @@
+"""Process-wide cache of Plotly figures, with the theme as a separate layer.
+
+A figure is built once per (data version, filters, period, chart id) and
+theme.  When the same chart is asked for in the other theme it is not
+rebuilt: a cached figure is *restyled* -- palette colours in its traces are
+swapped and the theme's base layout is replaced under the chart's own
+(``record_layout``) -- which needs neither the aggregation nor the chart
+code.  Cached figures are shared between sessions and must be treated as
+read-only; concurrent requests for a figure that is being built wait for
+that build (``query_cache.SingleFlight``).
+"""
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from query_cache import SingleFlight
+
+
+def swap_colors(obj, mapping):
+    """Copy of a figure dict fragment with every colour string in ``mapping`` replaced."""
+    if isinstance(obj, dict):
+        return {k: swap_colors(v, mapping) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [swap_colors(v, mapping) for v in obj]
+    if isinstance(obj, str):
+        return mapping.get(obj.lower(), obj)
+    return obj
+
+
+def record_layout(fig, layout):
+    """Note ``layout`` (``update_layout`` keywords) on ``fig`` as the chart's own, on top of what it had."""
+    fig._chart_layout = {**chart_layout(fig), **layout}
+    return fig
+
+
+def chart_layout(fig):
+    """The layout the chart set over the theme (``record_layout``), ``{}`` if none."""
+    return getattr(fig, '_chart_layout', {})
+
+
+def strip_layout(layout, base, keep=None):
+    """``layout`` without the leaves it has from ``base``: equal to it and not in ``keep``.
+
+    Nested dicts are pruned when emptied; a leaf (or subtree) of ``keep`` is
+    the chart's own and stays whatever its value.
+    """
+    keep = keep or {}
+    out = dict(layout)
+    for key, value in base.items():
+        if key not in out or (key in keep and not isinstance(keep[key], dict)):
+            continue
+        if isinstance(value, dict) and isinstance(out[key], dict):
+            rest = strip_layout(out[key], value, keep.get(key))
+            if rest:
+                out[key] = rest
+            else:
+                del out[key]
+        elif out[key] == value:
+            del out[key]
+    return out
+
+
+def restyle(fig, from_palette, to_palette, from_layout, to_layout):
+    """``fig`` (built with ``from_palette`` / ``from_layout``) in another theme.
+
+    The chart's own layout (``record_layout``) goes over the new theme the
+    way it went over the old one, so the result is the figure a build in
+    the new theme would give.
+    """
+    mapping = {from_palette[name].lower(): to_palette[name] for name in from_palette}
+    spec = fig.to_dict()
+    own = swap_colors(chart_layout(fig), mapping)
+    # Normalised through go.Layout so shorthands like ``title_font`` match the nested keys
+    layout = strip_layout(spec.get('layout', {}), go.Layout(from_layout).to_plotly_json(),
+                          go.Layout(own).to_plotly_json())
+    # Theme and the chart's own layout first, the rest on top -- the order the chart was built in
+    out = go.Figure({'data': swap_colors(spec['data'], mapping)})
+    out.update_layout(**{**to_layout, **own})
+    out.update_layout(swap_colors(layout, mapping))
+    return record_layout(out, own)
+
+
+class FigureCache:
+    """LRU of ``{theme mode: go.Figure}`` per chart key.
+
+    ``get()`` serves a cached figure, restyles one cached in another theme,
+    or builds it -- in that order -- and counts which of the three happened
+    (plus the requests that waited on another session's build).
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._stats = {'hits': 0, 'restyles': 0, 'builds': 0}
+
+    @property
+    def stats(self):
+        return {**self._stats, 'coalesced': self._flights.coalesced}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, mode, build, restyle_from):
+        """Figure for ``key`` in ``mode``; ``restyle_from(fig, its_mode)`` derives it from another theme."""
+        with self._lock:
+            themes = self._entries.get(key)
+            if themes is not None and mode in themes:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return themes[mode]
+        return self._flights.do((key, mode), lambda: self._make(key, mode, build, restyle_from))
+
+    def _make(self, key, mode, build, restyle_from):
+        with self._lock:
+            themes = self._entries.get(key)
+            if themes is not None:
+                self._entries.move_to_end(key)
+                if mode in themes:
+                    self._stats['hits'] += 1
+                    return themes[mode]
+                source = next(iter(themes.items()))
+            else:
+                source = None
+        if source is not None:
+            fig = restyle_from(source[1], source[0])
+            outcome = 'restyles'
+        else:
+            fig = build()
+            outcome = 'builds'
+        with self._lock:
+            self._stats[outcome] += 1
+            self._entries.setdefault(key, {})[mode] = fig
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig
@@ -0,0 +1,199 @@
+"""KPI rules from DIM_KPI_Targets, evaluated over every segment and every day.
+
+Each DIM_KPI_Targets row (target / warning / critical / direction) whose KPI
+is a ratio of additive cube measures (``KPI_FORMULAS``) is a rule.  A value
+is graded against the row's thresholds:
+
+    OK          meets the target
+    OFF_TARGET  short of the target, not past the warning threshold
+    WARNING     past the warning threshold
+    CRITICAL    past the critical threshold
+
+"past" meaning below for ``higher_better`` KPIs and above for
+``lower_better`` ones, so the level is the number of thresholds a value
+fails -- three comparisons, for any array of values at once.  A value whose
+denominator is below ``MIN_VOLUME`` is ``NO_DATA`` instead (a segment-day
+with two registrations says nothing about its conversion).
+
+``SegmentDays`` holds the rule measures per (day, segment), a segment being
+an observed geo x brand x platform x traffic_source combination of the
+cube.  ``rank_breaches()`` grades the period totals of every segment and
+``alert_timeline()`` every segment-day, each in one pass over that array.
+"""
+import numpy as np
+import pandas as pd
+
+# kpi_name -> (numerator, denominator) over the cube's additive measures
+KPI_FORMULAS = {
+    'payment_approval_rate': ('payment_approved', 'payment_attempts'),
+    'reg2dep_conversion': ('ftd_count', 'registrations'),
+    'avg_ftd_check': ('ftd_amount_usd', 'ftd_count'),
+    'effective_cpa': ('cpa_cost_usd', 'ftd_count'),
+    'net_revenue_per_ftd': ('net_revenue_usd', 'ftd_count'),
+    'ggr_margin': ('ggr_usd', 'deposits_total_usd'),
+}
+
+# Smallest denominator a value is graded on
+MIN_VOLUME = {'registrations': 30, 'payment_attempts': 20, 'ftd_count': 5, 'deposits_total_usd': 500}
+
+# Segment of a rule evaluation (the agent is left summed)
+RULE_DIMS = ('geo', 'brand', 'platform', 'traffic_source')
+
+NO_DATA, OK, OFF_TARGET, WARNING, CRITICAL = -1, 0, 1, 2, 3
+LEVEL_NAMES = {NO_DATA: 'No data', OK: 'OK', OFF_TARGET: 'Off target', WARNING: 'Warning', CRITICAL: 'Critical'}
+
+
+def thresholds(targets, name):
+    """``{'target', 'warning', 'critical', 'lower_better'}`` of one DIM_KPI_Targets row ('%' as fractions)."""
+    row = targets.set_index('kpi_name').loc[name]
+    scale = 0.01 if row['unit'] == '%' else 1
+    return {'target': row['target'] * scale, 'warning': row['warning_threshold'] * scale,
+            'critical': row['critical_threshold'] * scale, 'lower_better': row['direction'] == 'lower_better'}
+
+
+def grade(values, target, warning, critical, lower_better):
+    """Level of every value (NaN: ``NO_DATA``); thresholds broadcast against ``values``."""
+    values = np.asarray(values, dtype=np.float64)
+    sign = np.where(lower_better, -1.0, 1.0)
+    v = sign * values
+    level = ((v < sign * target).astype(np.int8) + (v < sign * warning) + (v < sign * critical))
+    return np.where(np.isnan(values), NO_DATA, level).astype(np.int8)
+
+
+class Rules:
+    """The DIM_KPI_Targets rows that can be evaluated on the cube, as arrays (one entry per rule).
+
+    ``skipped`` lists the KPIs left out: no formula (chargeback_rate lives in
+    FACT_Payments, quality_score in FACT_Agent_Weekly) or a measure missing
+    from ``measures``.
+    """
+
+    def __init__(self, targets, measures, formulas=KPI_FORMULAS, min_volume=MIN_VOLUME):
+        available = set(measures)
+        self.names = [n for n in targets['kpi_name'] if n in formulas and set(formulas[n]) <= available]
+        self.skipped = [n for n in targets['kpi_name'] if n not in self.names]
+        rows = [thresholds(targets, n) for n in self.names]
+        self.target, self.warning, self.critical = (
+            np.array([r[k] for r in rows], dtype=np.float64) for k in ('target', 'warning', 'critical'))
+        self.lower_better = np.array([r['lower_better'] for r in rows], dtype=bool)
+        self.numerators = [formulas[n][0] for n in self.names]
+        self.denominators = [formulas[n][1] for n in self.names]
+        self.min_volume = np.array([min_volume.get(d, 0) for d in self.denominators], dtype=np.float64)
+        self.measures = list(dict.fromkeys(self.numerators + self.denominators))
+
+    def __len__(self):
+        return len(self.names)
+
+    def evaluate(self, sums):
+        """``(values, volumes, levels)``, each ``(n_rules, *sums.shape[:-1])``.
+
+        ``sums[..., j]`` is measure ``self.measures[j]``.
+        """
+        column = {m: j for j, m in enumerate(self.measures)}
+        num = np.moveaxis(sums[..., [column[m] for m in self.numerators]], -1, 0)
+        den = np.moveaxis(sums[..., [column[m] for m in self.denominators]], -1, 0)
+        expand = (slice(None),) + (None,) * (den.ndim - 1)   # per-rule parameters against the other axes
+        graded = den >= np.maximum(self.min_volume, 1e-12)[expand]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(graded, num / den, np.nan)
+        levels = grade(values, self.target[expand], self.warning[expand], self.critical[expand],
+                       self.lower_better[expand])
+        return values, den, levels
+
+
+class SegmentDays:
+    """Rule measures per (day, segment) of a ``TrafficIndex`` over the cube.
+
+    ``daily[k, s]`` holds the sums of day ``k`` for segment ``s`` (a row of
+    ``segments``); only segments with cube rows are kept.
+    """
+
+    def __init__(self, index, measures, dims=RULE_DIMS):
+        self.dims = tuple(dims)
+        self.measures = list(measures)
+        self.n_days = index.n_days
+        self.dates = index.labels[index.date_col]
+        self.day0 = index.day0
+
+        codes = [index.codes[d].astype(np.intp) for d in self.dims]
+        shape = tuple(len(index.labels[d]) for d in self.dims)
+        ok = np.logical_and.reduce([c >= 0 for c in codes]) if codes else np.ones(len(index), dtype=bool)
+        key = np.ravel_multi_index([c[ok] for c in codes], shape)
+        cells, segment = np.unique(key, return_inverse=True)
+        self.segments = pd.DataFrame({d: index.labels[d][c] for d, c in zip(self.dims, np.unravel_index(cells, shape))})
+
+        n = len(cells)
+        flat = index.day[ok].astype(np.intp) * n + segment
+        self.daily = np.empty((self.n_days, n, len(self.measures)))
+        for j, m in enumerate(self.measures):
+            values = index.frame[m].to_numpy(dtype=np.float64)[ok]
+            self.daily[..., j] = np.bincount(flat, weights=values, minlength=self.n_days * n).reshape(self.n_days, n)
+        self.daily.flags.writeable = False
+
+    def __len__(self):
+        # Segment-days, with or without cube rows
+        return self.daily.shape[0] * self.daily.shape[1]
+
+    def day_offset(self, d):
+        return int((np.datetime64(d, 'D') - self.day0).astype(np.int64))
+
+    def _days(self, start, end):
+        # Day range [s, e) of start..end (inclusive), clipped to the history
+        s = min(max(self.day_offset(start), 0), self.n_days)
+        return s, min(max(self.day_offset(end) + 1, s), self.n_days)
+
+    def select(self, filters=None):
+        """Segments matching ``{dim: selected values}``; dimensions that are not segment dimensions are ignored."""
+        mask = np.ones(len(self.segments), dtype=bool)
+        for dim, values in (filters or {}).items():
+            if dim in self.dims:
+                mask &= self.segments[dim].isin(list(values)).to_numpy()
+        return mask
+
+
+def rank_breaches(rules, segment_days, start, end, mask=None, min_level=WARNING):
+    """Segments whose ``start..end`` totals are at ``min_level`` or worse, worst first.
+
+    Within a level, segments are ranked by ``drag``: how far the segment pulls
+    its rule's overall value (over the selected segments) from the target,
+    relative to the target -- ``(value - target) * volume / total volume``,
+    signed so that worse is positive.
+    """
+    s, e = segment_days._days(start, end)
+    mask = np.ones(len(segment_days.segments), dtype=bool) if mask is None else mask
+    totals = segment_days.daily[s:e, mask].sum(axis=0)
+    values, volumes, levels = rules.evaluate(totals)
+    total_volume = volumes.sum(axis=1, keepdims=True)
+    sign = np.where(rules.lower_better, -1.0, 1.0)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drag = sign * (rules.target[:, None] - values) * volumes / total_volume / np.abs(rules.target)[:, None]
+
+    rule, segment = np.nonzero(levels >= min_level)
+    out = segment_days.segments[mask].iloc[segment].reset_index(drop=True)
+    out.insert(0, 'kpi_name', np.asarray(rules.names, dtype=object)[rule])
+    out.insert(0, 'level', levels[rule, segment])
+    out['value'] = values[rule, segment]
+    out['target'] = rules.target[rule]
+    out['volume'] = volumes[rule, segment]
+    out['drag'] = drag[rule, segment]
+    return out.sort_values(['level', 'drag'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+def alert_timeline(rules, segment_days, start, end, mask=None):
+    """Per day and rule: segments at ``WARNING`` and at ``CRITICAL``, and segments graded."""
+    s, e = segment_days._days(start, end)
+    mask = np.ones(len(segment_days.segments), dtype=bool) if mask is None else mask
+    _, _, levels = rules.evaluate(segment_days.daily[s:e, mask])   # (rules, days, segments)
+    counts = {
+        'warning': (levels == WARNING).sum(axis=2),
+        'critical': (levels == CRITICAL).sum(axis=2),
+        'graded': (levels != NO_DATA).sum(axis=2),
+    }
+    n_rules, n_days = levels.shape[:2]
+    out = pd.DataFrame({
+        'date': np.tile(segment_days.dates[s:e], n_rules),
+        'kpi_name': np.repeat(np.asarray(rules.names, dtype=object), n_days),
+    })
+    for name, c in counts.items():
+        out[name] = c.ravel()
+    return out
@@ -0,0 +1,334 @@
+"""Pre-aggregated store of FACT_Payments.
+
+FACT_Payments is recorded per (date, geo, payment_method).  ``PaymentsCube``
+keeps its additive measures as running totals over the days of a dense
+day x geo x payment_method array, so every payment view is a slice and a
+roll-up of it:
+
+* totals of a period, per method or per geo: ``cum[end + 1] - cum[start]``,
+  two day planes whatever the length of the history or of the period;
+* per-day series: the period's planes summed over the selected geos and
+  all methods, then differenced;
+* per-week series: the running totals at the Mondays of the period,
+  differenced.
+
+The geo selection is a mask over the geo axis.  The sheet has no brand,
+platform, traffic source or agent, so those sidebar filters cannot be
+pushed down to it.
+
+``PaymentSketches`` adds quantile sketches (``sketches.py``) of processing
+time and transaction size per (day, geo, payment_method), merged per method
+for any period and geos.  ``PaymentsRing`` keeps the newest time buckets
+for the current-hour card.
+"""
+import numpy as np
+import pandas as pd
+
+from sketches import LogBuckets
+
+PAYMENT_DIMS = ('geo', 'payment_method')
+
+PAYMENT_MEASURES = (
+    'txn_count', 'approved_count', 'declined_count', 'pending_count',
+    'total_amount_usd', 'approved_amount_usd', 'chargeback_count', 'chargeback_amount_usd',
+)
+
+# Averages kept as txn-weighted sums, so they stay exact after any roll-up:
+# stored measure -> (average column, weight column)
+WEIGHTED_MEASURES = {'processing_seconds': ('processing_time_sec', 'txn_count')}
+
+
+class PaymentsCube:
+    """Running totals of the payment measures per (day, geo, payment_method).
+
+    ``cum[k]`` holds the sums over days ``0..k-1``; the last measure,
+    ``rows``, counts source rows, so a geo or method with no rows in a period
+    is told apart from one whose counts are all zero.
+    """
+
+    def __init__(self, payments, date_col='date'):
+        days = payments[date_col].to_numpy().astype('datetime64[D]')
+        self.day0 = days.min() if len(days) else np.datetime64('1970-01-01', 'D')
+        day = (days - self.day0).astype(np.intp)
+        self.n_days = int(day.max()) + 1 if len(days) else 0
+        self.dates = pd.DatetimeIndex((self.day0 + np.arange(self.n_days)).astype('datetime64[ns]'))
+
+        geo, method = (payments[d].astype('category') for d in PAYMENT_DIMS)
+        self.geos, self.methods = pd.Index(geo.cat.categories), pd.Index(method.cat.categories)
+        g, m = geo.cat.codes.to_numpy(), method.cat.codes.to_numpy()
+
+        present = [c for c in PAYMENT_MEASURES if c in payments.columns]
+        self.int_measures = {c for c in present if payments[c].dtype.kind in 'iu'} | {'rows'}
+        columns = {c: payments[c].to_numpy(dtype=np.float64, na_value=0.0) for c in present}
+        for name, (avg, weight) in WEIGHTED_MEASURES.items():
+            if avg in payments.columns and weight in payments.columns:
+                columns[name] = payments[avg].to_numpy(dtype=np.float64, na_value=0.0) * columns[weight]
+        self.measures = [*columns, 'rows']
+
+        shape = (self.n_days, len(self.geos), len(self.methods))
+        ok = (g >= 0) & (m >= 0)
+        key = np.ravel_multi_index((day[ok], g[ok], m[ok]), shape) if ok.any() else np.zeros(0, dtype=np.intp)
+        size = int(np.prod(shape))
+        planes = np.empty((*shape, len(self.measures)))
+        for j, values in enumerate(columns.values()):
+            planes[..., j] = np.bincount(key, weights=values[ok], minlength=size).reshape(shape)
+        planes[..., -1] = np.bincount(key, minlength=size).reshape(shape)
+        self.cum = np.zeros((self.n_days + 1, *shape[1:], len(self.measures)))
+        np.cumsum(planes, axis=0, out=self.cum[1:])
+        self.cum.flags.writeable = False
+
+    def day_offset(self, d):
+        return int((np.datetime64(d, 'D') - self.day0).astype(np.int64))
+
+    def _days(self, start, end):
+        # Day range [s, e) of start..end (inclusive), clipped to the history
+        s = min(max(self.day_offset(start), 0), self.n_days)
+        return s, min(max(self.day_offset(end) + 1, s), self.n_days)
+
+    def _geo_mask(self, geos):
+        return np.ones(len(self.geos), dtype=bool) if geos is None else self.geos.isin(list(geos))
+
+    def _frame(self, sums, label, labels):
+        # One row per label with source rows; ratios are left to the caller
+        out = pd.DataFrame(sums, columns=self.measures)
+        for c in self.int_measures:
+            out[c] = np.rint(out[c]).astype(np.int64)
+        out.insert(0, label, labels)
+        return out[out['rows'] > 0].reset_index(drop=True)
+
+    def window(self, start, end, geos=None, by='payment_method'):
+        """Totals of ``start..end`` per ``by`` (``'payment_method'`` or ``'geo'``) over ``geos`` (None: all)."""
+        s, e = self._days(start, end)
+        mask = self._geo_mask(geos)
+        plane = (self.cum[e] - self.cum[s])[mask]
+        if by == 'geo':
+            return self._frame(plane.sum(axis=1), 'geo', self.geos[mask])
+        return self._frame(plane.sum(axis=0), 'payment_method', self.methods)
+
+    def daily(self, start, end, geos=None):
+        """Per-day totals of ``start..end`` over ``geos`` (None: all), days with rows only."""
+        s, e = self._days(start, end)
+        running = self.cum[s:e + 1][:, self._geo_mask(geos)].sum(axis=(1, 2))
+        return self._frame(np.diff(running, axis=0), 'date', self.dates[s:e])
+
+    def weekly(self, start, end, geos=None):
+        """Per-week (Monday to Sunday) totals of ``start..end`` over ``geos``, weeks with rows only.
+
+        Only the running totals at the week boundaries are read, so the cost
+        is in weeks, not days.  The first and last weeks are cut to the period.
+        """
+        s, e = self._days(start, end)
+        if s == e:
+            return self._frame(np.zeros((0, len(self.measures))), 'week_start', self.dates[:0])
+        weekday = (self.dates[s].weekday() - s) % 7   # weekday of day 0
+        first_monday = s + 7 - (weekday + s) % 7
+        bounds = np.r_[s, np.arange(first_monday, e, 7), e]
+        running = self.cum[bounds][:, self._geo_mask(geos)].sum(axis=(1, 2))
+        starts = bounds[:-1]
+        labels = self.dates[starts] - pd.to_timedelta((weekday + starts) % 7, unit='D')
+        return self._frame(np.diff(running, axis=0), 'week_start', labels)
+
+
+# Measures the ring keeps per bucket (those the frame has)
+RING_MEASURES = ('txn_count', 'approved_count', 'declined_count', 'total_amount_usd')
+
+
+class PaymentsRing:
+    """The newest ``retention`` time buckets of payment measures per (geo, payment_method).
+
+    Bucket ``b`` counts from the epoch in steps of ``bucket``; slot ``b % size``
+    of ``totals`` holds the running total of every bucket up to ``b``, so the
+    sum of the newest ``n`` buckets is a difference of two slots.  A record
+    for the newest bucket updates one slot, a new bucket starts from the
+    running total of the previous one.  A late record (for an older bucket
+    still in the window) updates the buckets after it too; one older than
+    the window is dropped and counted in ``dropped``.  Memory is
+    ``retention + 1`` slots whatever the history length; new geos and
+    methods widen the slots.
+    """
+
+    def __init__(self, bucket, retention, measures=RING_MEASURES):
+        self.bucket = pd.Timedelta(bucket)
+        self.retention = int(retention)
+        self.size = self.retention + 1   # + the running total before the oldest bucket
+        self.measures = list(measures)
+        self.geos, self.methods = pd.Index([]), pd.Index([])
+        self._positions = {'geos': {}, 'methods': {}}   # label -> axis position
+        self.totals = np.zeros((self.size, 0, 0, len(self.measures)))
+        self.head = None   # newest bucket
+        self.dropped = 0
+
+    @classmethod
+    def from_frame(cls, records, bucket, retention, date_col='date'):
+        """Ring over the newest ``retention`` buckets of ``records`` (older rows are never touched)."""
+        measures = [m for m in RING_MEASURES if m in records.columns]
+        ring = cls(bucket, retention, measures)
+        if len(records):
+            b = ring._buckets(records[date_col])
+            ring.ingest(records[b > b.max() - ring.retention], date_col)
+        return ring
+
+    @property
+    def latest(self):
+        """Start of the newest bucket (None while empty)."""
+        return None if self.head is None else pd.Timestamp(self.head * self.bucket.value)
+
+    @property
+    def nbytes(self):
+        return self.totals.nbytes
+
+    def _buckets(self, timestamps):
+        return np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64) // self.bucket.value
+
+    def _widen(self, attr, new):
+        # Append new labels to the geo or method axis
+        positions = self._positions[attr]
+        for label in new:
+            positions[label] = len(positions)
+        setattr(self, attr, getattr(self, attr).append(pd.Index(new)))
+        pad = [(0, 0)] * 4
+        pad[1 if attr == 'geos' else 2] = (0, len(new))
+        self.totals = np.pad(self.totals, pad)
+
+    def _codes(self, attr, labels):
+        new = [x for x in pd.unique(np.asarray(labels, dtype=object)) if x not in self._positions[attr]]
+        if new:
+            self._widen(attr, new)
+        return getattr(self, attr).get_indexer(labels)
+
+    def append(self, ts, geo, method, values):
+        """One record: ``values`` in the order of ``measures``.  False if it was too old to keep."""
+        for attr, label in (('geos', geo), ('methods', method)):
+            if label not in self._positions[attr]:
+                self._widen(attr, [label])
+        cell = (self._positions['geos'][geo], self._positions['methods'][method])
+        return self._add(pd.Timestamp(ts).value // self.bucket.value, np.asarray(values, dtype=np.float64), cell)
+
+    def ingest(self, records, date_col='date'):
+        """A batch of records (a FACT_Payments-shaped frame); returns the number kept."""
+        if not len(records):
+            return 0
+        b = self._buckets(records[date_col])
+        g = self._codes('geos', records['geo'].to_numpy())
+        m = self._codes('methods', records['payment_method'].to_numpy())
+        values = np.column_stack([records[c].to_numpy(dtype=np.float64, na_value=0.0) for c in self.measures])
+        shape = (len(self.geos), len(self.methods))
+        cell = np.ravel_multi_index((g, m), shape)
+        kept = 0
+        order = np.argsort(b, kind='stable')
+        starts = np.flatnonzero(np.diff(b[order], prepend=b[order][0] - 1))
+        for rows in np.split(order, starts[1:]):
+            delta = np.stack([np.bincount(cell[rows], weights=values[rows, j], minlength=shape[0] * shape[1])
+                              for j in range(len(self.measures))], axis=-1).reshape(*shape, -1)
+            if self._add(int(b[rows[0]]), delta):
+                kept += len(rows)
+        return kept
+
+    def _add(self, b, delta, cell=()):
+        # delta: a (geo, method, measure) plane, or one cell's measures
+        if self.head is None:
+            self.head = b
+        elif b > self.head:
+            # Open the buckets up to b with the running total so far (at most `size` slots)
+            carry = self.totals[self.head % self.size].copy()
+            for k in range(max(self.head + 1, b - self.size + 1), b + 1):
+                self.totals[k % self.size] = carry
+            self.head = b
+        if b <= self.head - self.retention:
+            self.dropped += 1
+            return False
+        for k in range(b, self.head + 1):
+            self.totals[(k % self.size, *cell)] += delta
+        return True
+
+    def _mask(self, geos):
+        return np.ones(len(self.geos), dtype=bool) if geos is None else self.geos.isin(list(geos))
+
+    def window(self, n_buckets=1, geos=None):
+        """``{measure: total}`` of the newest ``n_buckets`` buckets over ``geos`` (None: all)."""
+        if self.head is None:
+            return dict.fromkeys(self.measures, 0.0)
+        n = min(n_buckets, self.retention)
+        sums = self.totals[self.head % self.size] - self.totals[(self.head - n) % self.size]
+        return dict(zip(self.measures, sums[self._mask(geos)].sum(axis=(0, 1))))
+
+    def series(self, n_buckets, geos=None):
+        """Per-bucket totals of the newest ``n_buckets`` buckets over ``geos``, oldest first."""
+        if self.head is None:
+            return pd.DataFrame(columns=['date', *self.measures])
+        n = min(n_buckets, self.retention)
+        slots = np.arange(self.head - n, self.head + 1) % self.size
+        running = self.totals[slots][:, self._mask(geos)].sum(axis=(1, 2))
+        out = pd.DataFrame(np.diff(running, axis=0), columns=self.measures)
+        out.insert(0, 'date', pd.to_datetime(np.arange(self.head - n + 1, self.head + 1) * self.bucket.value))
+        return out
+
+
+# Distributions sketched per (day, geo, payment_method): column -> bucket layout
+SKETCHED = {
+    'processing_time_sec': LogBuckets(alpha=0.01, min_value=0.01, max_value=3600),
+    'avg_txn_usd': LogBuckets(alpha=0.01, min_value=0.01, max_value=1e6),
+}
+
+
+class PaymentSketches:
+    """Quantile sketches of the ``SKETCHED`` columns per (day, geo, payment_method).
+
+    FACT_Payments has one average per row, so a cell's sketch is the bucket
+    of that value weighted by the row's ``weight`` (transactions): quantiles
+    are over transactions, each taken at its row's average.  Finer rows
+    (hourly, per transaction) simply add entries to the same cells.  Rows
+    are kept date-sorted with a per-day offset table, so a period is one
+    slice, geos a mask, and the merged sketch of every method one
+    ``bincount`` of (method, bucket) over it.
+    """
+
+    def __init__(self, payments, date_col='date', weight='txn_count'):
+        days = payments[date_col].to_numpy().astype('datetime64[D]')
+        order = np.argsort(days, kind='stable')
+        self.day0 = days.min() if len(days) else np.datetime64('1970-01-01', 'D')
+        day = (days[order] - self.day0).astype(np.int64)
+        self.n_days = int(day[-1]) + 1 if len(day) else 0
+        self.day_start = np.searchsorted(day, np.arange(self.n_days + 1), side='left')
+
+        geo, method = (payments[d].astype('category') for d in PAYMENT_DIMS)
+        self.geos, self.methods = pd.Index(geo.cat.categories), pd.Index(method.cat.categories)
+        self.geo, self.method = geo.cat.codes.to_numpy()[order], method.cat.codes.to_numpy()[order]
+        weights = payments[weight].to_numpy(dtype=np.float64, na_value=0.0)[order]
+
+        self.buckets = {c: b for c, b in SKETCHED.items() if c in payments.columns}
+        self.index, self.weights = {}, {}
+        for col, buckets in self.buckets.items():
+            values = payments[col].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+            self.index[col] = buckets.index(values).astype(np.int32)
+            self.weights[col] = np.where(np.isnan(values) | (self.method < 0), 0.0, weights)
+        for array in (self.day_start, self.geo, self.method, *self.index.values(), *self.weights.values()):
+            array.flags.writeable = False
+
+    def _rows(self, start, end, geos):
+        # Row positions of start..end (one slice) restricted to geos
+        offset = lambda d: int((np.datetime64(d, 'D') - self.day0).astype(np.int64))
+        s = min(max(offset(start), 0), self.n_days)
+        e = min(max(offset(end) + 1, s), self.n_days)
+        rows = np.arange(self.day_start[s], self.day_start[e])
+        rows = rows[self.method[rows] >= 0]   # a blank payment method has no sketch to go to
+        if geos is None:
+            return rows
+        # A blank geo (code -1) lands on the appended False: it is in no selection
+        return rows[np.append(self.geos.isin(list(geos)), False)[self.geo[rows]]]
+
+    def merged(self, column, start, end, geos=None):
+        """``(methods, counts)``: the merged sketch of each payment method over start..end and ``geos``."""
+        rows = self._rows(start, end, geos)
+        n = self.buckets[column].n
+        key = self.method[rows].astype(np.int64) * n + self.index[column][rows]
+        counts = np.bincount(key, weights=self.weights[column][rows], minlength=len(self.methods) * n)
+        return self.methods, counts.reshape(len(self.methods), n)
+
+    def quantiles(self, column, start, end, geos=None, qs=(0.5, 0.95, 0.99)):
+        """Frame of payment_method, ``weight`` and one column per quantile (``p50``, ...), methods with data only."""
+        methods, counts = self.merged(column, start, end, geos)
+        out = pd.DataFrame(self.buckets[column].quantiles(counts, qs), columns=[f"p{q * 100:g}" for q in qs])
+        out.insert(0, 'weight', counts.sum(axis=1))
+        out.insert(0, 'payment_method', methods)
+        return out[out['weight'] > 0].reset_index(drop=True)
@@ -0,0 +1,140 @@
+"""Canonical filter-state keys and a bounded LRU of query results.
+
+A sidebar selection becomes a key that does not depend on the order values
+were picked in: dimensions and values are sorted, and a dimension with its
+whole universe selected collapses to the ``ALL`` sentinel (so the default
+"everything selected" state is a short key, equal for every session).
+
+Results -- roll-ups, per-day sums, KPI dicts -- are cached in ``LRUCache``
+under keys that start with the dataset version token; DataFrames are never
+hashed.  Cached values are shared between sessions and must be treated as
+read-only.  A miss is single-flight: sessions asking for a key that is
+already being computed wait for that computation instead of repeating it.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class _All:
+    """Sentinel: every value of the dimension's universe is selected."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'ALL'
+
+    def __reduce__(self):
+        return 'ALL'
+
+
+ALL = _All()
+
+
+def canonical_key(filters, universe=None):
+    """Order-independent key of ``{dim: selected values}``.
+
+    ``universe`` maps a dimension to all of its selectable values; a
+    selection covering it is keyed as ``ALL``.
+    """
+    key = []
+    for dim in sorted(filters):
+        values = tuple(sorted(set(filters[dim])))
+        full = (universe or {}).get(dim)
+        if full is not None and len(values) == len(full) and set(values) == set(full):
+            values = ALL
+        key.append((dim, values))
+    return tuple(key)
+
+
+def key_filters(key, universe=None):
+    """``{dim: values}`` for a ``canonical_key()`` (``ALL`` resolved against ``universe``)."""
+    return {dim: list(universe[dim]) if values is ALL else list(values) for dim, values in key}
+
+
+class SingleFlight:
+    """At most one running call per key; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """``fn()``, or the result (or exception) of the call already running for ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+        try:
+            value = fn()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class LRUCache:
+    """Size-bounded, thread-safe LRU with hit / miss / coalesced / eviction counters.
+
+    Misses are computed once per key across threads (``SingleFlight``);
+    a failed computation is not cached and is re-raised to every waiter.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def stats(self):
+        return {**self._stats, 'coalesced': self._flights.coalesced}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, compute):
+        """Cached value for ``key``; on a miss ``compute()`` is called and its result stored."""
+        found = self._lookup(key)
+        if found is None:
+            found = self._flights.do(key, lambda: self._lookup(key) or self._fill(key, compute))
+        return found[0]
+
+    def _lookup(self, key):
+        # (value,) on a hit -- a 1-tuple, so cached falsy values still count
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return (self._entries[key],)
+
+    def _fill(self, key, compute):
+        value = compute()
+        with self._lock:
+            self._stats['misses'] += 1
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return (value,)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,80 @@
+"""Mergeable quantile sketches with a relative error bound.
+
+A sketch is an array of counts over logarithmic buckets (the DDSketch
+mapping): with ``gamma = (1 + alpha) / (1 - alpha)`` a positive value ``x``
+falls in bucket ``k = ceil(log_gamma(x))``, i.e. ``gamma**(k-1) < x <= gamma**k``,
+and the bucket is read back as ``2 * gamma**k / (gamma + 1)``, which is
+within relative error ``alpha`` of every value in it.
+
+Error bound: a quantile read from the counts lies in the same bucket as the
+exact quantile of the values added, so for values in
+``[min_value, max_value]``
+
+    |sketch quantile - exact quantile| <= alpha * exact quantile
+
+whatever the number of values or how sketches were merged.  Values at or
+below ``min_value`` (zero included) share one bucket read back as 0
+(absolute error <= ``min_value``); values above ``max_value`` are clipped
+into the last bucket and lose the bound.
+
+Because the buckets are fixed, merging sketches is adding their count
+arrays: sketches kept per cell of a cube roll up with the same ``bincount``
+as the measures (see ``payments_store.PaymentSketches``).
+"""
+import numpy as np
+
+
+class LogBuckets:
+    """Bucket layout of one sketch family: every sketch of it is a length-``n`` count array."""
+
+    def __init__(self, alpha=0.01, min_value=1e-2, max_value=1e6):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.min_value, self.max_value = min_value, max_value
+        self._log_gamma = np.log(self.gamma)
+        self.offset = int(np.ceil(np.log(min_value) / self._log_gamma))   # bucket k of index 1
+        self.n = int(np.ceil(np.log(max_value) / self._log_gamma)) - self.offset + 2
+
+    def index(self, values):
+        """Bucket index of every value (0: at or below ``min_value`` / NaN)."""
+        x = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.ceil(np.log(x) / self._log_gamma) - self.offset + 1
+        k = np.where(x > self.min_value, np.clip(np.nan_to_num(k), 1, self.n - 1), 0)
+        return k.astype(np.intp)
+
+    def value(self, index):
+        """Value a bucket index is read back as."""
+        index = np.asarray(index)
+        return np.where(index > 0, 2 * self.gamma ** (index - 1 + self.offset) / (self.gamma + 1), 0.0)
+
+    def sketch(self, values, weights=None):
+        """Counts of ``values`` (optionally weighted)."""
+        return np.bincount(self.index(values), weights=weights, minlength=self.n).astype(np.float64)
+
+    def quantiles(self, counts, qs):
+        """Quantiles ``qs`` of one sketch (``(n,)``) or of each row of ``(m, n)`` counts; NaN where empty.
+
+        The ``q`` quantile is the smallest value whose cumulative weight
+        reaches ``q`` times the total.
+        """
+        single = np.ndim(counts) == 1
+        counts = np.atleast_2d(counts)
+        cum = np.cumsum(counts, axis=1)
+        total = cum[:, -1:]
+        ranks = np.maximum(np.asarray(qs, dtype=np.float64)[None, :] * total, np.finfo(float).tiny)
+        idx = np.stack([np.searchsorted(c, r, side='left') for c, r in zip(cum, ranks)])
+        out = np.where(total > 0, self.value(np.minimum(idx, self.n - 1)), np.nan)
+        return out[0] if single else out
+
+
+def weighted_quantiles(values, weights, qs):
+    """Exact quantiles under the same definition as ``LogBuckets.quantiles`` (for checking sketches)."""
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if not len(values) or weights.sum() <= 0:
+        return np.full(len(qs), np.nan)
+    order = np.argsort(values, kind='stable')
+    cum = np.cumsum(weights[order])
+    ranks = np.maximum(np.asarray(qs, dtype=np.float64) * cum[-1], np.finfo(float).tiny)
+    return values[order][np.minimum(np.searchsorted(cum, ranks, side='left'), len(values) - 1)]
@@ -0,0 +1,166 @@
+"""Heatmap tables without per-cell Styler work.
+
+``Styler.background_gradient`` maps every cell through the colormap, then
+computes a luminance and a CSS string per cell in Python, and ``to_html``
+renders an id and a CSS rule per cell.  Here a column's cells become
+indexes into a lookup table of the colormap's colours (the same indexing
+matplotlib does, so the colours are identical), and the CSS of those
+colours is built once.  Numbers are formatted column by column.
+
+``heatmap_html`` emits a compact table with inline styles (light mode);
+``heatmap_styler`` wraps the same colours in a ``Styler`` for the
+interactive ``st.dataframe`` path, which Streamlit still renders cell by
+cell -- beyond ``fits_styler`` that path takes the plain (Arrow) frame.
+``PagedTable`` keeps large tables to one page of that work per rerun.
+"""
+import html
+
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+from matplotlib.colors import rgb2hex
+
+# pandas' background_gradient: dark text below this relative luminance
+TEXT_COLOR_THRESHOLD = 0.408
+
+
+def _relative_luminance(rgba):
+    r, g, b = (x / 12.92 if x <= 0.04045 else ((x + 0.055) / 1.055) ** 2.4 for x in rgba[:3])
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+
+def gradient_lut(cmap):
+    """CSS of every colour of ``cmap``: N stops, then under, over and bad."""
+    cmap = colormaps.get_cmap(cmap)
+    # Integer input indexes the colour table directly; -1 / N pick under / over
+    lut = np.vstack([cmap(np.arange(cmap.N)), cmap(np.array([-1, cmap.N])), cmap(np.array([np.nan]))])
+    return np.array([
+        f"background-color: {rgb2hex(rgba)};"
+        f"color: {'#f1f1f1' if _relative_luminance(rgba) < TEXT_COLOR_THRESHOLD else '#000000'};"
+        for rgba in lut
+    ], dtype=object)
+
+
+def gradient_index(values, n, vmin, vmax):
+    """Colour-table index of each value, as ``cmap(Normalize(vmin, vmax)(values))`` picks it."""
+    x = np.asarray(values, dtype=np.float64)
+    x = (x - vmin) / (vmax - vmin) if vmax != vmin else np.zeros_like(x)   # Normalize: all 0, NaN too
+    x = x * n
+    x[x == n] = n - 1
+    bad, under, over = np.isnan(x), x < 0, x >= n
+    idx = np.clip(np.nan_to_num(x), -1, n).astype(np.intp)
+    idx[under], idx[over], idx[bad] = n, n + 1, n + 2
+    return idx
+
+
+def gradient_css(values, cmap, vmin, vmax, lut=None):
+    """Per-cell CSS of ``Styler.background_gradient(cmap=cmap, vmin=vmin, vmax=vmax)``."""
+    lut = gradient_lut(cmap) if lut is None else lut
+    return lut[gradient_index(values, len(lut) - 3, vmin, vmax)]
+
+
+def format_column(values, fmt=None, na_rep=None):
+    """Display strings of one column (``fmt``: format string or callable, as in ``Styler.format``)."""
+    if fmt is None:
+        fmt = _default_format
+    elif isinstance(fmt, str):
+        fmt = fmt.format
+    if na_rep is None:
+        return [fmt(v) for v in values]
+    return [na_rep if m else fmt(v) for v, m in zip(values, pd.isna(values))]
+
+
+def _default_format(value):
+    # Styler's default: floats at the display precision, everything else str()
+    if isinstance(value, float):
+        return f"{value:.{pd.get_option('styler.format.precision')}f}"
+    return str(value)
+
+
+def heatmap_html(frame, formats, gradients, cmap, na_rep=None, table_class='saas-table'):
+    """Compact HTML table of ``frame``: formatted cells, gradient columns styled inline.
+
+    ``formats`` maps column -> format (see ``format_column``), ``gradients``
+    column -> ``(vmin, vmax)``; the index is not rendered.
+    """
+    lut = gradient_lut(cmap) if gradients else None
+    cells = []
+    for col in frame.columns:
+        text = [html.escape(s) for s in format_column(frame[col].tolist(), formats.get(col), na_rep)]
+        if col in gradients:
+            values = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            css = gradient_css(values, cmap, *gradients[col], lut=lut)
+            cells.append([f'<td style="{c}">{t}</td>' for c, t in zip(css, text)])
+        else:
+            cells.append([f'<td>{t}</td>' for t in text])
+    head = ''.join(f'<th>{html.escape(str(c))}</th>' for c in frame.columns)
+    body = ''.join(f"<tr>{''.join(row)}</tr>" for row in zip(*cells))
+    return f'<table class="{table_class}"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def fits_styler(frame):
+    """Whether a ``Styler`` of ``frame`` is within ``styler.render.max_elements`` (``st.dataframe`` refuses more)."""
+    return frame.size <= pd.get_option('styler.render.max_elements')
+
+
+def heatmap_styler(frame, formats, gradients, cmap, na_rep=None):
+    """``Styler`` with the same formats and colours, for ``st.dataframe``.
+
+    Colours are applied a column at a time from the lookup table instead of
+    through ``background_gradient``.
+    """
+    lut = gradient_lut(cmap)
+    styler = frame.style.format(formats, na_rep=na_rep)
+    for col, (vmin, vmax) in gradients.items():
+        styler = styler.apply(
+            lambda s, lo=vmin, hi=vmax: gradient_css(s.to_numpy(dtype=np.float64, na_value=np.nan), cmap, lo, hi, lut),
+            subset=[col])
+    return styler
+
+
+class PagedTable:
+    """Pages of a frame in the order of any of its columns.
+
+    The row order of a sort column is computed on first use and kept, so a
+    page flip or a re-sort is a slice of a stored order; a search narrows
+    the order to the matching rows (substring, case-insensitive).  Only the
+    rows of the page are ever taken out of the frame.
+    """
+
+    def __init__(self, frame, search_col=None):
+        self.frame = frame.reset_index(drop=True)
+        self.search_col = search_col
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def order(self, column, ascending=True):
+        """Row positions sorted by ``column`` (stable, missing values last)."""
+        key = (column, ascending)
+        if key not in self._orders:
+            self._orders[key] = self.frame[column].sort_values(
+                ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        return self._orders[key]
+
+    def matches(self, text):
+        """Boolean row mask of ``search_col`` containing ``text``, or None when there is nothing to search."""
+        text = (text or '').strip()
+        if not text or self.search_col is None:
+            return None
+        col = self.frame[self.search_col]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # Match the distinct labels once, then map through the codes
+            hit = np.append(col.cat.categories.astype(str).str.contains(text, case=False, regex=False), False)
+            return hit[col.cat.codes.to_numpy()]
+        return col.astype(str).str.contains(text, case=False, regex=False).to_numpy()
+
+    def rows(self, column, ascending=True, text=''):
+        """Sorted row positions, restricted to the search matches."""
+        order = self.order(column, ascending)
+        mask = self.matches(text)
+        return order if mask is None else order[mask[order]]
+
+    def page(self, rows, page, page_size):
+        """Frame of 1-based ``page`` of ``rows`` (see ``rows()``)."""
+        return self.frame.iloc[rows[(page - 1) * page_size:page * page_size]]
@@ -0,0 +1,126 @@
+"""Row indexes over the traffic fact table.
+
+``TrafficIndex`` keeps the rows sorted by date together with a per-day row
+offset table, so a date range resolves to one contiguous slice without
+converting a single row's timestamp.  On top of that every value of every
+sidebar dimension has a packed bitmap, so a filter is a few byte-wise
+OR/AND operations over the slice instead of one ``isin`` scan per dimension.
+An index is shared by every session: its arrays are read-only, and a frame
+that is already date-sorted is indexed in place rather than copied.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Sidebar filter dimensions that get a bitmap per value
+FILTER_DIMS = ('geo', 'brand', 'platform', 'traffic_source', 'agent')
+
+
+class TrafficIndex:
+    """Date-sorted view of a traffic frame.
+
+    ``day[i]`` is the day offset (from ``day0``) of row ``i``, and rows of day
+    ``k`` are ``day_start[k]:day_start[k + 1]``.
+    """
+
+    def __init__(self, frame, date_col='date'):
+        dates = frame[date_col].to_numpy()
+        if (dates[1:] < dates[:-1]).any():
+            frame = frame.iloc[np.argsort(dates, kind='stable')]
+        self.frame = frame if frame.index.equals(pd.RangeIndex(len(frame))) else frame.reset_index(drop=True)
+        self.date_col = date_col
+        days = self.frame[date_col].to_numpy().astype('datetime64[D]')
+        self.day0 = days[0] if len(days) else np.datetime64('1970-01-01', 'D')
+        self.day = (days - self.day0).astype(np.int32)
+        self.n_days = int(self.day[-1]) + 1 if len(days) else 0
+        self.day_start = np.searchsorted(self.day, np.arange(self.n_days + 1), side='left')
+
+        # Integer codes + labels of every dimension (the date's code is its day offset)
+        self.codes = {date_col: self.day}
+        self.labels = {date_col: pd.DatetimeIndex((self.day0 + np.arange(self.n_days)).astype('datetime64[ns]'))}
+        self.bitmaps, self.has_null = {}, {}
+        for dim, col in self.frame.items():
+            if isinstance(col.dtype, pd.CategoricalDtype) or dim in FILTER_DIMS:
+                self._index_dim(dim)
+        for array in (self.day, self.day_start, *self.codes.values(), *self.bitmaps.values()):
+            array.flags.writeable = False
+
+    def _index_dim(self, dim):
+        col = self.frame[dim]
+        if not isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype('category')
+        codes = col.cat.codes.to_numpy()
+        self.codes[dim] = codes
+        self.labels[dim] = pd.Index(col.cat.categories)
+        self.has_null[dim] = bool((codes < 0).any())
+        if dim in FILTER_DIMS:
+            # (n_values, ceil(n_rows / 8)) packed bits, row i -> bit i
+            self.bitmaps[dim] = np.stack([np.packbits(codes == v) for v in range(len(self.labels[dim]))]) \
+                if len(self.labels[dim]) else np.zeros((0, (len(codes) + 7) // 8), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.day0).date()
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.day0 + max(self.n_days - 1, 0)).date()
+
+    def day_offset(self, d):
+        return int((np.datetime64(d, 'D') - self.day0).astype(np.int64))
+
+    def row_range(self, start: date, end: date):
+        """Rows ``lo:hi`` covering ``start..end`` (inclusive)."""
+        s = min(max(self.day_offset(start), 0), self.n_days)
+        e = min(max(self.day_offset(end) + 1, 0), self.n_days)
+        if e <= s:
+            return 0, 0
+        return int(self.day_start[s]), int(self.day_start[e])
+
+    def date_slice(self, start: date, end: date):
+        lo, hi = self.row_range(start, end)
+        return self.frame.iloc[lo:hi]
+
+    def take(self, array, selection):
+        """``array`` (one value per row) restricted to a ``select()`` result."""
+        lo, hi, mask = selection
+        part = array[lo:hi]
+        return part if mask is None else part[mask]
+
+    def value_ids(self, dim, values):
+        ids = self.labels[dim].get_indexer(list(values))
+        return np.unique(ids[ids >= 0])
+
+    def select(self, start: date, end: date, filters=None):
+        """Resolve a date range plus ``{dim: selected values}`` to rows.
+
+        Returns ``(lo, hi, mask)``: the date slice and a boolean mask over it,
+        or ``None`` when no dimension narrows the slice.  A dimension with
+        every value selected is skipped without touching its bitmaps.
+        """
+        lo, hi = self.row_range(start, end)
+        if hi <= lo:
+            return lo, lo, None
+        b0, b1 = lo // 8, (hi + 7) // 8
+        acc = None
+        for dim, values in (filters or {}).items():
+            ids = self.value_ids(dim, values)
+            if len(ids) == len(self.labels[dim]) and not self.has_null[dim]:
+                continue
+            if len(ids) == 0:
+                return lo, lo, None
+            bits = np.bitwise_or.reduce(self.bitmaps[dim][ids, b0:b1], axis=0)
+            acc = bits if acc is None else np.bitwise_and(acc, bits, out=acc)
+        if acc is None:
+            return lo, hi, None
+        mask = np.unpackbits(acc, count=hi - b0 * 8)[lo - b0 * 8:].view(bool)
+        return lo, hi, mask
+
+    def filtered(self, start: date, end: date, filters=None):
+        lo, hi, mask = self.select(start, end, filters)
+        part = self.frame.iloc[lo:hi]
+        return part if mask is None else part[mask]